@@ -0,0 +1,202 @@
+"""Offline load test of the onboarding flow against an in-memory Mongo and a stub LLM.
+
+Runs the FastAPI app in-process through httpx's ASGI transport with
+mongomock-motor standing in for MongoDB and the stub LLM provider. Concurrent
+virtual users drive synthetic questionnaires through /questionnaire, /profile
+and /plan. The run reports p50/p95/p99 latency and requests per second for
+each endpoint.
+
+    python benchmarks/load_test.py --users 50 --iterations 20 --llm-latency 0.2
+    python benchmarks/load_test.py --save-baseline      # record the current numbers
+    python benchmarks/load_test.py --check              # exit 1 on regression vs the baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+ENDPOINTS = ["questionnaire", "profile", "plan"]
+
+ACTIVITIES = ["coding side projects", "writing essays", "design sprints", "research papers", "playing music",
+              "teaching kids", "building furniture", "analyzing data", "running", "gardening"]
+PROBLEMS = ["help students learn", "improve healthcare access", "build tools for small businesses",
+            "solve climate problems", "mentor junior developers", "create art for communities"]
+SKILLS = ["Programming", "Design", "Teaching", "Writing", "Management", "Research", "Marketing"]
+GOALS = ["Launch online course", "Build learning app", "Grow audience", "Write a book", "Run a marathon",
+         "Get promoted", "Learn Spanish", "Create a design portfolio", "Teach a workshop"]
+DISTRACTIONS = ["Social media", "Email", "Phone notifications", "News", "Meetings", "Video games"]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=10, help="onboarding flows per user")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.05, help="stub LLM latency jitter in seconds")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="fraction of stub LLM calls that fail")
+    parser.add_argument("--llm-pool-size", type=int, default=8, help="LLM_POOL_SIZE for the run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run's numbers as the baseline")
+    parser.add_argument("--check", action="store_true", help="fail if the run regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative regression in p95 latency and throughput")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="ignore p95 increases smaller than this, so sub-millisecond noise is not a regression")
+    return parser.parse_args()
+
+def configure_environment(args):
+    """Must run before server is imported: its settings are read at import time"""
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["LLM_STUB_LATENCY_SECONDS"] = str(args.llm_latency)
+    os.environ["LLM_STUB_JITTER_SECONDS"] = str(args.llm_jitter)
+    os.environ["LLM_STUB_FAILURE_RATE"] = str(args.llm_failure_rate)
+    os.environ["LLM_POOL_SIZE"] = str(args.llm_pool_size)
+    # Every virtual user shares one client address, so per-client quotas would throttle the whole run
+    os.environ.setdefault("PLAN_CLIENT_RATE_PER_MINUTE", "0")
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "load_test")
+    # A fresh shared cache per run, so plans cached by an earlier run cannot flatter this one
+    os.environ["SHARED_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="lifeplan-load-test-"), "shared-cache.sqlite3")
+    sys.path.insert(0, str(BENCH_DIR.parent))
+
+def synthetic_answers(rng: random.Random) -> dict:
+    return {
+        "energizing_activities": ", ".join(rng.sample(ACTIVITIES, rng.randint(1, 3))),
+        "passionate_problems": " and ".join(rng.sample(PROBLEMS, rng.randint(1, 2))),
+        "existing_skills": rng.sample(SKILLS, rng.randint(1, 3)),
+        "weekday_hours": rng.randint(0, 6),
+        "weekend_hours": rng.randint(0, 8),
+        "chronotype": rng.choice(["Early morning", "Late morning", "Afternoon", "Evening", "Night"]),
+        "morning_routine": rng.choice(["no", "Coffee and planning", "Run, shower, journal"]),
+        "morning_routine_duration": rng.choice([None, 15, 30, 60]),
+        "reliable_habits": rng.choice(["0", "1-2", "3-4", "5+"]),
+        "setback_reaction": rng.choice(["give up", "try again same way", "adjust approach and try again",
+                                        "learn and iterate immediately"]),
+        "yearly_goals": rng.sample(GOALS, 3),
+        "key_habit_change": rng.choice(["Sleep earlier", "Start deep work sessions every morning", "Exercise daily"]),
+        "main_distractions": rng.sample(DISTRACTIONS, rng.randint(0, 4)),
+        "commitment_level": rng.randint(1, 10),
+    }
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, endpoint, request):
+        started = time.perf_counter()
+        response = await request
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        return response.json()
+
+async def virtual_user(http, recorder, rng, iterations):
+    for _ in range(iterations):
+        questionnaire = await recorder.call("questionnaire", http.post("/api/questionnaire", json=synthetic_answers(rng)))
+        if questionnaire is None:
+            continue
+        profile = await recorder.call("profile", http.post("/api/profile", params={"questionnaire_id": questionnaire["id"]}))
+        if profile is None:
+            continue
+        await recorder.call("plan", http.post("/api/plan", params={"profile_id": profile["id"]}))
+
+def summarize(recorder, elapsed):
+    import numpy as np
+
+    results = {}
+    for endpoint in ENDPOINTS:
+        samples = np.array(recorder.latencies[endpoint]) * 1000
+        if not len(samples):
+            continue
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        results[endpoint] = {
+            "requests": int(len(samples)),
+            "errors": recorder.errors[endpoint],
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "rps": round(len(samples) / elapsed, 1),
+        }
+    return results
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    failures = []
+    for endpoint, expected in baseline.get("endpoints", {}).items():
+        actual = results.get(endpoint)
+        if actual is None:
+            failures.append(f"{endpoint}: no requests in this run")
+            continue
+        p95_limit = max(expected["p95_ms"] * (1 + tolerance), expected["p95_ms"] + min_delta_ms)
+        if actual["p95_ms"] > p95_limit:
+            failures.append(f"{endpoint}: p95 {actual['p95_ms']}ms > baseline {expected['p95_ms']}ms")
+        if actual["rps"] < expected["rps"] * (1 - tolerance):
+            failures.append(f"{endpoint}: {actual['rps']} rps < baseline {expected['rps']} rps")
+    return failures
+
+async def run(args):
+    import httpx
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+
+    server.db = AsyncMongoMockClient(tz_aware=True)[os.environ["DB_NAME"]]
+    await server.ensure_indexes()
+
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            virtual_user(http, recorder, random.Random(rng.random()), args.iterations) for _ in range(args.users)
+        ])
+        elapsed = time.perf_counter() - started
+    await server.llm_pool.aclose()
+    return summarize(recorder, elapsed), elapsed
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    results, elapsed = asyncio.run(run(args))
+
+    print(f"{args.users} users x {args.iterations} flows in {elapsed:.2f}s "
+          f"(stub LLM {args.llm_latency}s, failure rate {args.llm_failure_rate})")
+    print(f"{'endpoint':<14}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>9}")
+    for endpoint, stats in results.items():
+        print(f"{endpoint:<14}{stats['requests']:>9}{stats['errors']:>8}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['rps']:>9}")
+
+    config = {key: getattr(args, key) for key in ("users", "iterations", "llm_latency", "llm_jitter",
+                                                  "llm_failure_rate", "llm_pool_size", "seed")}
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({"config": config, "endpoints": results}, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if args.check:
+        if not args.baseline.exists():
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            return 1
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("config") != config:
+            print("Warning: baseline was recorded with a different configuration")
+        failures = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if failures:
+            print("Regressions:")
+            for failure in failures:
+                print(f"  {failure}")
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
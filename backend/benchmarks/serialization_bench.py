@@ -0,0 +1,70 @@
+"""Micro-benchmark of the CPU spent turning a stored plan into a GET /api/plan/{profile_id} response.
+
+Compares the old path (ISO string dates, fromisoformat, pydantic revalidation,
+jsonable_encoder and the stdlib JSON encoder) with the fast path (native
+dates, projected document, orjson). No database or network is involved.
+
+    python benchmarks/serialization_bench.py [--iterations 20000]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+import server  # noqa: E402
+
+def sample_plan_doc():
+    answers = server.QuestionnaireAnswer(
+        energizing_activities="coding and designing apps, solving complex problems",
+        passionate_problems="help students learn better through technology",
+        existing_skills=["Programming", "Design", "Teaching"],
+        weekday_hours=4,
+        weekend_hours=6,
+        chronotype="Early morning",
+        morning_routine="Coffee, meditation, planning for 30 minutes",
+        reliable_habits="3-4",
+        setback_reaction="learn and iterate immediately",
+        yearly_goals=["Launch online course", "Build learning app", "Grow audience"],
+        key_habit_change="Start deep work sessions every morning",
+        main_distractions=["Social media", "Email", "Phone notifications"],
+        commitment_level=8,
+    )
+    profile = server.build_profile(answers)
+    plan_data = server.build_local_plan(profile, answers)
+    plan = server.PersonalizedPlan(profile_id=profile.id, **{name: plan_data[name] for name in server.PLAN_SECTIONS})
+    return server.to_mongo(plan)
+
+def old_path(stored):
+    doc = dict(stored)
+    doc['created_at'] = server.datetime.fromisoformat(doc['created_at'])
+    plan = server.PersonalizedPlan(**doc)
+    # What FastAPI does with response_model before rendering
+    validated = server.PersonalizedPlan.model_validate(plan.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+def fast_path(stored):
+    return ORJSONResponse(stored).body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    native_doc = sample_plan_doc()
+    legacy_doc = {**native_doc, 'created_at': native_doc['created_at'].isoformat()}
+
+    old_us = timeit.timeit(lambda: old_path(legacy_doc), number=args.iterations) / args.iterations * 1e6
+    fast_us = timeit.timeit(lambda: fast_path(native_doc), number=args.iterations) / args.iterations * 1e6
+
+    print(f"response size: {len(fast_path(native_doc))} bytes")
+    print(f"old path:  {old_us:8.2f} us/request")
+    print(f"fast path: {fast_us:8.2f} us/request")
+    print(f"saved:     {old_us - fast_us:8.2f} us/request ({(1 - fast_us / old_us) * 100:.0f}%)")
+
+if __name__ == "__main__":
+    main()
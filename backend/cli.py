@@ -0,0 +1,84 @@
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+
+import typer
+
+import server
+
+cli = typer.Typer(help="LifePlan AI maintenance commands")
+
+@cli.command("ensure-indexes")
+def ensure_indexes():
+    """Create every declared MongoDB index"""
+    created = asyncio.run(server.ensure_indexes())
+    for collection_name, names in created.items():
+        typer.echo(f"{collection_name}: {', '.join(names) or 'no changes'}")
+
+@cli.command("verify-indexes")
+def verify_indexes():
+    """Explain every hot query and exit non-zero if any uses a collection scan"""
+    report = asyncio.run(server.verify_query_plans())
+    for result in report['queries']:
+        status = "COLLSCAN" if result['collscan'] else "ok"
+        typer.echo(f"{status:>8}  {result['collection']} {json.dumps(result['filter'])} -> {' > '.join(result['stages'])}")
+    if not report['ok']:
+        raise typer.Exit(code=1)
+
+@cli.command("backfill-dates")
+def backfill_dates(batch_size: int = typer.Option(1000, help="Documents per batch")):
+    """Convert legacy ISO-string created_at values to native dates; safe to re-run"""
+    converted = asyncio.run(server.backfill_dates(batch_size=batch_size))
+    for collection_name, count in converted.items():
+        typer.echo(f"{collection_name}: {count} converted")
+
+@cli.command("rescore")
+def rescore(
+    batch_size: int = typer.Option(1000, help="Questionnaires per cursor batch and bulk_write"),
+    dry_run: bool = typer.Option(False, help="Score everything but write nothing"),
+    verify: bool = typer.Option(False, help="Cross-check every row against the scalar scorer"),
+    version: str = typer.Option(None, help="Scoring rules version to apply to every profile (defaults to each questionnaire's experiment arm)"),
+):
+    """Recompute all profile scores and archetypes from their questionnaires"""
+    report = asyncio.run(server.rescore_all_profiles(batch_size=batch_size, dry_run=dry_run, verify=verify, version=version))
+    typer.echo(json.dumps(report, indent=2))
+    if report['mismatches']:
+        raise typer.Exit(code=1)
+
+@cli.command("rebuild-rollups")
+def rebuild_rollups(batch_size: int = typer.Option(5000, help="Profiles per cursor batch")):
+    """Recompute the analytics rollups from every profile"""
+    report = asyncio.run(server.rebuild_rollups(batch_size=batch_size))
+    typer.echo(json.dumps(report, indent=2))
+
+@cli.command("export")
+def export(
+    dataset: str = typer.Argument(..., help="profiles or plans"),
+    output: Path = typer.Option(..., help="File to write"),
+    format: str = typer.Option("ndjson", help="ndjson or parquet"),
+    since: datetime = typer.Option(None, help="Only documents created after this time"),
+    state_file: Path = typer.Option(None, help="JSON file holding the watermark of the last export; read and updated"),
+    batch_size: int = typer.Option(server.EXPORT_BATCH_SIZE, help="Documents per cursor batch and Parquet row group"),
+):
+    """Export profiles or plans for analytics, incrementally when given a state file"""
+    state = json.loads(state_file.read_text()) if state_file and state_file.exists() else {}
+    if since is None and dataset in state:
+        since = datetime.fromisoformat(state[dataset])
+
+    async def run():
+        job = server.AnalyticsExport(dataset, format, since, batch_size)
+        with output.open("wb") as handle:
+            async for chunk in job.stream():
+                handle.write(chunk)
+        return job
+
+    job = asyncio.run(run())
+    typer.echo(f"Exported {job.rows} {dataset} created after {since.isoformat() if since else 'the beginning'} "
+               f"up to {job.until.isoformat()} to {output}")
+    if state_file:
+        state[dataset] = job.until.isoformat()
+        state_file.write_text(json.dumps(state, indent=2))
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,32 @@
+"""Multi-worker launch configuration: gunicorn managing uvicorn workers.
+
+    cd backend && gunicorn -c gunicorn.conf.py server:app
+
+Every worker on the host shares the SQLite WAL cache at SHARED_CACHE_PATH (a
+file under TMPDIR named after DB_NAME unless set), so a plan or profile cached
+by one worker is a hit in all of them and survives worker recycling and
+restarts. Settings can be overridden through the environment variables read
+below.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8001')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(2 * multiprocessing.cpu_count() + 1, 8)))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Plan generation can wait for the full LLM timeout (LLM_TIMEOUT_SECONDS, 90s by default)
+timeout = int(os.environ.get('WORKER_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically; the jitter keeps them from restarting all at once
+max_requests = int(os.environ.get('MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+# The app is imported in each worker after fork, so Mongo, the LLM pool and the
+# cache connections are never shared across processes
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
@@ -1,41 +1,586 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+import time
+# Taken before anything else is imported so the startup report covers the whole import
+IMPORT_STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Header, Depends
+from fastapi.responses import ORJSONResponse, StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, IndexModel, UpdateMany, UpdateOne, ReplaceOne, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, DuplicateKeyError, BulkWriteError
 import os
+import re
+import socket
+import sqlite3
+import threading
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+import orjson
+from typing import List, Optional, Dict, Any, Callable, Awaitable, AsyncIterator
 import uuid
-from datetime import datetime, timezone
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import json
+import httpx
+import copy
+import importlib
+import hashlib
+import hmac
+import random
+import operator
+import bisect
+import math
+import base64
+import io
+import typing
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+import numpy as np
+from datetime import datetime, timezone, timedelta
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# The Motor client is built on first use instead of at import, so importing the module
+# (CLI, tests, worker boot) does not construct it before the event loop is running
+class MongoResources:
+    def __init__(self):
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._database = None
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        if self._client is None:
+            # tz_aware so BSON dates come back as UTC-aware datetimes
+            self._client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+        return self._client
+
+    @property
+    def database(self):
+        if self._database is None:
+            self._database = self.client[os.environ['DB_NAME']]
+        return self._database
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+            self._database = None
+
+class LazyDatabase:
+    """Stands in for the Motor database so db.<collection> and db[name] work before the client exists"""
+
+    def __init__(self, resources: MongoResources):
+        self._resources = resources
+
+    def __getattr__(self, name: str):
+        return getattr(self._resources.database, name)
+
+    def __getitem__(self, name: str):
+        return self._resources.database[name]
+
+mongo = MongoResources()
+db = LazyDatabase(mongo)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm shared resources before serving and release them on shutdown (see Lifespan below)"""
+    await lifecycle.start()
+    try:
+        yield
+    finally:
+        await lifecycle.stop()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Metrics
+# Counters, gauges and histograms kept in process and rendered in the Prometheus
+# text format at /metrics. With METRICS_ENABLED off, span() hands back a shared
+# no-op and the recording calls return immediately.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def format_labels(labelnames: tuple, labels: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        if METRICS_ENABLED:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{format_labels(self.labelnames, labels)} {value}" for labels, value in self.values.items()]
+
+class Gauge:
+    """Gauge read at scrape time from a callback returning a number or a {labels: value} dict"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], Any], labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.labelnames = labelnames
+
+    def render(self) -> List[str]:
+        value = self.callback()
+        values = value if isinstance(value, dict) else {(): value}
+        return [f"{self.name}{format_labels(self.labelnames, labels)} {v}" for labels, v in values.items()]
+
+class CounterView(Gauge):
+    """Exposes an existing monotonically increasing stats value as a counter"""
+    kind = 'counter'
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self.series = {}
+
+    def observe(self, value: float, labels: tuple = ()):
+        if not METRICS_ENABLED:
+            return
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                le = format_labels(self.labelnames, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.register(Histogram(
+    'lifeplan_stage_duration_seconds', 'Time spent in each request stage', ('stage',)))
+STAGE_ERRORS = metrics.register(Counter(
+    'lifeplan_stage_errors_total', 'Exceptions raised inside a stage, by exception type', ('stage', 'error')))
+LLM_FALLBACKS = metrics.register(Counter(
+    'lifeplan_llm_fallbacks_total', 'Plans served from the local engine instead of the LLM', ('reason',)))
+LLM_PARSE_FAILURES = metrics.register(Counter(
+    'lifeplan_llm_parse_failures_total', 'LLM responses that could not be parsed as a plan'))
+PLAN_REPAIRS = metrics.register(Counter(
+    'lifeplan_plan_repairs_total', 'LLM plan responses that needed a repair, by repair path', ('path',)))
+LLM_TOKENS = metrics.register(Counter(
+    'lifeplan_llm_tokens_total', 'LLM tokens by kind; estimated where the provider does not report usage', ('kind',)))
+
+class Span:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, (self.stage,))
+        if exc_type is not None:
+            STAGE_ERRORS.inc((self.stage, exc_type.__name__))
+        return False
+
+class NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NOOP_SPAN = NoopSpan()
+
+def span(stage: str):
+    """Time a block into the stage histogram: `with span("plan.llm_call"): ...`"""
+    if not METRICS_ENABLED:
+        return NOOP_SPAN
+    return Span(stage)
+
+PLAN_SYSTEM_MESSAGE = """You are an evidence-based productivity coach synthesizing ideas from Ikigai, 5AM Club, Atomic Habits, Deep Work, and Designing Your Life. 
+
+Produce concise, actionable Year/Monthly/Weekly/Daily plans based on a 6-axis user profile. Output must be in structured JSON format.
+
+Focus on creating progressive, achievable plans that build momentum. Keep language encouraging and pragmatic."""
+PLAN_INSTRUCTIONS = """Create a productivity roadmap with:
+1. One clear yearly goal
+2. Three supporting pillars
+3. Monthly focus theme
+4. Weekly schedule template
+5. Daily routine structure
+6. Habit stack (3-5 micro-habits)
+7. Specific time blocks based on their chronotype
+8. Accountability measures
+
+Format as JSON with these exact keys: yearly_goal, pillars, monthly_focus, weekly_template, daily_template, habit_stack, time_blocks, accountability_steps, justification"""
+# Identical on every call so the provider can cache it; only the user profile goes in the message
+PLAN_STABLE_PREFIX = f"{PLAN_SYSTEM_MESSAGE.strip()}\n\n{PLAN_INSTRUCTIONS}"
+PLAN_MODEL = "claude-3-7-sonnet-20250219"
+PLAN_MAX_TOKENS = 4096
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English prose, good enough for budgeting without a tokenizer"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+# LLM client pool
+LLM_PROVIDER = os.environ.get('LLM_PROVIDER') or ('anthropic' if os.environ.get('ANTHROPIC_API_KEY') else 'emergent')
+LLM_POOL_SIZE = int(os.environ.get('LLM_POOL_SIZE', '8'))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '90'))
+LLM_STUB_LATENCY_SECONDS = float(os.environ.get('LLM_STUB_LATENCY_SECONDS', '1.5'))
+LLM_STUB_JITTER_SECONDS = float(os.environ.get('LLM_STUB_JITTER_SECONDS', '0'))
+LLM_STUB_RESPONSE = os.environ.get('LLM_STUB_RESPONSE', 'json')  # json, fenced, prose, invalid
+LLM_STUB_FAILURE_RATE = float(os.environ.get('LLM_STUB_FAILURE_RATE', '0'))
+
 # Initialize LLM Chat
 def get_llm_chat():
+    # Imported on first use: the SDK drags in a large dependency tree that other providers never need
+    from emergentintegrations.llm.chat import LlmChat
     return LlmChat(
         api_key=os.environ.get('EMERGENT_LLM_KEY'),
         session_id=str(uuid.uuid4()),
-        system_message="""You are an evidence-based productivity coach synthesizing ideas from Ikigai, 5AM Club, Atomic Habits, Deep Work, and Designing Your Life. 
+        system_message=PLAN_STABLE_PREFIX
+    ).with_model("anthropic", PLAN_MODEL)
 
-Produce concise, actionable Year/Monthly/Weekly/Daily plans based on a 6-axis user profile. Output must be in structured JSON format.
+class EmergentLLMProvider:
+    """LlmChat through the Emergent proxy; the SDK keeps per-session history, so each call gets its own chat"""
+    name = 'emergent'
 
-Focus on creating progressive, achievable plans that build momentum. Keep language encouraging and pragmatic."""
-    ).with_model("anthropic", "claude-3-7-sonnet-20250219")
+    async def complete(self, prompt: str, usage: Optional[Dict[str, Any]] = None) -> str:
+        from emergentintegrations.llm.chat import UserMessage
+        # LlmChat does not report token usage; the pool fills in estimates
+        return await get_llm_chat().send_message(UserMessage(text=prompt))
+
+    async def stream(self, prompt: str, usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        # LlmChat has no streaming API, so the whole response arrives as one chunk
+        yield await self.complete(prompt, usage)
+
+    async def aclose(self):
+        pass
+
+class AnthropicLLMProvider:
+    """Anthropic Messages API over one shared keep-alive HTTP connection pool"""
+    name = 'anthropic'
+
+    def __init__(self, pool_size: int = LLM_POOL_SIZE, timeout: float = LLM_TIMEOUT_SECONDS):
+        self.http = httpx.AsyncClient(
+            base_url=os.environ.get('ANTHROPIC_BASE_URL', 'https://api.anthropic.com'),
+            headers={"x-api-key": os.environ.get('ANTHROPIC_API_KEY', ''), "anthropic-version": "2023-06-01"},
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=120),
+            timeout=httpx.Timeout(timeout, connect=10),
+        )
+
+    def _payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        return {
+            "model": PLAN_MODEL,
+            "max_tokens": PLAN_MAX_TOKENS,
+            # Prompt caching needs a long enough prefix; below the model minimum the marker is ignored
+            "system": [{"type": "text", "text": PLAN_STABLE_PREFIX, "cache_control": {"type": "ephemeral"}}],
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": stream,
+        }
+
+    @staticmethod
+    def _record_usage(usage: Optional[Dict[str, Any]], reported: Optional[Dict[str, Any]]):
+        if usage is None or not reported:
+            return
+        for key in ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens'):
+            if reported.get(key) is not None:
+                usage[key] = reported[key]
+
+    async def complete(self, prompt: str, usage: Optional[Dict[str, Any]] = None) -> str:
+        response = await self.http.post("/v1/messages", json=self._payload(prompt, stream=False))
+        response.raise_for_status()
+        body = response.json()
+        self._record_usage(usage, body.get("usage"))
+        return "".join(block.get("text", "") for block in body["content"])
+
+    async def stream(self, prompt: str, usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        async with self.http.stream("POST", "/v1/messages", json=self._payload(prompt, stream=True)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                if event.get("type") == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                    yield event["delta"]["text"]
+                elif event.get("type") == "message_start":
+                    self._record_usage(usage, event.get("message", {}).get("usage"))
+                elif event.get("type") == "message_delta":
+                    self._record_usage(usage, event.get("usage"))
+                elif event.get("type") == "error":
+                    raise RuntimeError(event.get("error", {}).get("message", "LLM stream error"))
+
+    async def aclose(self):
+        await self.http.aclose()
+
+STUB_PLAN = {
+    "yearly_goal": "Ship one meaningful project and build a sustainable deep work practice",
+    "pillars": ["Deep Work", "Consistent Habits", "Skill Growth"],
+    "monthly_focus": "Establish a reliable morning deep work block",
+    "weekly_template": {
+        "Monday": "Plan the week and start the main project",
+        "Tuesday": "Deep work on the main project",
+        "Wednesday": "Skill practice",
+        "Thursday": "Deep work on the main project",
+        "Friday": "Review and ship",
+        "Saturday": "Learning and exploration",
+        "Sunday": "Rest and reflection"
+    },
+    "daily_template": {
+        "morning": "Wake, move, plan the day",
+        "deep_work": "Two 90-minute focus blocks",
+        "afternoon": "Meetings, admin and shallow tasks",
+        "evening": "Shutdown ritual and reflection"
+    },
+    "habit_stack": [
+        {"habit": "Write the day's top 3 tasks", "cue": "After morning coffee", "time": "5 minutes"},
+        {"habit": "Phone in another room", "cue": "Before the first focus block", "time": "1 minute"},
+        {"habit": "Log progress", "cue": "After the last focus block", "time": "5 minutes"}
+    ],
+    "time_blocks": [
+        {"name": "Deep Work", "time": "08:00-09:30", "frequency": "Weekdays"},
+        {"name": "Skill Practice", "time": "18:00-18:45", "frequency": "3x/week"}
+    ],
+    "accountability_steps": ["Weekly review every Friday", "Monthly progress check-in", "Share goals with a friend"],
+    "justification": "Stub plan for offline load testing."
+}
+
+class StubLLMProvider:
+    """Offline provider with configurable latency, failure rate and response shape, for load tests"""
+    name = 'stub'
+
+    def __init__(self, latency: float = LLM_STUB_LATENCY_SECONDS, jitter: float = LLM_STUB_JITTER_SECONDS,
+                 response_shape: str = LLM_STUB_RESPONSE, failure_rate: float = LLM_STUB_FAILURE_RATE, chunks: int = 20):
+        self.latency = latency
+        self.jitter = jitter
+        self.response_shape = response_shape
+        self.failure_rate = failure_rate
+        self.chunks = chunks
+
+    def _maybe_fail(self):
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError("Stub LLM failure")
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def _response(self) -> str:
+        body = json.dumps(STUB_PLAN, indent=2)
+        if self.response_shape == 'fenced':
+            return f"```json\n{body}\n```"
+        if self.response_shape == 'prose':
+            return f"Here is your personalized plan:\n\n{body}\n\nLet me know if you want changes!"
+        if self.response_shape == 'invalid':
+            return body[:len(body) // 2]
+        return body
+
+    async def complete(self, prompt: str, usage: Optional[Dict[str, Any]] = None) -> str:
+        await asyncio.sleep(self._delay())
+        self._maybe_fail()
+        return self._response()
+
+    async def stream(self, prompt: str, usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        text = self._response()
+        step = max(1, len(text) // self.chunks)
+        delay = self._delay() / self.chunks
+        for start in range(0, len(text), step):
+            await asyncio.sleep(delay)
+            if start:
+                self._maybe_fail()
+            yield text[start:start + step]
+
+    async def aclose(self):
+        pass
+
+LLM_PROVIDERS = {
+    'anthropic': AnthropicLLMProvider,
+    'emergent': EmergentLLMProvider,
+    'stub': StubLLMProvider,
+}
+
+class LLMClientPool:
+    """Shared LLM client with a bounded number of concurrent calls and a per-call timeout
+
+    The timeout covers waiting for a free slot as well as the call itself.
+    """
+
+    def __init__(self, provider_name: str = LLM_PROVIDER, size: int = LLM_POOL_SIZE, timeout: float = LLM_TIMEOUT_SECONDS):
+        if provider_name not in LLM_PROVIDERS:
+            raise ValueError(f"Unknown LLM provider {provider_name}")
+        self.provider_name = provider_name
+        self.size = size
+        self.timeout = timeout
+        self._provider = None
+        self._slots = asyncio.Semaphore(size)
+        self.stats = {'calls': 0, 'in_flight': 0, 'waiting': 0, 'timeouts': 0, 'queue_timeouts': 0, 'errors': 0}
+        # Smoothed call latency in seconds, read by admission control
+        self.latency_ewma: Optional[float] = None
+
+    def _observe_latency(self, seconds: float):
+        self.latency_ewma = seconds if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * seconds
+
+    @property
+    def provider(self):
+        # Created on first use so the HTTP pool binds to the running event loop
+        if self._provider is None:
+            provider_class = LLM_PROVIDERS[self.provider_name]
+            if provider_class is AnthropicLLMProvider:
+                self._provider = provider_class(pool_size=self.size, timeout=self.timeout)
+            else:
+                self._provider = provider_class()
+        return self._provider
+
+    @staticmethod
+    def _account(usage: Dict[str, Any], prompt: str, output_chars: int, started: float):
+        """Fill in estimates for anything the provider did not report, and count the tokens"""
+        usage['prompt_chars'] = len(prompt)
+        usage['estimated_input_tokens'] = estimate_tokens(PLAN_STABLE_PREFIX) + estimate_tokens(prompt)
+        usage['estimated'] = 'input_tokens' not in usage
+        usage.setdefault('input_tokens', usage['estimated_input_tokens'])
+        usage.setdefault('output_tokens', (output_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+        usage['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        for kind in ('input', 'output', 'cache_read_input'):
+            if usage.get(f'{kind}_tokens'):
+                LLM_TOKENS.inc((kind,), usage[f'{kind}_tokens'])
+
+    @asynccontextmanager
+    async def _slot(self, deadline: float):
+        """Hold a pool slot, giving up with TimeoutError if none frees up before the deadline"""
+        self.stats['waiting'] += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=max(0.0, deadline - asyncio.get_running_loop().time()))
+        except asyncio.TimeoutError:
+            self.stats['queue_timeouts'] += 1
+            raise
+        finally:
+            self.stats['waiting'] -= 1
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    async def complete(self, prompt: str, usage: Optional[Dict[str, Any]] = None) -> str:
+        """Run one completion; token counts and latency are written into usage when given"""
+        usage = {} if usage is None else usage
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        async with self._slot(deadline):
+            self.stats['calls'] += 1
+            self.stats['in_flight'] += 1
+            started = time.perf_counter()
+            try:
+                text = await asyncio.wait_for(self.provider.complete(prompt, usage),
+                                              timeout=max(0.0, deadline - loop.time()))
+                self._account(usage, prompt, len(text), started)
+                self._observe_latency(time.perf_counter() - started)
+                return text
+            except asyncio.TimeoutError:
+                self.stats['timeouts'] += 1
+                self._observe_latency(self.timeout)
+                raise
+            except Exception:
+                self.stats['errors'] += 1
+                raise
+            finally:
+                self.stats['in_flight'] -= 1
+
+    async def stream(self, prompt: str, usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        usage = {} if usage is None else usage
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        async with self._slot(deadline):
+            self.stats['calls'] += 1
+            self.stats['in_flight'] += 1
+            started = time.perf_counter()
+            output_chars = 0
+            chunks = self.provider.stream(prompt, usage).__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                    except StopAsyncIteration:
+                        break
+                    output_chars += len(chunk)
+                    yield chunk
+                self._account(usage, prompt, output_chars, started)
+                self._observe_latency(time.perf_counter() - started)
+            except asyncio.TimeoutError:
+                self.stats['timeouts'] += 1
+                self._observe_latency(self.timeout)
+                raise
+            except Exception:
+                self.stats['errors'] += 1
+                raise
+            finally:
+                self.stats['in_flight'] -= 1
+                await chunks.aclose()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'provider': self.provider_name, 'pool_size': self.size, 'timeout_seconds': self.timeout, **self.stats}
+
+    async def aclose(self):
+        if self._provider is not None:
+            await self._provider.aclose()
+            self._provider = None
+
+llm_pool = LLMClientPool()
+
+metrics.register(Gauge('lifeplan_llm_in_flight', 'LLM calls currently running', lambda: llm_pool.stats['in_flight']))
+metrics.register(CounterView('lifeplan_llm_calls_total', 'LLM calls started', lambda: llm_pool.stats['calls']))
+metrics.register(Gauge('lifeplan_llm_waiting', 'LLM calls waiting for a pool slot', lambda: llm_pool.stats['waiting']))
+metrics.register(CounterView('lifeplan_llm_timeouts_total', 'LLM calls that hit the pool timeout',
+                             lambda: llm_pool.stats['timeouts']))
+metrics.register(CounterView('lifeplan_llm_queue_timeouts_total', 'LLM calls that timed out waiting for a pool slot',
+                             lambda: llm_pool.stats['queue_timeouts']))
+metrics.register(CounterView('lifeplan_llm_errors_total', 'LLM calls that raised', lambda: llm_pool.stats['errors']))
 
 # Define Models
 class QuestionnaireAnswer(BaseModel):
@@ -94,6 +639,7 @@ class UserProfile(BaseModel):
     skill_trajectory: int  # From Q3 + Q9
     
     archetype: str  # Purpose-driven, Exploratory, Foundation-building
+    scoring_version: Optional[str] = None  # Scoring ruleset that produced the scores
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class PersonalizedPlan(BaseModel):
@@ -109,357 +655,3401 @@ class PersonalizedPlan(BaseModel):
     time_blocks: List[Dict[str, Any]]
     accountability_steps: List[str]
     justification: str
+    source: str = "llm"  # llm, local when served by the rule-based engine, or adapted from a neighbour's plan
+    revision: int = 1  # bumped by every in-place change, so the ETag changes with it
+    token_usage: Optional[Dict[str, Any]] = None  # LLM tokens and latency for the call that produced this plan
+    edit_token_usage: List[Dict[str, Any]] = Field(default_factory=list)  # the same per section regeneration, oldest first
     
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+def to_mongo(model: BaseModel) -> Dict[str, Any]:
+    """Document for insertion; datetimes stay native so they are stored as BSON dates"""
+    return model.model_dump()
+
+def from_mongo(model_class, doc: Dict[str, Any]):
+    """Model from a stored document, skipping validation since we wrote it ourselves"""
+    # Documents written before dates were stored natively hold ISO strings until backfill_dates has run
+    if isinstance(doc.get('created_at'), str):
+        doc['created_at'] = parse_stored_date(doc['created_at'])
+    return model_class.model_construct(**doc)
+
+def parse_stored_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    # Naive strings came from UTC clocks
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+# Collections whose created_at was stored as an ISO string before dates were stored natively
+DATED_COLLECTIONS = ('questionnaire_answers', 'user_profiles', 'personalized_plans')
+
+async def backfill_dates(batch_size: int = 1000) -> Dict[str, int]:
+    """Rewrite string created_at values as BSON dates; idempotent, only string-dated rows are touched"""
+    converted = {}
+    for collection_name in DATED_COLLECTIONS:
+        collection = db[collection_name]
+        converted[collection_name] = 0
+        unparseable = []
+        while True:
+            query = {"created_at": {"$type": "string"}}
+            if unparseable:
+                query["_id"] = {"$nin": unparseable}
+            docs = await collection.find(query, {"_id": 1, "created_at": 1}).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+            operations = []
+            for doc in docs:
+                try:
+                    created_at = parse_stored_date(doc['created_at'])
+                except ValueError:
+                    logging.warning(f"Unparseable created_at {doc['created_at']!r} in {collection_name} {doc['_id']}")
+                    unparseable.append(doc['_id'])
+                    continue
+                # Matching on the old value keeps a concurrent rewrite from being clobbered
+                operations.append(UpdateOne({"_id": doc['_id'], "created_at": doc['created_at']},
+                                            {"$set": {"created_at": created_at}}))
+            if operations:
+                result = await collection.bulk_write(operations, ordered=False)
+                converted[collection_name] += result.modified_count
+    return converted
+
+def projection_for(model_class) -> Dict[str, int]:
+    """Projection of exactly the model's fields"""
+    return {"_id": 0, **{field: 1 for field in model_class.model_fields}}
+
+class OnboardingResult(BaseModel):
+    questionnaire: QuestionnaireAnswer
+    profile: UserProfile
+    plan: Optional[PersonalizedPlan] = None
+    job: Optional[Dict[str, Any]] = None  # Set instead of plan when generation runs as a job
+
+class SectionEditRequest(BaseModel):
+    instructions: Optional[str] = Field(None, max_length=500)  # what the user wants changed, in their words
+
+QUESTIONNAIRE_PROJECTION = projection_for(QuestionnaireAnswer)
+PROFILE_PROJECTION = projection_for(UserProfile)
+PLAN_PROJECTION = projection_for(PersonalizedPlan)
+
 # Scoring Functions
-def calculate_scores(answers: QuestionnaireAnswer) -> Dict[str, int]:
-    """Calculate 6-axis scores from questionnaire answers"""
-    
+# Scoring rules are data: each ruleset is compiled once into a keyword matcher
+# and lookup tables, and new versions can be loaded from SCORING_RULES_PATH
+DEFAULT_SCORING_RULES = {
+    "version": "v1",
+    "keywords": {
+        "purpose": ['help', 'solve', 'create', 'build', 'improve', 'teach', 'mentor', 'impact'],
+        "focus": ['coding', 'writing', 'design', 'research', 'study', 'create', 'build', 'analyze'],
+        "alignment": ['design', 'code', 'write', 'teach', 'manage', 'create', 'build'],
+    },
     # Purpose clarity (Q2 + Q9)
-    purpose_score = 0
-    # Check for purpose keywords in problems and goals
-    purpose_keywords = ['help', 'solve', 'create', 'build', 'improve', 'teach', 'mentor', 'impact']
-    combined_text = (answers.passionate_problems + " " + " ".join(answers.yearly_goals)).lower()
-    purpose_matches = sum(1 for keyword in purpose_keywords if keyword in combined_text)
-    purpose_score = min(100, purpose_matches * 20 + len(answers.yearly_goals) * 15)
-    
+    "purpose": {"per_keyword": 20, "per_goal": 15, "max": 100},
     # Energy & Chronotype (Q5 + Q6 + Q4)
-    energy_score = 0
-    chronotype_scores = {
-        'Early morning': 90,
-        'Late morning': 75,
-        'Afternoon': 60,
-        'Evening': 45,
-        'Night': 30
-    }
-    energy_score += chronotype_scores.get(answers.chronotype, 50)
-    
-    # Add points for existing morning routine
-    if answers.morning_routine.strip() and answers.morning_routine.lower() != 'no':
-        energy_score += 20
-    
-    # Adjust for available time
-    total_weekly_time = (answers.weekday_hours * 5) + (answers.weekend_hours * 2)
-    if total_weekly_time >= 25:
-        energy_score += 10
-    elif total_weekly_time >= 15:
-        energy_score += 5
-    
-    energy_score = min(100, energy_score)
-    
+    "energy": {
+        "chronotype": {
+            'Early morning': 90,
+            'Late morning': 75,
+            'Afternoon': 60,
+            'Evening': 45,
+            'Night': 30
+        },
+        "chronotype_default": 50,
+        "morning_routine_bonus": 20,
+        # (minimum weekly hours, bonus), highest tier first
+        "weekly_time_bonus": [[25, 10], [15, 5]],
+        "max": 100,
+    },
     # Focus capacity (Q1 + Q4 + Q11)
-    focus_score = 0
-    focus_keywords = ['coding', 'writing', 'design', 'research', 'study', 'create', 'build', 'analyze']
-    activities_text = answers.energizing_activities.lower()
-    focus_matches = sum(1 for keyword in focus_keywords if keyword in activities_text)
-    focus_score += focus_matches * 15
-    
-    # Time availability bonus
-    if answers.weekday_hours >= 4:
-        focus_score += 30
-    elif answers.weekday_hours >= 2:
-        focus_score += 20
-    elif answers.weekday_hours >= 1:
-        focus_score += 10
-    
-    # Distraction penalty
-    high_distraction_penalty = len(answers.main_distractions) * 5
-    focus_score = max(20, min(100, focus_score - high_distraction_penalty))
-    
+    "focus": {
+        "per_keyword": 15,
+        "weekday_hours_bonus": [[4, 30], [2, 20], [1, 10]],
+        "per_distraction_penalty": 5,
+        "min": 20,
+        "max": 100,
+    },
     # Habit foundation (Q7 + Q10)
-    habit_score = 0
-    habit_mapping = {
-        '0': 10,
-        '1-2': 35,
-        '3-4': 65,
-        '5+': 90
-    }
-    habit_score += habit_mapping.get(answers.reliable_habits, 35)
-    
-    # Bonus for specific habit change idea
-    if answers.key_habit_change.strip() and len(answers.key_habit_change.strip()) > 10:
-        habit_score += 15
-    
-    habit_score = min(100, habit_score)
-    
+    "habit": {
+        "reliable_habits": {
+            '0': 10,
+            '1-2': 35,
+            '3-4': 65,
+            '5+': 90
+        },
+        "reliable_habits_default": 35,
+        "habit_change_min_length": 10,
+        "habit_change_bonus": 15,
+        "max": 100,
+    },
     # Mindset resilience (Q8 + Q12)
-    mindset_score = 0
-    setback_scores = {
-        'give up': 20,
-        'try again same way': 40,
-        'adjust approach and try again': 75,
-        'learn and iterate immediately': 95
-    }
-    mindset_score += setback_scores.get(answers.setback_reaction, 50)
-    
-    # Commitment level bonus
-    commitment_bonus = (answers.commitment_level - 5) * 5
-    mindset_score += commitment_bonus
-    
-    mindset_score = max(10, min(100, mindset_score))
-    
+    "mindset": {
+        "setback": {
+            'give up': 20,
+            'try again same way': 40,
+            'adjust approach and try again': 75,
+            'learn and iterate immediately': 95
+        },
+        "setback_default": 50,
+        "commitment_baseline": 5,
+        "per_commitment_point": 5,
+        "min": 10,
+        "max": 100,
+    },
     # Skill trajectory (Q3 + Q9)
-    skill_score = 0
-    skill_score += len(answers.existing_skills) * 20  # Up to 60 points for 3 skills
-    
-    # Check if goals align with skills
-    skills_text = " ".join(answers.existing_skills).lower()
-    goals_text = " ".join(answers.yearly_goals).lower()
-    alignment_keywords = ['design', 'code', 'write', 'teach', 'manage', 'create', 'build']
-    
-    skill_alignment = 0
-    for keyword in alignment_keywords:
-        if keyword in skills_text and keyword in goals_text:
-            skill_alignment += 10
-    
-    skill_score += min(40, skill_alignment)
-    skill_score = min(100, skill_score)
-    
-    return {
-        'purpose_clarity': purpose_score,
-        'energy_chronotype': energy_score,
-        'focus_capacity': focus_score,
-        'habit_foundation': habit_score,
-        'mindset_resilience': mindset_score,
-        'skill_trajectory': skill_score
-    }
+    "skill": {"per_skill": 20, "per_alignment": 10, "alignment_max": 40, "max": 100},
+    # First matching archetype wins
+    "archetypes": [
+        {"name": "Purpose-driven Achiever", "when": [
+            ["purpose_clarity", ">=", 70], ["energy_chronotype", ">=", 70], ["focus_capacity", ">=", 60]
+        ]},
+        {"name": "Foundation Builder", "when": [
+            ["habit_foundation", "<", 40], ["mindset_resilience", ">=", 60]
+        ]},
+    ],
+    "default_archetype": "Strategic Explorer",
+}
 
-def determine_archetype(scores: Dict[str, int]) -> str:
-    """Determine user archetype based on scores"""
-    purpose = scores['purpose_clarity']
-    energy = scores['energy_chronotype']
-    focus = scores['focus_capacity']
-    habits = scores['habit_foundation']
-    mindset = scores['mindset_resilience']
-    
-    if purpose >= 70 and energy >= 70 and focus >= 60:
-        return "Purpose-driven Achiever"
-    elif habits < 40 and mindset >= 60:
-        return "Foundation Builder"
-    else:
-        return "Strategic Explorer"
+SCORE_AXES = [
+    'purpose_clarity', 'energy_chronotype', 'focus_capacity',
+    'habit_foundation', 'mindset_resilience', 'skill_trajectory'
+]
+# Vocabulary size at which keyword matching switches to one combined regex
+REGEX_MATCHER_MIN_KEYWORDS = int(os.environ.get('REGEX_MATCHER_MIN_KEYWORDS', '64'))
+COMPARISONS = {
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+    '==': operator.eq,
+}
 
-async def generate_personalized_plan(profile: UserProfile, answers: QuestionnaireAnswer) -> Dict[str, Any]:
-    """Generate personalized plan using Claude"""
-    
-    # Prepare context for Claude
-    user_context = f"""
-User Profile Analysis:
-- Purpose Clarity: {profile.purpose_clarity}/100
-- Energy & Chronotype: {profile.energy_chronotype}/100
-- Focus Capacity: {profile.focus_capacity}/100
-- Habit Foundation: {profile.habit_foundation}/100
-- Mindset Resilience: {profile.mindset_resilience}/100
-- Skill Trajectory: {profile.skill_trajectory}/100
-- Archetype: {profile.archetype}
-
-User Responses:
-- Energizing Activities: {answers.energizing_activities}
-- Passionate Problems: {answers.passionate_problems}
-- Existing Skills: {', '.join(answers.existing_skills)}
-- Available Time: {answers.weekday_hours}h weekdays, {answers.weekend_hours}h weekends
-- Natural Alert Time: {answers.chronotype}
-- Morning Routine: {answers.morning_routine}
-- Current Habits: {answers.reliable_habits}
-- Setback Response: {answers.setback_reaction}
-- 12-Month Goals: {', '.join(answers.yearly_goals)}
-- Key Habit Change: {answers.key_habit_change}
-- Main Distractions: {', '.join(answers.main_distractions)}
-- Commitment Level: {answers.commitment_level}/10
-
-Create a comprehensive productivity roadmap with:
-1. One clear yearly goal
-2. Three supporting pillars
-3. Monthly focus theme
-4. Weekly schedule template
-5. Daily routine structure
-6. Habit stack (3-5 micro-habits)
-7. Specific time blocks based on their chronotype
-8. Accountability measures
+class CompiledScoringRules:
+    """A scoring ruleset compiled into one keyword matcher plus precomputed lookup tables
 
-Format as JSON with these exact keys: yearly_goal, pillars, monthly_focus, weekly_template, daily_template, habit_stack, time_blocks, accountability_steps, justification
-"""
+    Keyword lists are treated as sets and matched as lowercase substrings.
+    """
 
-    try:
-        chat = get_llm_chat()
-        user_message = UserMessage(text=user_context)
-        
-        response = await chat.send_message(user_message)
-        
-        # Try to parse JSON response
-        import json
+    def __init__(self, spec: Dict[str, Any]):
         try:
-            plan_data = json.loads(response)
-            return plan_data
-        except json.JSONDecodeError:
-            # Fallback plan if JSON parsing fails
-            return {
-                "yearly_goal": f"Achieve meaningful progress in {answers.yearly_goals[0] if answers.yearly_goals else 'personal development'}",
-                "pillars": ["Skill Development", "Habit Formation", "Focus Optimization"],
-                "monthly_focus": "Building Foundation",
-                "weekly_template": {
-                    "Monday": "Deep work session",
-                    "Tuesday": "Skill practice",
-                    "Wednesday": "Deep work session", 
-                    "Thursday": "Review and adjust",
-                    "Friday": "Creative work",
-                    "Saturday": "Learning and exploration",
-                    "Sunday": "Planning and reflection"
-                },
-                "daily_template": {
-                    "morning": "Routine + Planning",
-                    "deep_work": "Focused sessions",
-                    "afternoon": "Tasks and meetings",
-                    "evening": "Reflection + Preparation"
-                },
-                "habit_stack": [
-                    {"habit": "Morning planning", "cue": "After coffee", "time": "5 minutes"},
-                    {"habit": "Focus session", "cue": "After morning planning", "time": "25 minutes"},
-                    {"habit": "Evening reflection", "cue": "Before dinner", "time": "5 minutes"}
-                ],
-                "time_blocks": [
-                    {"name": "Deep Work", "time": f"{answers.chronotype} - 90 minutes", "frequency": "Daily"},
-                    {"name": "Skill Practice", "time": "30 minutes", "frequency": "3x/week"}
-                ],
-                "accountability_steps": [
-                    "Weekly review of goals",
-                    "Daily habit tracking",
-                    "Monthly progress assessment"
-                ],
-                "justification": f"Plan tailored for {profile.archetype} with focus on building habits and leveraging {answers.chronotype} energy."
+            self.version = str(spec['version'])
+            self.spec = spec
+            self.keywords = {name: list(words) for name, words in spec['keywords'].items()}
+            self.purpose = spec['purpose']
+            self.energy = spec['energy']
+            self.focus = spec['focus']
+            self.habit = spec['habit']
+            self.mindset = spec['mindset']
+            self.skill = spec['skill']
+            self.archetypes = [
+                (rule['name'], [(axis, COMPARISONS[op], threshold) for axis, op, threshold in rule['when']])
+                for rule in spec['archetypes']
+            ]
+            self.default_archetype = spec['default_archetype']
+            self.weekly_time_bonus = sorted((tuple(tier) for tier in self.energy['weekly_time_bonus']), reverse=True)
+            self.weekday_hours_bonus = sorted((tuple(tier) for tier in self.focus['weekday_hours_bonus']), reverse=True)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid scoring ruleset: {e!r}") from e
+
+        # One bit per distinct keyword across all lists
+        vocabulary = sorted({word.lower() for words in self.keywords.values() for word in words})
+        self.keyword_bits = {word: 1 << i for i, word in enumerate(vocabulary)}
+        self.keyword_masks = {
+            name: sum(self.keyword_bits[word.lower()] for word in set(words))
+            for name, words in self.keywords.items()
+        }
+        self.list_words = {
+            name: tuple((word, self.keyword_bits[word]) for word in sorted({word.lower() for word in words}))
+            for name, words in self.keywords.items()
+        }
+        # CPython's substring search beats a regex scan until the vocabulary gets
+        # large, so only big rulesets are compiled into one combined pattern
+        self.matcher = None
+        if len(vocabulary) >= REGEX_MATCHER_MIN_KEYWORDS:
+            # The longest-first alternation reports the longest keyword starting at an
+            # offset; any other keyword that is a prefix of it is implied, which keeps
+            # results identical to independent `keyword in text` checks
+            self.implied_bits = {
+                word: sum(bit for other, bit in self.keyword_bits.items() if word.startswith(other))
+                for word in vocabulary
             }
-            
-    except Exception as e:
-        logging.error(f"Error generating plan: {e}")
-        raise HTTPException(status_code=500, detail="Error generating personalized plan")
+            self.matcher = re.compile('|'.join(re.escape(word) for word in sorted(vocabulary, key=len, reverse=True)))
 
-# API Routes
-@api_router.get("/")
-async def root():
-    return {"message": "LifePlan AI - Productivity Coaching API"}
+    def match(self, text: str, keyword_list: str) -> int:
+        """Bitmask of the list's keywords occurring in the (already lowercased) text"""
+        bits = 0
+        if self.matcher is None:
+            for word, bit in self.list_words[keyword_list]:
+                if word in text:
+                    bits |= bit
+            return bits
+        search = self.matcher.search
+        found = search(text)
+        while found:
+            bits |= self.implied_bits[found.group()]
+            # Resume one character later so overlapping keywords are still seen
+            found = search(text, found.start() + 1)
+        return bits & self.keyword_masks[keyword_list]
 
-@api_router.post("/questionnaire", response_model=QuestionnaireAnswer)
-async def submit_questionnaire(answers: QuestionnaireAnswer):
-    """Submit questionnaire answers"""
-    try:
-        # Prepare for MongoDB
-        answer_dict = answers.dict()
-        answer_dict['created_at'] = answer_dict['created_at'].isoformat()
+    def score(self, answers: QuestionnaireAnswer) -> Dict[str, int]:
+        """Calculate 6-axis scores from questionnaire answers"""
+        purpose, energy, focus, habit, mindset, skill = (
+            self.purpose, self.energy, self.focus, self.habit, self.mindset, self.skill
+        )
         
-        await db.questionnaire_answers.insert_one(answer_dict)
-        return answers
-    except Exception as e:
-        logging.error(f"Error saving questionnaire: {e}")
-        raise HTTPException(status_code=500, detail="Error saving questionnaire")
-
-@api_router.post("/profile", response_model=UserProfile) 
-async def create_profile(questionnaire_id: str):
-    """Create user profile from questionnaire answers"""
-    try:
-        # Get questionnaire answers
-        answer_doc = await db.questionnaire_answers.find_one({"id": questionnaire_id})
-        if not answer_doc:
-            raise HTTPException(status_code=404, detail="Questionnaire not found")
+        # Purpose clarity (Q2 + Q9)
+        # Check for purpose keywords in problems and goals
+        combined_text = (answers.passionate_problems + " " + " ".join(answers.yearly_goals)).lower()
+        purpose_matches = self.match(combined_text, 'purpose').bit_count()
+        purpose_score = min(purpose['max'], purpose_matches * purpose['per_keyword'] + len(answers.yearly_goals) * purpose['per_goal'])
         
-        # Convert back from MongoDB format
-        if isinstance(answer_doc['created_at'], str):
-            answer_doc['created_at'] = datetime.fromisoformat(answer_doc['created_at'])
-            
-        answers = QuestionnaireAnswer(**answer_doc)
+        # Energy & Chronotype (Q5 + Q6 + Q4)
+        energy_score = energy['chronotype'].get(answers.chronotype, energy['chronotype_default'])
         
-        # Calculate scores
-        scores = calculate_scores(answers)
-        archetype = determine_archetype(scores)
+        # Add points for existing morning routine
+        if answers.morning_routine.strip() and answers.morning_routine.lower() != 'no':
+            energy_score += energy['morning_routine_bonus']
         
-        # Create profile
-        profile = UserProfile(
-            questionnaire_id=questionnaire_id,
-            purpose_clarity=scores['purpose_clarity'],
-            energy_chronotype=scores['energy_chronotype'], 
-            focus_capacity=scores['focus_capacity'],
-            habit_foundation=scores['habit_foundation'],
-            mindset_resilience=scores['mindset_resilience'],
-            skill_trajectory=scores['skill_trajectory'],
-            archetype=archetype
-        )
+        # Adjust for available time
+        total_weekly_time = (answers.weekday_hours * 5) + (answers.weekend_hours * 2)
+        for minimum, bonus in self.weekly_time_bonus:
+            if total_weekly_time >= minimum:
+                energy_score += bonus
+                break
+        energy_score = min(energy['max'], energy_score)
         
-        # Save to database
-        profile_dict = profile.dict()
-        profile_dict['created_at'] = profile_dict['created_at'].isoformat()
+        # Focus capacity (Q1 + Q4 + Q11)
+        focus_score = self.match(answers.energizing_activities.lower(), 'focus').bit_count() * focus['per_keyword']
         
-        await db.user_profiles.insert_one(profile_dict)
-        return profile
+        # Time availability bonus
+        for minimum, bonus in self.weekday_hours_bonus:
+            if answers.weekday_hours >= minimum:
+                focus_score += bonus
+                break
         
-    except Exception as e:
-        logging.error(f"Error creating profile: {e}")
-        raise HTTPException(status_code=500, detail="Error creating profile")
-
-@api_router.post("/plan", response_model=PersonalizedPlan)
-async def generate_plan(profile_id: str):
-    """Generate personalized plan for user profile"""
-    try:
-        # Get profile
-        profile_doc = await db.user_profiles.find_one({"id": profile_id})
-        if not profile_doc:
-            raise HTTPException(status_code=404, detail="Profile not found")
-            
-        # Convert from MongoDB format
-        if isinstance(profile_doc['created_at'], str):
-            profile_doc['created_at'] = datetime.fromisoformat(profile_doc['created_at'])
-        profile = UserProfile(**profile_doc)
+        # Distraction penalty
+        high_distraction_penalty = len(answers.main_distractions) * focus['per_distraction_penalty']
+        focus_score = max(focus['min'], min(focus['max'], focus_score - high_distraction_penalty))
         
-        # Get questionnaire answers
-        answer_doc = await db.questionnaire_answers.find_one({"id": profile.questionnaire_id})
-        if isinstance(answer_doc['created_at'], str):
-            answer_doc['created_at'] = datetime.fromisoformat(answer_doc['created_at'])
-        answers = QuestionnaireAnswer(**answer_doc)
+        # Habit foundation (Q7 + Q10)
+        habit_score = habit['reliable_habits'].get(answers.reliable_habits, habit['reliable_habits_default'])
         
-        # Generate plan
-        plan_data = await generate_personalized_plan(profile, answers)
+        # Bonus for specific habit change idea
+        habit_change = answers.key_habit_change.strip()
+        if habit_change and len(habit_change) > habit['habit_change_min_length']:
+            habit_score += habit['habit_change_bonus']
+        habit_score = min(habit['max'], habit_score)
         
-        # Create plan object
-        plan = PersonalizedPlan(
-            profile_id=profile_id,
-            yearly_goal=plan_data['yearly_goal'],
-            pillars=plan_data['pillars'],
-            monthly_focus=plan_data['monthly_focus'],
-            weekly_template=plan_data['weekly_template'],
-            daily_template=plan_data['daily_template'],
-            habit_stack=plan_data['habit_stack'],
-            time_blocks=plan_data['time_blocks'],
-            accountability_steps=plan_data['accountability_steps'],
-            justification=plan_data['justification']
-        )
+        # Mindset resilience (Q8 + Q12)
+        mindset_score = mindset['setback'].get(answers.setback_reaction, mindset['setback_default'])
         
-        # Save to database
-        plan_dict = plan.dict()
-        plan_dict['created_at'] = plan_dict['created_at'].isoformat()
+        # Commitment level bonus
+        mindset_score += (answers.commitment_level - mindset['commitment_baseline']) * mindset['per_commitment_point']
+        mindset_score = max(mindset['min'], min(mindset['max'], mindset_score))
         
-        await db.personalized_plans.insert_one(plan_dict)
-        return plan
+        # Skill trajectory (Q3 + Q9)
+        skill_score = len(answers.existing_skills) * skill['per_skill']
         
-    except Exception as e:
-        logging.error(f"Error generating plan: {e}")
-        raise HTTPException(status_code=500, detail="Error generating plan")
+        # Check if goals align with skills
+        skill_alignment = 0
+        skills_bits = self.match(" ".join(answers.existing_skills).lower(), 'alignment')
+        if skills_bits:
+            goals_bits = self.match(" ".join(answers.yearly_goals).lower(), 'alignment')
+            skill_alignment = (skills_bits & goals_bits).bit_count() * skill['per_alignment']
+        
+        skill_score += min(skill['alignment_max'], skill_alignment)
+        skill_score = min(skill['max'], skill_score)
+        
+        return {
+            'purpose_clarity': purpose_score,
+            'energy_chronotype': energy_score,
+            'focus_capacity': focus_score,
+            'habit_foundation': habit_score,
+            'mindset_resilience': mindset_score,
+            'skill_trajectory': skill_score
+        }
 
-@api_router.get("/plan/{profile_id}", response_model=PersonalizedPlan)
-async def get_plan(profile_id: str):
-    """Get existing plan for profile"""
+    def archetype(self, scores: Dict[str, int]) -> str:
+        """Determine user archetype based on scores"""
+        for name, conditions in self.archetypes:
+            for axis, compare, threshold in conditions:
+                if not compare(scores[axis], threshold):
+                    break
+            else:
+                return name
+        return self.default_archetype
+
+SCORING_RULES_PATH = os.environ.get('SCORING_RULES_PATH')
+SCORING_RULES_RELOAD_SECONDS = float(os.environ.get('SCORING_RULES_RELOAD_SECONDS', '5'))
+
+class ScoringRuleRegistry:
+    """Versioned scoring rulesets with hot reload from disk and percentage-based A/B assignment
+
+    The rules file holds either a single ruleset or
+    {"active": "<version>", "rulesets": [...], "experiment": {"version": "<version>", "percent": 10}}.
+    """
+
+    def __init__(self, path: Optional[str] = SCORING_RULES_PATH, reload_seconds: float = SCORING_RULES_RELOAD_SECONDS):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        # Compiled on first use or during startup warm-up rather than at import
+        self.versions: Dict[str, CompiledScoringRules] = {}
+        self.active_version: Optional[str] = None
+        self.experiment: Optional[Dict[str, Any]] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    def _load_builtin(self):
+        builtin = CompiledScoringRules(DEFAULT_SCORING_RULES)
+        self.versions = {builtin.version: builtin}
+        self.active_version = builtin.version
+
+    def ensure_loaded(self):
+        """Compile the built-in rules and read the rules file once"""
+        if not self.versions:
+            self.reload()
+
+    def reload(self) -> bool:
+        """Load the rules file if it changed; a broken file keeps the current rules"""
+        if not self.versions:
+            self._load_builtin()
+        self._checked_at = time.monotonic()
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return False
+            with open(self.path) as f:
+                config = json.load(f)
+            if 'rulesets' not in config:
+                config = {'active': config['version'], 'rulesets': [config]}
+            versions = dict(self.versions)
+            for spec in config['rulesets']:
+                compiled = CompiledScoringRules(spec)
+                versions[compiled.version] = compiled
+            active = config.get('active', self.active_version)
+            experiment = config.get('experiment')
+            for version in [active] + ([experiment['version']] if experiment else []):
+                if version not in versions:
+                    raise ValueError(f"Unknown scoring rules version {version}")
+        except Exception as e:
+            logging.error(f"Could not load scoring rules from {self.path}: {e}")
+            return False
+        self.versions, self.active_version, self.experiment = versions, active, experiment
+        self._mtime = mtime
+        logging.info(f"Loaded scoring rules {sorted(versions)}; active {active}")
+        return True
+
+    def _maybe_reload(self):
+        if self.path and time.monotonic() - self._checked_at >= self.reload_seconds:
+            self.reload()
+
+    @property
+    def active(self) -> CompiledScoringRules:
+        self.ensure_loaded()
+        self._maybe_reload()
+        return self.versions[self.active_version]
+
+    def get(self, version: Optional[str] = None) -> CompiledScoringRules:
+        if version is None:
+            return self.active
+        self.ensure_loaded()
+        self._maybe_reload()
+        if version not in self.versions:
+            raise KeyError(version)
+        return self.versions[version]
+
+    def for_questionnaire(self, questionnaire_id: str) -> CompiledScoringRules:
+        """Ruleset for a questionnaire; a stable hash of its id decides the experiment arm"""
+        rules = self.active
+        experiment = self.experiment
+        if experiment:
+            bucket = int(hashlib.sha256(questionnaire_id.encode('utf-8')).hexdigest()[:8], 16) % 100
+            if bucket < experiment.get('percent', 0):
+                return self.versions[experiment['version']]
+        return rules
+
+    def describe(self) -> Dict[str, Any]:
+        self.ensure_loaded()
+        return {
+            'active': self.active_version,
+            'versions': sorted(self.versions),
+            'experiment': self.experiment,
+            'path': self.path,
+        }
+
+scoring_rules = ScoringRuleRegistry()
+
+def calculate_scores(answers: QuestionnaireAnswer, rules: Optional[CompiledScoringRules] = None) -> Dict[str, int]:
+    """Calculate 6-axis scores from questionnaire answers"""
+    return (rules or scoring_rules.active).score(answers)
+
+def determine_archetype(scores: Dict[str, int], rules: Optional[CompiledScoringRules] = None) -> str:
+    """Determine user archetype based on scores"""
+    return (rules or scoring_rules.active).archetype(scores)
+
+# Batch Scoring
+RESCORE_PROJECTION = {"_id": 0, **{field: 1 for field in [
+    'id', 'energizing_activities', 'passionate_problems', 'existing_skills', 'weekday_hours',
+    'weekend_hours', 'chronotype', 'morning_routine', 'reliable_habits', 'setback_reaction',
+    'yearly_goals', 'key_habit_change', 'main_distractions', 'commitment_level'
+]}}
+
+def keyword_hits(texts: np.ndarray, keywords: List[str]) -> np.ndarray:
+    """Per-row count of keywords that occur as substrings"""
+    hits = np.zeros(len(texts), dtype=np.int64)
+    for keyword in set(keywords):
+        hits += np.char.find(texts, keyword.lower()) >= 0
+    return hits
+
+def tiered_bonus(values: np.ndarray, tiers: List[tuple]) -> np.ndarray:
+    """Bonus of the highest (minimum, bonus) tier each value reaches"""
+    return np.select([values >= minimum for minimum, _ in tiers], [bonus for _, bonus in tiers], 0)
+
+def calculate_scores_batch(docs: List[Dict[str, Any]], rules: Optional[CompiledScoringRules] = None) -> Dict[str, np.ndarray]:
+    """Vectorized calculate_scores over many questionnaire documents; results match the scalar version"""
+    rules = rules or scoring_rules.active
+
+    def text_column(values) -> np.ndarray:
+        return np.array(list(values), dtype=str) if docs else np.array([], dtype=str)
+
+    def int_column(values) -> np.ndarray:
+        return np.fromiter(values, dtype=np.int64, count=len(docs))
+
+    goals_text = text_column(" ".join(d['yearly_goals']).lower() for d in docs)
+    goal_counts = int_column(len(d['yearly_goals']) for d in docs)
+    weekday_hours = int_column(d['weekday_hours'] for d in docs)
+    weekend_hours = int_column(d['weekend_hours'] for d in docs)
+
+    # Purpose clarity (Q2 + Q9)
+    combined_text = text_column((d['passionate_problems'] + " " + " ".join(d['yearly_goals'])).lower() for d in docs)
+    purpose = np.minimum(rules.purpose['max'], keyword_hits(combined_text, rules.keywords['purpose']) * rules.purpose['per_keyword']
+                         + goal_counts * rules.purpose['per_goal'])
+
+    # Energy & Chronotype (Q5 + Q6 + Q4)
+    energy = int_column(rules.energy['chronotype'].get(d['chronotype'], rules.energy['chronotype_default']) for d in docs)
+    routine = text_column(d['morning_routine'] for d in docs)
+    has_routine = (np.char.str_len(np.char.strip(routine)) > 0) & (np.char.lower(routine) != 'no')
+    energy = energy + np.where(has_routine, rules.energy['morning_routine_bonus'], 0)
+    energy = energy + tiered_bonus(weekday_hours * 5 + weekend_hours * 2, rules.weekly_time_bonus)
+    energy = np.minimum(rules.energy['max'], energy)
+
+    # Focus capacity (Q1 + Q4 + Q11)
+    activities_text = text_column(d['energizing_activities'].lower() for d in docs)
+    focus = keyword_hits(activities_text, rules.keywords['focus']) * rules.focus['per_keyword']
+    focus = focus + tiered_bonus(weekday_hours, rules.weekday_hours_bonus)
+    distractions = int_column(len(d['main_distractions']) for d in docs)
+    focus = np.maximum(rules.focus['min'], np.minimum(rules.focus['max'], focus - distractions * rules.focus['per_distraction_penalty']))
+
+    # Habit foundation (Q7 + Q10)
+    habits = int_column(rules.habit['reliable_habits'].get(d['reliable_habits'], rules.habit['reliable_habits_default']) for d in docs)
+    habit_change = text_column(d['key_habit_change'] for d in docs)
+    habit_change_length = np.char.str_len(np.char.strip(habit_change))
+    habit_bonus = np.where((habit_change_length > 0) & (habit_change_length > rules.habit['habit_change_min_length']),
+                           rules.habit['habit_change_bonus'], 0)
+    habits = np.minimum(rules.habit['max'], habits + habit_bonus)
+
+    # Mindset resilience (Q8 + Q12)
+    mindset = int_column(rules.mindset['setback'].get(d['setback_reaction'], rules.mindset['setback_default']) for d in docs)
+    commitment = int_column(d['commitment_level'] for d in docs)
+    mindset = mindset + (commitment - rules.mindset['commitment_baseline']) * rules.mindset['per_commitment_point']
+    mindset = np.maximum(rules.mindset['min'], np.minimum(rules.mindset['max'], mindset))
+
+    # Skill trajectory (Q3 + Q9)
+    skill_counts = int_column(len(d['existing_skills']) for d in docs)
+    skills_text = text_column(" ".join(d['existing_skills']).lower() for d in docs)
+    alignment = np.zeros(len(docs), dtype=np.int64)
+    for keyword in set(rules.keywords['alignment']):
+        keyword = keyword.lower()
+        alignment += ((np.char.find(skills_text, keyword) >= 0) & (np.char.find(goals_text, keyword) >= 0)) * rules.skill['per_alignment']
+    skill = np.minimum(rules.skill['max'], skill_counts * rules.skill['per_skill'] + np.minimum(rules.skill['alignment_max'], alignment))
+
+    return {
+        'purpose_clarity': purpose,
+        'energy_chronotype': energy,
+        'focus_capacity': focus,
+        'habit_foundation': habits,
+        'mindset_resilience': mindset,
+        'skill_trajectory': skill
+    }
+
+def determine_archetype_batch(scores: Dict[str, np.ndarray], rules: Optional[CompiledScoringRules] = None) -> np.ndarray:
+    """Vectorized determine_archetype"""
+    rules = rules or scoring_rules.active
+    size = len(scores['purpose_clarity'])
+    matches = []
+    for _, conditions in rules.archetypes:
+        matched = np.ones(size, dtype=bool)
+        for axis, compare, threshold in conditions:
+            matched &= compare(scores[axis], threshold)
+        matches.append(matched)
+    return np.select(matches, [name for name, _ in rules.archetypes], rules.default_archetype)
+
+async def rescore_all_profiles(batch_size: int = 1000, dry_run: bool = False, verify: bool = False,
+                               version: Optional[str] = None) -> Dict[str, Any]:
+    """Recompute every profile's scores and archetype from its questionnaire in cursor batches
+
+    Without a version each questionnaire keeps the ruleset of its experiment arm.
+    """
+    pinned = scoring_rules.get(version) if version is not None else None
+    started = time.perf_counter()
+    report = {
+        'questionnaires': 0, 'skipped': 0, 'profiles_matched': 0, 'profiles_updated': 0,
+        'batches': 0, 'mismatches': 0, 'dry_run': dry_run, 'scoring_version': version, 'scoring_versions': {},
+    }
+
+    async def flush(batch: List[Dict[str, Any]]):
+        groups: Dict[str, tuple] = {}
+        for doc in batch:
+            rules = pinned or scoring_rules.for_questionnaire(doc['id'])
+            groups.setdefault(rules.version, (rules, []))[1].append(doc)
+        operations = []
+        for rules, docs in groups.values():
+            report['scoring_versions'][rules.version] = report['scoring_versions'].get(rules.version, 0) + len(docs)
+            scores = calculate_scores_batch(docs, rules)
+            archetypes = determine_archetype_batch(scores, rules)
+            for i, doc in enumerate(docs):
+                update = {axis: int(scores[axis][i]) for axis in SCORE_AXES}
+                update['archetype'] = str(archetypes[i])
+                if verify:
+                    # Cross-check against the scalar implementation
+                    expected = calculate_scores(QuestionnaireAnswer(**doc), rules)
+                    expected['archetype'] = determine_archetype(expected, rules)
+                    if expected != update:
+                        report['mismatches'] += 1
+                        logging.warning(f"Batch score mismatch for questionnaire {doc['id']}: {update} != {expected}")
+                update['scoring_version'] = rules.version
+                operations.append(UpdateMany({"questionnaire_id": doc['id']}, {"$set": update}))
+        report['batches'] += 1
+        if operations and not dry_run:
+            result = await db.user_profiles.bulk_write(operations, ordered=False)
+            report['profiles_matched'] += result.matched_count
+            report['profiles_updated'] += result.modified_count
+
+    batch = []
+    async for doc in db.questionnaire_answers.find({}, RESCORE_PROJECTION).batch_size(batch_size):
+        if any(field not in doc for field in RESCORE_PROJECTION if field != '_id'):
+            report['skipped'] += 1
+            continue
+        batch.append(doc)
+        report['questionnaires'] += 1
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    if report['profiles_updated']:
+        # Scores moved, so the incremental rollups and cached profiles no longer add up
+        report['rollups'] = await rebuild_rollups()
+        await shared_cache.invalidate('profiles')
+
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 3)
+    report['questionnaires_per_second'] = round(report['questionnaires'] / elapsed, 1) if elapsed else 0.0
+    return report
+
+# Analytics Rollups
+# Pre-aggregated archetype counts and axis sums/histograms, one document for all
+# time and one per UTC day. Every profile insert $incs them, so dashboards read a
+# handful of small documents instead of aggregating user_profiles.
+ROLLUP_HISTOGRAM_BIN = 10
+ROLLUP_HISTOGRAM_BINS = [str(low) for low in range(0, 100, ROLLUP_HISTOGRAM_BIN)]
+ROLLUP_MAX_DAYS = 366
+
+def score_bin(score: int) -> str:
+    return ROLLUP_HISTOGRAM_BINS[max(0, min(int(score) // ROLLUP_HISTOGRAM_BIN, len(ROLLUP_HISTOGRAM_BINS) - 1))]
+
+def rollup_keys(created_at: Any) -> List[str]:
+    if isinstance(created_at, str):
+        created_at = parse_stored_date(created_at)
+    return ['all', f"day:{created_at:%Y-%m-%d}"]
+
+def rollup_increments(profiles: List[Dict[str, Any]], increments: Optional[Dict[str, Dict[str, int]]] = None):
+    """Accumulate the $inc fields for each rollup document the given profile documents fall into"""
+    increments = {} if increments is None else increments
+    for profile in profiles:
+        for key in rollup_keys(profile['created_at']):
+            inc = increments.setdefault(key, {})
+            inc['profiles'] = inc.get('profiles', 0) + 1
+            archetype = f"archetypes.{profile['archetype'].replace('.', '_')}"
+            inc[archetype] = inc.get(archetype, 0) + 1
+            for axis in SCORE_AXES:
+                score = profile[axis]
+                total = f"axes.{axis}.sum"
+                inc[total] = inc.get(total, 0) + score
+                bucket = f"axes.{axis}.histogram.{score_bin(score)}"
+                inc[bucket] = inc.get(bucket, 0) + 1
+    return increments
+
+async def record_profile_rollups(profiles: List[Dict[str, Any]]):
+    """Fold newly inserted profiles into the rollups; a failure here never fails the insert"""
+    if not profiles:
+        return
+    now = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne({"key": key}, {"$inc": inc, "$set": {"updated_at": now}}, upsert=True)
+        for key, inc in rollup_increments(profiles).items()
+    ]
     try:
-        plan_doc = await db.personalized_plans.find_one({"profile_id": profile_id})
-        if not plan_doc:
-            raise HTTPException(status_code=404, detail="Plan not found")
-            
-        # Convert from MongoDB format
-        if isinstance(plan_doc['created_at'], str):
-            plan_doc['created_at'] = datetime.fromisoformat(plan_doc['created_at'])
-            
-        return PersonalizedPlan(**plan_doc)
-        
+        await db.analytics_rollups.bulk_write(operations, ordered=False)
     except Exception as e:
-        logging.error(f"Error retrieving plan: {e}")
-        raise HTTPException(status_code=500, detail="Error retrieving plan")
+        logging.warning(f"Analytics rollup update failed, run rebuild-rollups to repair: {e}")
+
+def expand_dotted(flat: Dict[str, Any]) -> Dict[str, Any]:
+    """{'a.b': 1} -> {'a': {'b': 1}}"""
+    doc = {}
+    for path, value in flat.items():
+        *parents, leaf = path.split('.')
+        node = doc
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = value
+    return doc
+
+async def rebuild_rollups(batch_size: int = 5000) -> Dict[str, Any]:
+    """Recompute every rollup document from user_profiles"""
+    started = time.perf_counter()
+    projection = {"_id": 0, "created_at": 1, "archetype": 1, **{axis: 1 for axis in SCORE_AXES}}
+    increments = {}
+    batch = []
+    profiles = 0
+    async for doc in db.user_profiles.find({}, projection).batch_size(batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            rollup_increments(batch, increments)
+            profiles += len(batch)
+            batch = []
+    rollup_increments(batch, increments)
+    profiles += len(batch)
+
+    # Replace in place rather than clearing first, so dashboards never see an empty rollup
+    now = datetime.now(timezone.utc)
+    operations = [
+        ReplaceOne({"key": key}, {"key": key, **expand_dotted(inc), "updated_at": now}, upsert=True)
+        for key, inc in increments.items()
+    ]
+    if operations:
+        await db.analytics_rollups.bulk_write(operations, ordered=False)
+    removed = await db.analytics_rollups.delete_many({"key": {"$nin": list(increments)}})
+    return {
+        'profiles': profiles,
+        'rollups': len(increments),
+        'removed': removed.deleted_count,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+def summarize_rollup(doc: Optional[Dict[str, Any]], histograms: bool = True) -> Dict[str, Any]:
+    doc = doc or {}
+    count = doc.get('profiles', 0)
+    axes = {}
+    for axis in SCORE_AXES:
+        stats = doc.get('axes', {}).get(axis, {})
+        axes[axis] = {'average': round(stats.get('sum', 0) / count, 1) if count else None}
+        if histograms:
+            histogram = stats.get('histogram', {})
+            axes[axis]['histogram'] = {low: histogram.get(low, 0) for low in ROLLUP_HISTOGRAM_BINS}
+    return {'profiles': count, 'archetypes': doc.get('archetypes', {}), 'axes': axes}
+
+async def read_rollups(days: int = 30) -> Dict[str, Any]:
+    """Overall distribution plus one entry per day for the last `days` days, oldest first"""
+    today = datetime.now(timezone.utc).date()
+    dates = [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+    keys = ['all'] + [f"day:{date}" for date in dates]
+    docs = await db.analytics_rollups.find({"key": {"$in": keys}}, {"_id": 0}).to_list(len(keys))
+    by_key = {doc['key']: doc for doc in docs}
+    return {
+        'overall': summarize_rollup(by_key.get('all')),
+        'daily': [{'date': date, **summarize_rollup(by_key.get(f"day:{date}"), histograms=False)} for date in dates],
+        'updated_at': by_key.get('all', {}).get('updated_at'),
+    }
+
+# Shared Cache
+# Cross-process tier for generated plans and computed profiles: one SQLite file in WAL mode
+# on local disk, shared by every worker on the host and kept across worker restarts.
+# Readers never take a lock or block the writer; writes are single-row upserts made on
+# a worker thread. Once stored payloads pass SHARED_CACHE_MAX_BYTES the least recently
+# written rows are evicted. The default path is the same for the server, its gunicorn
+# workers and the CLI, so invalidations from any of them reach the others, and is named
+# after DB_NAME so deployments on one host never read each other's entries; an empty
+# SHARED_CACHE_PATH turns the tier off.
+SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH', os.path.join(
+    os.environ.get('TMPDIR', '/tmp'),
+    f"lifeplan-shared-cache-{re.sub(r'[^A-Za-z0-9_.-]', '_', os.environ.get('DB_NAME', 'default'))}.sqlite3"
+))
+SHARED_CACHE_MAX_BYTES = int(os.environ.get('SHARED_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+SHARED_CACHE_PROFILE_TTL_SECONDS = int(os.environ.get('SHARED_CACHE_PROFILE_TTL_SECONDS', '3600'))
+# Writes between checks of the stored size; eviction trims to 90% of the limit
+SHARED_CACHE_EVICT_INTERVAL = 64
+SHARED_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    written_at REAL NOT NULL,
+    UNIQUE (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_written_at ON entries (written_at);
+"""
+
+class SharedCache:
+    """Size-bounded key/value store in a SQLite WAL file; values are JSON-serialized with orjson"""
+
+    def __init__(self, path: str = SHARED_CACHE_PATH, max_bytes: int = SHARED_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._pid: Optional[int] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        self._writes_since_check = 0
+        # (namespace, 'hit' | 'miss') -> count, for this process
+        self.lookups: Dict[tuple, int] = {}
+        self.stats = {'writes': 0, 'evictions': 0, 'errors': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # In WAL mode NORMAL only syncs on checkpoint; a crash can lose the last writes, which a cache can afford
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _connections(self) -> tuple:
+        # SQLite handles must not cross fork(), so a worker forked after the parent opened the file reconnects
+        if self._pid != os.getpid():
+            writer = self._connect()
+            writer.executescript(SHARED_CACHE_SCHEMA)
+            self._reader, self._writer = self._connect(), writer
+            self._pid = os.getpid()
+        return self._reader, self._writer
+
+    def _failed(self, action: str, error: Exception):
+        self.stats['errors'] += 1
+        logging.warning(f"Shared cache {action} failed: {error}")
+
+    def _count(self, namespace: str, result: str):
+        self.lookups[(namespace, result)] = self.lookups.get((namespace, result), 0) + 1
+
+    def get(self, namespace: str, key: str) -> Optional[tuple]:
+        """(value, expires_at) for a live entry, else None"""
+        if not self.enabled:
+            return None
+        try:
+            reader, _ = self._connections()
+            row = reader.execute(
+                'SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed('read', e)
+            return None
+        if row is None or row[1] <= time.time():
+            self._count(namespace, 'miss')
+            return None
+        self._count(namespace, 'hit')
+        return orjson.loads(row[0]), row[1]
+
+    async def set(self, namespace: str, key: str, value: Any, expires_at: float):
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._write, namespace, key, orjson.dumps(value), expires_at)
+        except (sqlite3.Error, TypeError) as e:
+            self._failed('write', e)
+
+    async def invalidate(self, namespace: str, key: Optional[str] = None):
+        """Drop one entry, or the whole namespace when key is None"""
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._delete, namespace, key)
+        except sqlite3.Error as e:
+            self._failed('delete', e)
+
+    def _write(self, namespace: str, key: str, payload: bytes, expires_at: float):
+        with self._write_lock:
+            _, writer = self._connections()
+            writer.execute(
+                'INSERT INTO entries (namespace, key, value, size, expires_at, written_at) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, size = excluded.size, '
+                'expires_at = excluded.expires_at, written_at = excluded.written_at',
+                (namespace, key, payload, len(payload), expires_at, time.time())
+            )
+            self.stats['writes'] += 1
+            self._writes_since_check += 1
+            if self._writes_since_check >= SHARED_CACHE_EVICT_INTERVAL:
+                self._writes_since_check = 0
+                self._evict(writer)
+
+    def _delete(self, namespace: str, key: Optional[str]):
+        with self._write_lock:
+            _, writer = self._connections()
+            if key is None:
+                writer.execute('DELETE FROM entries WHERE namespace = ?', (namespace,))
+            else:
+                writer.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def _evict(self, writer: sqlite3.Connection):
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            writer.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+            stored = writer.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            excess = stored - int(self.max_bytes * 0.9)
+            if stored > self.max_bytes:
+                doomed = []
+                for rowid, size in writer.execute('SELECT rowid, size FROM entries ORDER BY written_at'):
+                    doomed.append((rowid,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                writer.executemany('DELETE FROM entries WHERE rowid = ?', doomed)
+                self.stats['evictions'] += len(doomed)
+            writer.execute('COMMIT')
+        except BaseException:
+            writer.execute('ROLLBACK')
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {'enabled': False}
+        try:
+            reader, _ = self._connections()
+            entries, stored = reader.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        except sqlite3.Error as e:
+            self._failed('read', e)
+            entries = stored = None
+        lookups = {}
+        for (namespace, result), count in self.lookups.items():
+            lookups.setdefault(namespace, {'hit': 0, 'miss': 0})[result] = count
+        for counts in lookups.values():
+            counts['hit_rate'] = round(counts['hit'] / (counts['hit'] + counts['miss']), 4)
+        return {'enabled': True, 'path': self.path, 'max_bytes': self.max_bytes, 'stored_bytes': stored,
+                'entries': entries, 'pid': os.getpid(), 'lookups': lookups, **self.stats}
+
+shared_cache = SharedCache()
+
+metrics.register(CounterView(
+    'lifeplan_shared_cache_lookups_total', 'Shared on-disk cache lookups by namespace and result',
+    lambda: dict(shared_cache.lookups), ('namespace', 'result')
+))
+metrics.register(CounterView(
+    'lifeplan_shared_cache_evictions_total', 'Shared cache entries evicted to stay under the size limit',
+    lambda: shared_cache.stats['evictions']
+))
+
+# Plan Cache
+# Bump whenever the prompt or model changes so stale plans are not served
+PLAN_PROMPT_VERSION = "v2"
+PLAN_CACHE_MAX_ENTRIES = int(os.environ.get('PLAN_CACHE_MAX_ENTRIES', '1024'))
+PLAN_CACHE_TTL_SECONDS = int(os.environ.get('PLAN_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+
+def plan_cache_key(profile: UserProfile, answers: QuestionnaireAnswer) -> str:
+    """Canonical hash of everything that goes into the plan prompt"""
+    payload = {
+        'prompt_version': PLAN_PROMPT_VERSION,
+        'profile': profile.model_dump(exclude={'id', 'questionnaire_id', 'scoring_version', 'created_at'}),
+        'answers': answers.model_dump(exclude={'id', 'created_at'}),
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class PlanCache:
+    """Three-tier plan cache: in-process LRU with TTL, then the shared on-disk cache, then a Mongo collection"""
+
+    def __init__(self, collection_name: str = 'plan_cache', max_entries: int = PLAN_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = PLAN_CACHE_TTL_SECONDS):
+        self.collection_name = collection_name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {'memory_hits': 0, 'shared_hits': 0, 'mongo_hits': 0, 'misses': 0, 'writes': 0}
+
+    def _remember(self, key: str, plan_data: Dict[str, Any], expires_at: float):
+        self._entries[key] = (expires_at, plan_data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, plan_data = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return copy.deepcopy(plan_data)
+            del self._entries[key]
+
+        shared = shared_cache.get('plans', key)
+        if shared is not None:
+            plan_data, expires_at = shared
+            self._remember(key, plan_data, expires_at)
+            self.stats['shared_hits'] += 1
+            return copy.deepcopy(plan_data)
+
+        try:
+            doc = await db[self.collection_name].find_one(
+                {"key": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"_id": 0, "plan_data": 1, "expires_at": 1}
+            )
+        except Exception as e:
+            logging.warning(f"Plan cache lookup failed: {e}")
+            doc = None
+
+        if not doc:
+            self.stats['misses'] += 1
+            return None
+
+        expires_at = doc['expires_at']
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        self._remember(key, doc['plan_data'], expires_at.timestamp())
+        await shared_cache.set('plans', key, doc['plan_data'], expires_at.timestamp())
+        self.stats['mongo_hits'] += 1
+        return copy.deepcopy(doc['plan_data'])
+
+    async def set(self, key: str, plan_data: Dict[str, Any], neighbour: Optional[Dict[str, Any]] = None):
+        """Store a plan; neighbour makes it a candidate for nearest-neighbour reuse"""
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        self._remember(key, copy.deepcopy(plan_data), expires_at.timestamp())
+        await shared_cache.set('plans', key, plan_data, expires_at.timestamp())
+        self.stats['writes'] += 1
+        try:
+            # expires_at stays a native date so a TTL index can reap old entries
+            await db[self.collection_name].update_one(
+                {"key": key},
+                {"$set": {"plan_data": plan_data, "created_at": now, "expires_at": expires_at,
+                          **({"neighbour": neighbour} if neighbour else {})}},
+                upsert=True
+            )
+        except Exception as e:
+            logging.warning(f"Plan cache write failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        hits = self.stats['memory_hits'] + self.stats['shared_hits'] + self.stats['mongo_hits']
+        lookups = hits + self.stats['misses']
+        return {
+            **self.stats,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+plan_cache = PlanCache()
+
+metrics.register(CounterView(
+    'lifeplan_plan_cache_lookups_total', 'Plan cache lookups by result',
+    lambda: {(result,): plan_cache.stats[key] for result, key in
+             (('memory_hit', 'memory_hits'), ('shared_hit', 'shared_hits'), ('mongo_hit', 'mongo_hits'),
+              ('miss', 'misses'))},
+    ('result',)
+))
+
+# Plan sections, in the order the prompt asks for them
+PLAN_SECTIONS = [
+    'yearly_goal', 'pillars', 'monthly_focus', 'weekly_template', 'daily_template',
+    'habit_stack', 'time_blocks', 'accountability_steps', 'justification'
+]
+
+# Prompt compaction: free text is normalized and capped so one long answer cannot blow up the prompt
+PLAN_PROMPT_TEXT_MAX_CHARS = int(os.environ.get('PLAN_PROMPT_TEXT_MAX_CHARS', '280'))
+PLAN_PROMPT_LIST_MAX_ITEMS = int(os.environ.get('PLAN_PROMPT_LIST_MAX_ITEMS', '5'))
+PLAN_PROMPT_ITEM_MAX_CHARS = 60
+PLAN_PROMPT_TOKEN_BUDGET = int(os.environ.get('PLAN_PROMPT_TOKEN_BUDGET', '400'))
+CLAUSE_BOUNDARY = re.compile(r'(?<=[,;.!?])\s+')
+
+def compact_text(text: Any, limit: int = PLAN_PROMPT_TEXT_MAX_CHARS) -> str:
+    """Collapse whitespace, drop repeated clauses and cut at a word boundary"""
+    text = ' '.join(str(text or '').split())
+    seen = set()
+    clauses = []
+    for clause in CLAUSE_BOUNDARY.split(text):
+        key = clause.strip(',;.!? ').lower()
+        if key and key not in seen:
+            seen.add(key)
+            clauses.append(clause)
+    text = ' '.join(clauses)
+    if len(text) > limit:
+        text = text[:limit - 1].rsplit(' ', 1)[0].rstrip(',;') + '…'
+    return text
+
+def compact_list(items: List[str], max_items: int = PLAN_PROMPT_LIST_MAX_ITEMS,
+                 item_limit: int = PLAN_PROMPT_ITEM_MAX_CHARS) -> str:
+    """Normalize, dedupe case-insensitively and cap a list of short answers"""
+    seen = set()
+    kept = []
+    for item in items:
+        item = compact_text(item, item_limit)
+        if item and item.lower() not in seen:
+            seen.add(item.lower())
+            kept.append(item)
+    return ', '.join(kept[:max_items]) or 'none'
+
+def build_plan_prompt(profile: UserProfile, answers: QuestionnaireAnswer,
+                      text_limit: int = PLAN_PROMPT_TEXT_MAX_CHARS, reference: Optional[str] = None) -> str:
+    """Build the per-user part of the plan prompt; the instructions live in PLAN_STABLE_PREFIX"""
+    prompt = (
+        f"Profile scores (0-100): purpose {profile.purpose_clarity}, energy {profile.energy_chronotype}, "
+        f"focus {profile.focus_capacity}, habits {profile.habit_foundation}, "
+        f"resilience {profile.mindset_resilience}, skills {profile.skill_trajectory}. "
+        f"Archetype: {profile.archetype}\n"
+        f"Energizing activities: {compact_text(answers.energizing_activities, text_limit)}\n"
+        f"Passionate problems: {compact_text(answers.passionate_problems, text_limit)}\n"
+        f"Skills: {compact_list(answers.existing_skills)}\n"
+        f"Time: {answers.weekday_hours}h weekdays, {answers.weekend_hours}h weekends; "
+        f"most alert: {compact_text(answers.chronotype, PLAN_PROMPT_ITEM_MAX_CHARS)}\n"
+        f"Morning routine: {compact_text(answers.morning_routine, text_limit)}\n"
+        f"Reliable habits: {compact_text(answers.reliable_habits, PLAN_PROMPT_ITEM_MAX_CHARS)}; "
+        f"setback response: {compact_text(answers.setback_reaction, PLAN_PROMPT_ITEM_MAX_CHARS)}\n"
+        f"12-month goals: {compact_list(answers.yearly_goals)}\n"
+        f"Key habit change: {compact_text(answers.key_habit_change, text_limit)}\n"
+        f"Distractions: {compact_list(answers.main_distractions)}\n"
+        f"Commitment: {answers.commitment_level}/10"
+    )
+    if reference:
+        prompt += f"\n{reference}"
+    # Tighten the free-text caps until the estimate fits the budget
+    if estimate_tokens(prompt) > PLAN_PROMPT_TOKEN_BUDGET and text_limit > PLAN_PROMPT_ITEM_MAX_CHARS:
+        return build_plan_prompt(profile, answers, max(PLAN_PROMPT_ITEM_MAX_CHARS, text_limit // 2), reference)
+    return prompt
+
+async def generate_personalized_plan(profile: UserProfile, answers: QuestionnaireAnswer) -> Dict[str, Any]:
+    """Generate personalized plan using Claude"""
+    
+    with span("plan.cache_lookup"):
+        cache_key = plan_cache_key(profile, answers)
+        cached_plan = await plan_cache.get(cache_key)
+    if cached_plan is not None:
+        return cached_plan
+    
+    with span("plan.neighbour_lookup"):
+        adapted_plan, reference = await find_reusable_plan(profile, answers)
+    if adapted_plan is not None:
+        return adapted_plan
+    
+    user_context = build_plan_prompt(profile, answers, reference=reference)
+
+    try:
+        usage = {}
+        with span("plan.llm_call"):
+            response = await llm_pool.complete(user_context, usage)
+        
+        with span("plan.parse"):
+            plan_data = extract_plan_sections(response)
+        if not plan_data:
+            # Nothing salvageable, fall back to the local plan
+            LLM_PARSE_FAILURES.inc()
+            LLM_FALLBACKS.inc(('parse',))
+            return build_local_plan(profile, answers)
+        
+        missing = [name for name in PLAN_SECTIONS if name not in plan_data]
+        if missing:
+            plan_data.update(await request_missing_sections(profile, answers, plan_data, missing, usage))
+            missing = [name for name in PLAN_SECTIONS if name not in plan_data]
+        if missing:
+            fill_from_local_plan(profile, answers, plan_data, missing)
+        else:
+            donor = reuse_donor(profile, answers)
+            await plan_cache.set(cache_key, plan_data, donor)
+            if plan_reuse_enabled():
+                plan_neighbours.add(cache_key, donor)
+        return {**plan_data, 'token_usage': usage}
+            
+    except Exception as e:
+        logging.error(f"Error generating plan: {e}")
+        raise HTTPException(status_code=500, detail="Error generating personalized plan")
+
+# Local Plan Engine
+PLAN_LLM_BUDGET_SECONDS = float(os.environ.get('PLAN_LLM_BUDGET_SECONDS', '8'))
+# LLM calls that missed the budget and may keep running to upgrade the local plan later;
+# past this many, a late call is cancelled and the local plan is final
+PLAN_UPGRADE_MAX_PENDING = int(os.environ.get('PLAN_UPGRADE_MAX_PENDING', str(LLM_POOL_SIZE)))
+
+# Deep work start time and a plain-language label for each chronotype
+CHRONOTYPE_WINDOWS = {
+    'Early morning': ('06:00', 'after waking'),
+    'Late morning': ('09:30', 'mid-morning'),
+    'Afternoon': ('13:30', 'early afternoon'),
+    'Evening': ('18:00', 'early evening'),
+    'Night': ('21:00', 'late evening'),
+}
+
+AXIS_PILLARS = {
+    'purpose_clarity': "Purpose Clarity",
+    'energy_chronotype': "Energy Management",
+    'focus_capacity': "Deep Focus",
+    'habit_foundation': "Habit Foundation",
+    'mindset_resilience': "Resilient Mindset",
+    'skill_trajectory': "Skill Growth",
+}
+
+AXIS_MONTHLY_FOCUS = {
+    'purpose_clarity': "Clarify what matters: turn your goals into one measurable outcome",
+    'energy_chronotype': "Protect your peak energy hours and stabilize sleep",
+    'focus_capacity': "Build distraction-free deep work sessions",
+    'habit_foundation': "Make one keystone habit automatic",
+    'mindset_resilience': "Treat setbacks as data and iterate weekly",
+    'skill_trajectory': "Deliberate practice on the skill your goals depend on",
+}
+
+# Habit stacks grow with the user's existing habit foundation
+HABIT_STACK_TEMPLATES = {
+    'starter': [
+        {"habit": "Write tomorrow's single most important task", "cue": "After brushing teeth at night", "time": "2 minutes"},
+        {"habit": "Start a focus timer", "cue": "After sitting down at your desk", "time": "1 minute"},
+    ],
+    'building': [
+        {"habit": "Plan the day's top 3 tasks", "cue": "After morning coffee", "time": "5 minutes"},
+        {"habit": "Phone out of reach", "cue": "Before the first focus block", "time": "1 minute"},
+        {"habit": "Log what you shipped", "cue": "After the last focus block", "time": "3 minutes"},
+    ],
+    'established': [
+        {"habit": "Review yearly goal and plan the day", "cue": "After morning routine", "time": "10 minutes"},
+        {"habit": "Phone out of reach", "cue": "Before the first focus block", "time": "1 minute"},
+        {"habit": "Deliberate skill practice", "cue": "After lunch", "time": "20 minutes"},
+        {"habit": "Shutdown ritual and journal", "cue": "When closing the laptop", "time": "10 minutes"},
+    ],
+}
+
+def score_tier(score: int) -> str:
+    return 'established' if score >= 65 else 'building' if score >= 40 else 'starter'
+
+def build_local_plan(profile: UserProfile, answers: QuestionnaireAnswer) -> Dict[str, Any]:
+    """Deterministic rule-based plan from the six axes, chronotype and habit templates"""
+    axes = {axis: getattr(profile, axis) for axis in AXIS_PILLARS}
+    # Weakest axes first; ties keep the declared axis order
+    weakest = sorted(axes, key=lambda axis: axes[axis])
+    main_goal = answers.yearly_goals[0] if answers.yearly_goals else "meaningful personal development"
+    start, window = CHRONOTYPE_WINDOWS.get(answers.chronotype, ('09:00', 'your most alert hours'))
+
+    # Longer deep work sessions for users who can already focus
+    session_minutes = 90 if profile.focus_capacity >= 70 else 60 if profile.focus_capacity >= 45 else 45
+    sessions_per_day = max(1, min(3, (answers.weekday_hours * 60) // session_minutes))
+
+    habit_stack = [dict(habit) for habit in HABIT_STACK_TEMPLATES[score_tier(profile.habit_foundation)]]
+    if answers.key_habit_change.strip():
+        habit_stack.append({"habit": answers.key_habit_change.strip(), "cue": "After your first focus block", "time": "10 minutes"})
+
+    time_blocks = [
+        {"name": "Deep Work", "time": f"{start} - {session_minutes} minutes ({window})", "frequency": f"{sessions_per_day}x weekdays"},
+        {"name": "Skill Practice", "time": "30 minutes", "frequency": "3x/week" if profile.skill_trajectory < 60 else "2x/week"},
+        {"name": "Weekly Review", "time": "30 minutes", "frequency": "Sunday"},
+    ]
+    if answers.weekend_hours > 0:
+        time_blocks.append({"name": "Weekend Project Time", "time": f"{answers.weekend_hours} hours", "frequency": "Saturday"})
+
+    accountability_steps = ["Daily habit check-off", "Weekly review of progress against the yearly goal"]
+    if profile.mindset_resilience < 60:
+        accountability_steps.append("Pre-plan a restart rule: never miss the same habit twice")
+    if answers.commitment_level < 7:
+        accountability_steps.append("Share your plan with an accountability partner")
+    accountability_steps.append("Monthly progress assessment and plan adjustment")
+
+    return {
+        "yearly_goal": f"{main_goal} by building {AXIS_PILLARS[weakest[0]].lower()} and consistent deep work",
+        "pillars": [AXIS_PILLARS[axis] for axis in weakest[:3]],
+        "monthly_focus": AXIS_MONTHLY_FOCUS[weakest[0]],
+        "weekly_template": {
+            "Monday": "Plan the week and deep work on the main goal",
+            "Tuesday": "Deep work session",
+            "Wednesday": "Skill practice",
+            "Thursday": "Deep work session",
+            "Friday": "Finish and ship the week's output",
+            "Saturday": "Learning and exploration" if answers.weekend_hours > 0 else "Rest",
+            "Sunday": "Weekly review and planning"
+        },
+        "daily_template": {
+            "morning": "Morning routine + planning" if answers.morning_routine.strip() else "Short planning ritual",
+            "deep_work": f"{sessions_per_day} x {session_minutes}-minute focus sessions starting {start}",
+            "afternoon": "Meetings, admin and shallow tasks",
+            "evening": "Shutdown ritual + reflection"
+        },
+        "habit_stack": habit_stack,
+        "time_blocks": time_blocks,
+        "accountability_steps": accountability_steps,
+        "justification": (
+            f"Plan for a {profile.archetype}: pillars target your lowest-scoring axes "
+            f"({', '.join(AXIS_PILLARS[axis] for axis in weakest[:3])}), deep work is scheduled in your "
+            f"{answers.chronotype.lower()} peak, and the habit stack matches your current habit foundation."
+        ),
+        "source": "local",
+    }
+
+# Plan Reuse
+# Every complete LLM plan is indexed by its profile's six axis scores. With
+# PLAN_REUSE_MAX_DISTANCE set, a new profile with the same archetype within that distance
+# (Euclidean, in score points) of one of them gets that plan adapted locally instead of an
+# LLM call; within PLAN_REUSE_CONTEXT_DISTANCE the neighbour's outline is passed to the LLM
+# as a reference. Both are off by default. The index lives in each process and is rebuilt
+# from the plan_cache collection, so it covers what every worker generated while the
+# cached plans are still live.
+PLAN_REUSE_MAX_DISTANCE = float(os.environ.get('PLAN_REUSE_MAX_DISTANCE', '0'))
+PLAN_REUSE_CONTEXT_DISTANCE = float(os.environ.get('PLAN_REUSE_CONTEXT_DISTANCE', '0'))
+PLAN_REUSE_INDEX_MAX_ENTRIES = int(os.environ.get('PLAN_REUSE_INDEX_MAX_ENTRIES', '50000'))
+PLAN_REUSE_REFRESH_SECONDS = float(os.environ.get('PLAN_REUSE_REFRESH_SECONDS', '30'))
+# Substitutions shorter than this would hit unrelated words
+PLAN_REUSE_MIN_SUBSTITUTION_CHARS = 4
+
+def reuse_donor(profile: UserProfile, answers: QuestionnaireAnswer) -> Dict[str, Any]:
+    """What the index and the adaptation need to know about the profile behind an LLM plan"""
+    return {
+        'vector': [getattr(profile, axis) for axis in SCORE_AXES],
+        'archetype': profile.archetype,
+        'goals': [goal.strip() for goal in answers.yearly_goals],
+        'chronotype': answers.chronotype,
+        'key_habit_change': answers.key_habit_change.strip(),
+        'skills': [skill.strip() for skill in answers.existing_skills],
+        'interests': personal_phrases(answers),
+    }
+
+def personal_phrases(answers: QuestionnaireAnswer) -> List[str]:
+    """Clauses of the free-text interests that would identify whose plan a text came from"""
+    text = f"{answers.energizing_activities}, {answers.passionate_problems}"
+    return [phrase for phrase in (part.strip(' ,;.!?') for part in re.split(r'[,;.!?]|\band\b', text))
+            if len(phrase) >= PLAN_REUSE_MIN_SUBSTITUTION_CHARS]
+
+class PlanNeighbourIndex:
+    """Ring buffer of (score vector, archetype) rows searched with one vectorized distance pass"""
+
+    def __init__(self, max_entries: int = PLAN_REUSE_INDEX_MAX_ENTRIES, refresh_seconds: float = PLAN_REUSE_REFRESH_SECONDS):
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self.vectors = np.zeros((0, len(SCORE_AXES)), dtype=np.float32)
+        self.archetype_codes = np.zeros(0, dtype=np.int32)
+        self.keys: List[str] = []
+        self.donors: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._codes: Dict[str, int] = {}
+        self._next = 0
+        self._loaded_until: Optional[datetime] = None
+        self._checked_at: Optional[float] = None
+        self.stats = {'lookups': 0, 'adapted': 0, 'context': 0, 'misses': 0, 'rejected': 0, 'stale': 0}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str, donor: Dict[str, Any]):
+        code = self._codes.setdefault(donor['archetype'], len(self._codes))
+        row = self._rows.get(key)
+        if row is None:
+            if len(self.keys) < self.max_entries:
+                row = len(self.keys)
+                if row == len(self.vectors):
+                    # Grow geometrically so incremental adds stay amortized O(1)
+                    capacity = min(self.max_entries, max(64, row * 2))
+                    self.vectors = np.resize(self.vectors, (capacity, len(SCORE_AXES)))
+                    self.archetype_codes = np.resize(self.archetype_codes, capacity)
+                self.keys.append(key)
+                self.donors.append(donor)
+            else:
+                # Full: overwrite the oldest row
+                row = self._next
+                self._next = (self._next + 1) % self.max_entries
+                del self._rows[self.keys[row]]
+                self.keys[row] = key
+            self._rows[key] = row
+        self.donors[row] = donor
+        self.vectors[row] = donor['vector']
+        self.archetype_codes[row] = code
+
+    def nearest(self, profile: UserProfile) -> Optional[tuple]:
+        """(cache key, donor, distance) of the closest plan with the same archetype"""
+        code = self._codes.get(profile.archetype)
+        if code is None or not self.keys:
+            return None
+        size = len(self.keys)
+        vector = np.array([getattr(profile, axis) for axis in SCORE_AXES], dtype=np.float32)
+        distances = np.sqrt(np.square(self.vectors[:size] - vector).sum(axis=1))
+        distances[self.archetype_codes[:size] != code] = np.inf
+        row = int(np.argmin(distances))
+        if not np.isfinite(distances[row]):
+            return None
+        return self.keys[row], self.donors[row], float(distances[row])
+
+    def forget(self, key: str):
+        """Disable a row whose plan has left the cache; the slot is reused by the ring"""
+        row = self._rows.get(key)
+        if row is not None:
+            self.archetype_codes[row] = -1
+
+    async def refresh(self, force: bool = False):
+        """Pull plans cached since the last refresh, by any worker"""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_seconds:
+            return
+        self._checked_at = now
+        query: Dict[str, Any] = {"neighbour": {"$exists": True}, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+        if self._loaded_until is not None:
+            query["created_at"] = {"$gt": self._loaded_until}
+        docs = await db.plan_cache.find(query, {"_id": 0, "key": 1, "neighbour": 1, "created_at": 1}) \
+            .sort("created_at", DESCENDING).limit(self.max_entries).to_list(self.max_entries)
+        for doc in reversed(docs):
+            self.add(doc['key'], doc['neighbour'])
+        if docs:
+            self._loaded_until = docs[0]['created_at']
+
+    def snapshot(self) -> Dict[str, Any]:
+        decided = self.stats['adapted'] + self.stats['context'] + self.stats['misses'] + self.stats['rejected']
+        return {
+            'entries': len(self), 'max_entries': self.max_entries,
+            'max_distance': PLAN_REUSE_MAX_DISTANCE, 'context_distance': PLAN_REUSE_CONTEXT_DISTANCE,
+            'reuse_rate': round(self.stats['adapted'] / decided, 4) if decided else 0.0,
+            **self.stats,
+        }
+
+plan_neighbours = PlanNeighbourIndex()
+
+metrics.register(CounterView(
+    'lifeplan_plan_reuse_total', 'Plan requests by nearest-neighbour outcome',
+    lambda: {(result,): plan_neighbours.stats[result] for result in ('adapted', 'context', 'misses', 'rejected')},
+    ('result',)
+))
+metrics.register(Gauge('lifeplan_plan_reuse_index_entries', 'Plans in the nearest-neighbour index',
+                       lambda: len(plan_neighbours)))
+
+def substitute_text(value: Any, replacements: List[tuple]) -> Any:
+    """Apply case-insensitive phrase replacements to every string in a plan section"""
+    if isinstance(value, str):
+        for pattern, replacement in replacements:
+            value = pattern.sub(lambda _: replacement, value)
+        return value
+    if isinstance(value, list):
+        return [substitute_text(item, replacements) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute_text(item, replacements) for key, item in value.items()}
+    return value
+
+# Sections that describe who the plan is for; always rebuilt from the recipient's own answers
+PLAN_REUSE_PERSONAL_SECTIONS = ('yearly_goal', 'pillars', 'monthly_focus', 'justification')
+
+def adapt_neighbour_plan(plan_data: Dict[str, Any], donor: Dict[str, Any], profile: UserProfile,
+                         answers: QuestionnaireAnswer) -> Optional[Dict[str, Any]]:
+    """Rewrite a neighbour's plan for this user, or None when the donor's specifics cannot all be replaced
+
+    The personal sections come from the local engine for this user. The schedule sections keep
+    the donor's structure with goals, key habit and chronotype window swapped, and are rejected
+    if any of the donor's goals, skills or interests is still in them afterwards.
+    """
+    goals = [goal.strip() for goal in answers.yearly_goals]
+    if len(donor['goals']) > len(goals):
+        return None
+    pairs = list(zip(donor['goals'], goals))
+    pairs.append((donor['key_habit_change'], answers.key_habit_change.strip()))
+    if donor['chronotype'] != answers.chronotype:
+        donor_start, donor_window = CHRONOTYPE_WINDOWS.get(donor['chronotype'], ('09:00', 'your most alert hours'))
+        start, window = CHRONOTYPE_WINDOWS.get(answers.chronotype, ('09:00', 'your most alert hours'))
+        pairs += [(donor_start, start), (donor_window, window), (donor['chronotype'], answers.chronotype)]
+    # Longest first so a phrase is not half-replaced by one of its substrings
+    pairs.sort(key=lambda pair: len(pair[0]), reverse=True)
+    replacements = [(re.compile(re.escape(old), re.IGNORECASE), new) for old, new in pairs
+                    if len(old) >= PLAN_REUSE_MIN_SUBSTITUTION_CHARS and new and old.lower() != new.lower()]
+
+    local = build_local_plan(profile, answers)
+    adapted = {name: local[name] if name in PLAN_REUSE_PERSONAL_SECTIONS else substitute_text(plan_data[name], replacements)
+               for name in PLAN_SECTIONS}
+
+    # Anything of the donor's that this user did not also write must be gone
+    own = json.dumps(answers.model_dump(exclude={'id', 'created_at'}), ensure_ascii=False).lower()
+    text = json.dumps(adapted, ensure_ascii=False).lower()
+    leftovers = [term for term in donor['goals'] + donor.get('skills', []) + donor.get('interests', [])
+                 + [donor['key_habit_change']]
+                 if len(term) >= PLAN_REUSE_MIN_SUBSTITUTION_CHARS and term.lower() in text and term.lower() not in own]
+    if leftovers:
+        return None
+    adapted['source'] = 'adapted'
+    return adapted
+
+def reference_outline(plan_data: Dict[str, Any]) -> str:
+    """Compact outline of a neighbour's plan for the prompt"""
+    return (f"Reference plan for a similar profile (adapt, do not copy): goal: "
+            f"{compact_text(plan_data['yearly_goal'], PLAN_PROMPT_ITEM_MAX_CHARS)}; "
+            f"pillars: {compact_list(plan_data['pillars'])}; "
+            f"focus: {compact_text(plan_data['monthly_focus'], PLAN_PROMPT_ITEM_MAX_CHARS)}")
+
+def plan_reuse_enabled() -> bool:
+    """Whether either reuse distance is set; when neither is, the neighbour index stays empty"""
+    return PLAN_REUSE_MAX_DISTANCE > 0 or PLAN_REUSE_CONTEXT_DISTANCE > 0
+
+async def find_reusable_plan(profile: UserProfile, answers: QuestionnaireAnswer) -> tuple:
+    """(adapted plan, None) for a close neighbour, (None, reference outline) for a near one, else (None, None)"""
+    if not plan_reuse_enabled():
+        return None, None
+    try:
+        await plan_neighbours.refresh()
+    except Exception as e:
+        logging.warning(f"Plan neighbour index refresh failed: {e}")
+    plan_neighbours.stats['lookups'] += 1
+    match = plan_neighbours.nearest(profile)
+    if match is not None:
+        key, donor, distance = match
+        if distance <= max(PLAN_REUSE_MAX_DISTANCE, PLAN_REUSE_CONTEXT_DISTANCE):
+            plan_data = await plan_cache.get(key)
+            if plan_data is None:
+                plan_neighbours.stats['stale'] += 1
+                plan_neighbours.forget(key)
+            elif distance <= PLAN_REUSE_MAX_DISTANCE:
+                adapted = adapt_neighbour_plan(plan_data, donor, profile, answers)
+                if adapted is not None:
+                    plan_neighbours.stats['adapted'] += 1
+                    return adapted, None
+                plan_neighbours.stats['rejected'] += 1
+                return None, None
+            else:
+                plan_neighbours.stats['context'] += 1
+                return None, reference_outline(plan_data)
+    plan_neighbours.stats['misses'] += 1
+    return None, None
+
+# Keeps a reference to fire-and-forget tasks so they are not garbage collected mid-flight
+background_tasks = set()
+
+def run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# LLM tasks that outlived their request's budget, bounded by PLAN_UPGRADE_MAX_PENDING
+pending_upgrades = set()
+
+metrics.register(Gauge('lifeplan_plan_upgrades_pending', 'Late LLM plans still running to upgrade a local plan',
+                       lambda: len(pending_upgrades)))
+PLAN_UPGRADES_DROPPED = metrics.register(Counter(
+    'lifeplan_plan_upgrades_dropped_total', 'Late LLM plans cancelled because too many upgrades were pending'))
+
+async def generate_plan_within_budget(profile: UserProfile, answers: QuestionnaireAnswer,
+                                      budget: Optional[float] = PLAN_LLM_BUDGET_SECONDS) -> tuple:
+    """Race the LLM against the latency budget; returns (plan_data, pending LLM task or None)
+
+    A call that misses the budget keeps running only while fewer than
+    PLAN_UPGRADE_MAX_PENDING others are; otherwise it is cancelled.
+    """
+    llm_task = asyncio.ensure_future(generate_personalized_plan(profile, answers))
+    if not budget or budget <= 0:
+        return await llm_task, None
+    try:
+        done, _ = await asyncio.wait({llm_task}, timeout=budget)
+    except asyncio.CancelledError:
+        llm_task.cancel()
+        raise
+    if done:
+        return llm_task.result(), None
+    logging.info(f"LLM missed the {budget}s plan budget for profile {profile.id}; serving the local plan")
+    LLM_FALLBACKS.inc(('budget',))
+    if len(pending_upgrades) >= PLAN_UPGRADE_MAX_PENDING:
+        llm_task.cancel()
+        PLAN_UPGRADES_DROPPED.inc()
+        return build_local_plan(profile, answers), None
+    pending_upgrades.add(llm_task)
+    llm_task.add_done_callback(pending_upgrades.discard)
+    return build_local_plan(profile, answers), llm_task
+
+async def upgrade_local_plan(plan_id: str, profile_id: str, llm_task: asyncio.Future):
+    """Replace a stored local plan with the LLM plan once it arrives"""
+    try:
+        plan_data = await llm_task
+    except Exception as e:
+        logging.warning(f"LLM plan for {plan_id} never arrived, keeping the local plan: {e}")
+        return
+    if plan_data.get('source') == 'local':
+        return
+    sections = {name: plan_data[name] for name in PLAN_SECTIONS if name in plan_data}
+    await db.personalized_plans.update_one(
+        {"id": plan_id, "source": "local"},
+        {"$set": {**sections, "source": "llm", "token_usage": plan_data.get('token_usage'),
+                  "upgraded_at": datetime.now(timezone.utc)},
+         "$inc": {"revision": 1}}
+    )
+    await plan_reads.invalidate(profile_id)
+
+class PlanSectionParser:
+    """Incremental JSON parser that emits each top-level plan member once it is complete"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.member_start = None
+        # Plan sections seen in the current top-level object
+        self.plan_members = 0
+        self.done = False
+
+    def feed(self, chunk: str) -> List[tuple]:
+        """Consume a chunk of text and return the (key, value) pairs it completed"""
+        self.buffer += chunk
+        sections = []
+        text = self.buffer
+        while self.pos < len(text) and not self.done:
+            char = text[self.pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                if self.depth > 0:
+                    self.in_string = True
+            elif char in '{[':
+                self.depth += 1
+                if self.depth == 1:
+                    if char == '[':
+                        # Prose before the plan object, e.g. a markdown list
+                        self.depth = 0
+                    else:
+                        self.member_start = self.pos + 1
+            elif char in '}]' and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    sections.extend(self._close_member(self.pos))
+                    if self.plan_members:
+                        self.done = True
+                    else:
+                        # Braces in the prose, e.g. "Sure {as requested}:"; the plan comes later
+                        self.member_start = None
+            elif char == ',' and self.depth == 1:
+                sections.extend(self._close_member(self.pos))
+                self.member_start = self.pos + 1
+            self.pos += 1
+        return sections
+
+    def _close_member(self, end: int) -> List[tuple]:
+        member = self.buffer[self.member_start:end].strip()
+        if not member:
+            return []
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            try:
+                parsed = json.loads("{" + repair_json_syntax(member) + "}")
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping unparseable plan section: {member[:80]}")
+                return []
+            PLAN_REPAIRS.inc(('syntax',))
+        self.plan_members += sum(name in PLAN_SECTIONS for name in parsed)
+        return list(parsed.items())
+
+# Plan Extraction
+# LLM output is parsed section by section so a fenced, chatty, slightly broken or
+# truncated response still yields every section it got right; only the rest is re-asked
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+SMART_QUOTES = str.maketrans({'\u201c': '"', '\u201d': '"'})
+PLAN_SECTION_ADAPTERS = {name: TypeAdapter(PersonalizedPlan.model_fields[name].annotation) for name in PLAN_SECTIONS}
+
+def repair_json_syntax(text: str) -> str:
+    """Fix the defects models commonly emit: trailing commas and curly quotes around keys and strings"""
+    return TRAILING_COMMA.sub(r'\1', text.translate(SMART_QUOTES))
+
+def validate_section(name: str, value: Any) -> tuple:
+    """Check one section against the PersonalizedPlan schema; returns (ok, validated value)"""
+    try:
+        return True, PLAN_SECTION_ADAPTERS[name].validate_python(value)
+    except ValidationError:
+        return False, None
+
+def extract_plan_sections(text: str) -> Dict[str, Any]:
+    """Every schema-valid plan section found in an LLM response"""
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        parser = PlanSectionParser()
+        parsed = dict(parser.feed(text))
+        # Count how a response that yielded anything had to be recovered
+        if parsed:
+            stripped = text.strip()
+            if not parser.done:
+                PLAN_REPAIRS.inc(('truncated',))
+            elif stripped.startswith('```'):
+                PLAN_REPAIRS.inc(('fence',))
+            elif not (stripped.startswith('{') and stripped.endswith('}')):
+                PLAN_REPAIRS.inc(('prose',))
+    if not isinstance(parsed, dict):
+        return {}
+    
+    sections = {}
+    for name in PLAN_SECTIONS:
+        if name not in parsed:
+            continue
+        ok, value = validate_section(name, parsed[name])
+        if ok:
+            sections[name] = value
+        else:
+            PLAN_REPAIRS.inc(('invalid_section',))
+    return sections
+
+def build_sections_prompt(profile: UserProfile, answers: QuestionnaireAnswer, names: List[str],
+                          plan_data: Dict[str, Any]) -> str:
+    """Prompt for just the named sections, anchored on the goal and pillars already chosen"""
+    anchor = {name: plan_data[name] for name in ('yearly_goal', 'pillars') if name in plan_data and name not in names}
+    prompt = build_plan_prompt(profile, answers)
+    if anchor:
+        prompt += f"\nAlready decided: {json.dumps(anchor, ensure_ascii=False)}"
+    return prompt + f"\n\nReturn only a JSON object with these keys: {', '.join(names)}"
+
+def merge_usage(total: Dict[str, Any], extra: Dict[str, Any]):
+    """Add a follow-up call's token counts and latency to the plan's usage"""
+    for key in ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'latency_ms'):
+        if key in extra:
+            total[key] = total.get(key, 0) + extra[key]
+    total['calls'] = total.get('calls', 1) + 1
+
+async def request_missing_sections(profile: UserProfile, answers: QuestionnaireAnswer, plan_data: Dict[str, Any],
+                                   missing: List[str], usage: Dict[str, Any]) -> Dict[str, Any]:
+    """Ask the LLM again for only the sections the first response lacked"""
+    PLAN_REPAIRS.inc(('reask',))
+    extra = {}
+    try:
+        with span("plan.reask"):
+            response = await llm_pool.complete(build_sections_prompt(profile, answers, missing, plan_data), extra)
+    except Exception as e:
+        logging.warning(f"Re-asking for plan sections {missing} failed: {e}")
+        return {}
+    finally:
+        merge_usage(usage, extra)
+    recovered = extract_plan_sections(response)
+    return {name: recovered[name] for name in missing if name in recovered}
+
+def fill_from_local_plan(profile: UserProfile, answers: QuestionnaireAnswer, plan_data: Dict[str, Any],
+                         missing: List[str]) -> Dict[str, Any]:
+    """Complete a partial LLM plan with sections from the local engine"""
+    PLAN_REPAIRS.inc(('local_fill',))
+    fallback = build_local_plan(profile, answers)
+    for name in missing:
+        plan_data[name] = fallback[name]
+    return plan_data
+
+def build_profile(answers: QuestionnaireAnswer) -> UserProfile:
+    """Score questionnaire answers into a new profile"""
+    # Calculate scores
+    rules = scoring_rules.for_questionnaire(answers.id)
+    scores = calculate_scores(answers, rules)
+    archetype = determine_archetype(scores, rules)
+    
+    # Create profile
+    return UserProfile(
+        questionnaire_id=answers.id,
+        purpose_clarity=scores['purpose_clarity'],
+        energy_chronotype=scores['energy_chronotype'], 
+        focus_capacity=scores['focus_capacity'],
+        habit_foundation=scores['habit_foundation'],
+        mindset_resilience=scores['mindset_resilience'],
+        skill_trajectory=scores['skill_trajectory'],
+        archetype=archetype,
+        scoring_version=rules.version
+    )
+
+async def load_profile_and_answers(profile_id: str) -> tuple:
+    """Fetch a profile and the questionnaire answers it was scored from"""
+    shared = shared_cache.get('profiles', profile_id)
+    if shared is not None:
+        docs, _ = shared
+        return from_mongo(UserProfile, docs['profile']), from_mongo(QuestionnaireAnswer, docs['answers'])
+    
+    # Get profile
+    profile_doc = await db.user_profiles.find_one({"id": profile_id}, PROFILE_PROJECTION)
+    if not profile_doc:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    profile = from_mongo(UserProfile, profile_doc)
+    
+    # Get questionnaire answers
+    answer_doc = await db.questionnaire_answers.find_one({"id": profile.questionnaire_id}, QUESTIONNAIRE_PROJECTION)
+    answers = from_mongo(QuestionnaireAnswer, answer_doc)
+    await shared_cache.set('profiles', profile_id, {'profile': profile_doc, 'answers': answer_doc},
+                           time.time() + SHARED_CACHE_PROFILE_TTL_SECONDS)
+    return profile, answers
+
+async def save_plan(profile_id: str, plan_data: Dict[str, Any]) -> PersonalizedPlan:
+    """Build a PersonalizedPlan from generated sections and store it"""
+    # Create plan object
+    plan = PersonalizedPlan(
+        profile_id=profile_id,
+        yearly_goal=plan_data['yearly_goal'],
+        pillars=plan_data['pillars'],
+        monthly_focus=plan_data['monthly_focus'],
+        weekly_template=plan_data['weekly_template'],
+        daily_template=plan_data['daily_template'],
+        habit_stack=plan_data['habit_stack'],
+        time_blocks=plan_data['time_blocks'],
+        accountability_steps=plan_data['accountability_steps'],
+        justification=plan_data['justification'],
+        source=plan_data.get('source', 'llm'),
+        token_usage=plan_data.get('token_usage')
+    )
+    
+    # Save to database
+    await db.personalized_plans.insert_one(to_mongo(plan))
+    await plan_reads.invalidate(profile_id)
+    return plan
+
+async def build_plan_for_profile(profile_id: str, on_stage: Optional[Callable[[str], Awaitable[None]]] = None,
+                                 budget: Optional[float] = None) -> PersonalizedPlan:
+    """Load profile and answers, generate a plan and store it
+
+    With a budget, a local plan is stored if the LLM is late and upgraded in the background.
+    """
+    async def report(stage: str):
+        if on_stage:
+            await on_stage(stage)
+    
+    await report("loading_profile")
+    with span("plan.load_profile"):
+        profile, answers = await load_profile_and_answers(profile_id)
+    
+    # Generate plan
+    await report("generating")
+    with span("plan.generate"):
+        plan_data, pending = await generate_plan_within_budget(profile, answers, budget)
+    
+    await report("saving")
+    with span("plan.save"):
+        plan = await save_plan(profile_id, plan_data)
+    if pending:
+        run_in_background(upgrade_local_plan(plan.id, plan.profile_id, pending))
+    return plan
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+async def stream_plan_events(profile: UserProfile, answers: QuestionnaireAnswer) -> AsyncIterator[str]:
+    """Stream plan sections as SSE messages, then persist the assembled plan"""
+    cache_key = plan_cache_key(profile, answers)
+    plan_data = await plan_cache.get(cache_key)
+    reference = None
+    
+    try:
+        if plan_data is None:
+            plan_data, reference = await find_reusable_plan(profile, answers)
+        if plan_data is not None:
+            for name in PLAN_SECTIONS:
+                if name in plan_data:
+                    yield sse_event("section", {"name": name, "value": plan_data[name]})
+        else:
+            parser = PlanSectionParser()
+            plan_data = {}
+            usage = {}
+            async for chunk in llm_pool.stream(build_plan_prompt(profile, answers, reference=reference), usage):
+                for name, value in parser.feed(chunk):
+                    if name not in PLAN_SECTIONS:
+                        continue
+                    ok, value = validate_section(name, value)
+                    if not ok:
+                        PLAN_REPAIRS.inc(('invalid_section',))
+                        continue
+                    plan_data[name] = value
+                    yield sse_event("section", {"name": name, "value": value})
+            
+            missing = [name for name in PLAN_SECTIONS if name not in plan_data]
+            if missing and plan_data:
+                recovered = await request_missing_sections(profile, answers, plan_data, missing, usage)
+                for name, value in recovered.items():
+                    plan_data[name] = value
+                    yield sse_event("section", {"name": name, "value": value})
+                missing = [name for name in PLAN_SECTIONS if name not in plan_data]
+            if missing:
+                # Fill whatever the model failed to produce from the local plan
+                fill_from_local_plan(profile, answers, plan_data, missing)
+                for name in missing:
+                    yield sse_event("section", {"name": name, "value": plan_data[name], "fallback": True})
+            else:
+                donor = reuse_donor(profile, answers)
+                await plan_cache.set(cache_key, plan_data, donor)
+                if plan_reuse_enabled():
+                    plan_neighbours.add(cache_key, donor)
+            plan_data['token_usage'] = usage
+        
+        plan = await save_plan(profile.id, plan_data)
+        yield sse_event("complete", plan.model_dump())
+        
+    except Exception as e:
+        logging.error(f"Error streaming plan: {e}")
+        yield sse_event("error", {"detail": "Error generating personalized plan"})
+
+# Plan Single-Flight
+PLAN_LEASE_SECONDS = int(os.environ.get('PLAN_LEASE_SECONDS', '120'))
+PLAN_LEASE_RESULT_SECONDS = int(os.environ.get('PLAN_LEASE_RESULT_SECONDS', '10'))
+PLAN_LEASE_POLL_SECONDS = float(os.environ.get('PLAN_LEASE_POLL_SECONDS', '0.25'))
+
+class PlanSingleFlight:
+    """Coalesces concurrent plan generations for the same profile
+
+    Callers in one process share a single in-flight task; across worker
+    processes a lease document in plan_leases elects one generator and the
+    others wait for the plan id it records. The finished lease lingers for
+    PLAN_LEASE_RESULT_SECONDS so retries that arrive just after completion
+    get the same plan.
+    """
+
+    def __init__(self, collection_name: str = 'plan_leases', lease_seconds: int = PLAN_LEASE_SECONDS,
+                 result_seconds: int = PLAN_LEASE_RESULT_SECONDS, poll_seconds: float = PLAN_LEASE_POLL_SECONDS):
+        self.collection_name = collection_name
+        self.lease_seconds = lease_seconds
+        self.result_seconds = result_seconds
+        self.poll_seconds = poll_seconds
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {'generated': 0, 'coalesced_local': 0, 'coalesced_remote': 0}
+
+    @property
+    def collection(self):
+        return db[self.collection_name]
+
+    async def run(self, profile_id: str, generate: Callable[[], Awaitable[PersonalizedPlan]]) -> PersonalizedPlan:
+        flight = self._inflight.get(profile_id)
+        if flight is not None:
+            self.stats['coalesced_local'] += 1
+        else:
+            flight = asyncio.ensure_future(self._lead(profile_id, generate))
+            self._inflight[profile_id] = flight
+            flight.add_done_callback(lambda _: self._inflight.pop(profile_id, None))
+        # One caller disconnecting must not cancel the generation the others wait on
+        return await asyncio.shield(flight)
+
+    async def _lead(self, profile_id: str, generate: Callable[[], Awaitable[PersonalizedPlan]]) -> PersonalizedPlan:
+        while True:
+            token = await self._acquire(profile_id)
+            if token:
+                try:
+                    plan = await generate()
+                except BaseException:
+                    await self.collection.delete_one({"profile_id": profile_id, "owner": token})
+                    raise
+                self.stats['generated'] += 1
+                await self.collection.update_one(
+                    {"profile_id": profile_id, "owner": token},
+                    {"$set": {"plan_id": plan.id,
+                              "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.result_seconds)}}
+                )
+                return plan
+
+            plan = await self._wait_for_remote(profile_id)
+            if plan is not None:
+                self.stats['coalesced_remote'] += 1
+                return plan
+            # The other worker gave up without a plan; try to take over
+
+    async def _acquire(self, profile_id: str) -> Optional[str]:
+        now = datetime.now(timezone.utc)
+        token = uuid.uuid4().hex
+        lease = {
+            "profile_id": profile_id,
+            "owner": token,
+            "plan_id": None,
+            "expires_at": now + timedelta(seconds=self.lease_seconds),
+        }
+        try:
+            await self.collection.insert_one(dict(lease))
+            return token
+        except DuplicateKeyError:
+            pass
+        # Take over a lease whose owner died, or a finished one past its result window
+        stolen = await self.collection.find_one_and_update(
+            {"profile_id": profile_id, "expires_at": {"$lt": now}},
+            {"$set": lease}
+        )
+        return token if stolen else None
+
+    async def _wait_for_remote(self, profile_id: str) -> Optional[PersonalizedPlan]:
+        while True:
+            lease = await self.collection.find_one({"profile_id": profile_id})
+            if lease is None:
+                return None
+            expires_at = lease["expires_at"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at < datetime.now(timezone.utc):
+                # A dead owner, or a result older than the retry window; Mongo's TTL sweep may not have run yet
+                return None
+            if lease.get("plan_id"):
+                plan_doc = await db.personalized_plans.find_one({"id": lease["plan_id"]}, PLAN_PROJECTION)
+                if plan_doc is None:
+                    return None
+                # Another worker wrote it; drop the cached read even if the shared tier is off
+                await plan_reads.invalidate(profile_id)
+                return from_mongo(PersonalizedPlan, plan_doc)
+            await asyncio.sleep(self.poll_seconds)
+
+plan_flights = PlanSingleFlight()
+
+metrics.register(CounterView(
+    'lifeplan_plan_flights_total', 'Plan requests by whether they generated or joined another generation',
+    lambda: {(outcome,): count for outcome, count in plan_flights.stats.items()}, ('outcome',)
+))
+
+# Plan Jobs
+PLAN_WORKER_CONCURRENCY = int(os.environ.get('PLAN_WORKER_CONCURRENCY', '4'))
+PLAN_JOB_LEASE_SECONDS = int(os.environ.get('PLAN_JOB_LEASE_SECONDS', '120'))
+PLAN_JOB_MAX_ATTEMPTS = int(os.environ.get('PLAN_JOB_MAX_ATTEMPTS', '3'))
+PLAN_JOB_POLL_SECONDS = float(os.environ.get('PLAN_JOB_POLL_SECONDS', '2'))
+
+# Rough progress reported for each stage of build_plan_for_profile
+PLAN_JOB_PROGRESS = {
+    'queued': 0,
+    'loading_profile': 10,
+    'generating': 30,
+    'saving': 90,
+    'succeeded': 100,
+}
+
+class PlanJobQueue:
+    """Mongo-backed queue of plan generation jobs drained by a fixed-size asyncio worker pool"""
+
+    def __init__(self, collection_name: str = 'plan_jobs', concurrency: int = PLAN_WORKER_CONCURRENCY,
+                 lease_seconds: int = PLAN_JOB_LEASE_SECONDS, max_attempts: int = PLAN_JOB_MAX_ATTEMPTS,
+                 poll_seconds: float = PLAN_JOB_POLL_SECONDS):
+        self.collection_name = collection_name
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def collection(self):
+        return db[self.collection_name]
+
+    async def enqueue(self, profile_id: str) -> Dict[str, Any]:
+        # A profile already waiting on a job shares it instead of queueing another
+        existing = await self.collection.find_one(
+            {"profile_id": profile_id, "status": {"$in": ["queued", "running"]}}, {"_id": 0}
+        )
+        if existing:
+            return existing
+        
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "profile_id": profile_id,
+            "status": "queued",
+            "stage": "queued",
+            "progress": PLAN_JOB_PROGRESS['queued'],
+            "attempts": 0,
+            "plan_id": None,
+            "error": None,
+            "worker_id": None,
+            "lease_expires_at": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.collection.insert_one(dict(job))
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0})
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        # Running jobs whose lease ran out belong to a worker that died or restarted;
+        # one that took down every worker it ran on is failed rather than retried forever
+        abandoned = {"status": "running", "lease_expires_at": {"$lt": now}}
+        await self._fail_exhausted(abandoned)
+        job = await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {**abandoned, "attempts": {"$lt": self.max_attempts}},
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": self.worker_id,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if job:
+            job.pop("_id", None)
+        return job
+
+    async def _fail_exhausted(self, query: Dict[str, Any]):
+        """Fail the abandoned jobs matching query that have no attempts left"""
+        await self.collection.update_many(
+            {**query, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": "failed", "stage": "failed", "lease_expires_at": None,
+                      "error": f"Worker lost the job on all {self.max_attempts} attempts",
+                      "updated_at": datetime.now(timezone.utc)}}
+        )
+
+    async def _update(self, job_id: str, fields: Dict[str, Any]):
+        now = datetime.now(timezone.utc)
+        fields = {**fields, "updated_at": now}
+        query = {"id": job_id, "worker_id": self.worker_id}
+        if fields.get("status") == "running":
+            fields["lease_expires_at"] = now + timedelta(seconds=self.lease_seconds)
+            # A late heartbeat or stage update must not reopen a job that already finished
+            query["status"] = "running"
+        await self.collection.update_one(query, {"$set": fields})
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self._update(job_id, {"status": "running"})
+
+    async def _run_job(self, job: Dict[str, Any]):
+        async def on_stage(stage: str):
+            await self._update(job["id"], {"status": "running", "stage": stage, "progress": PLAN_JOB_PROGRESS[stage]})
+
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            plan = await plan_flights.run(
+                job["profile_id"], lambda: build_plan_for_profile(job["profile_id"], on_stage=on_stage)
+            )
+            await self._update(job["id"], {
+                "status": "succeeded",
+                "stage": "succeeded",
+                "progress": PLAN_JOB_PROGRESS['succeeded'],
+                "plan_id": plan.id,
+                "error": None,
+                "lease_expires_at": None,
+            })
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            retry = job["attempts"] < self.max_attempts and not (isinstance(e, HTTPException) and e.status_code == 404)
+            logging.error(f"Plan job {job['id']} failed (attempt {job['attempts']}): {detail}")
+            await self._update(job["id"], {
+                "status": "queued" if retry else "failed",
+                "stage": "queued" if retry else "failed",
+                "error": detail,
+                "lease_expires_at": None,
+            })
+        finally:
+            heartbeat.cancel()
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logging.error(f"Plan job claim failed: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run_job(job)
+
+    async def start(self):
+        if self._tasks:
+            return
+        # Workers go first: if Mongo is down they keep retrying their claims, and the
+        # requeue below failing only shows up in the startup report
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        # Jobs left running by a process on this host that has since exited are requeued
+        # immediately; sibling workers' jobs are left alone, and anything else falls back
+        # to the lease expiry in _claim
+        host_prefix = f"^{re.escape(socket.gethostname())}:"
+        running = await self.collection.find(
+            {"status": "running", "worker_id": {"$regex": host_prefix}}, {"_id": 0, "worker_id": 1}
+        ).to_list(None)
+        dead = sorted({job["worker_id"] for job in running if not self._owner_alive(job["worker_id"])})
+        if not dead:
+            return
+        orphaned = {"status": "running", "worker_id": {"$in": dead}}
+        await self._fail_exhausted(orphaned)
+        result = await self.collection.update_many(
+            orphaned,
+            {"$set": {"status": "queued", "stage": "queued", "lease_expires_at": None,
+                      "updated_at": datetime.now(timezone.utc)}}
+        )
+        if result.modified_count:
+            logging.info(f"Requeued {result.modified_count} interrupted plan jobs")
+
+    def _owner_alive(self, worker_id: str) -> bool:
+        """Whether the process behind a worker id from this host is still running"""
+        try:
+            pid = int(worker_id.rsplit(':', 2)[1])
+        except (IndexError, ValueError):
+            return True
+        if pid == os.getpid():
+            # Same pid but another id: a previous process, e.g. after a container restart
+            return worker_id == self.worker_id
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+plan_jobs = PlanJobQueue()
+
+# Analytics Export
+# Profiles and plans streamed batch by batch from a Motor cursor as NDJSON, or as
+# Parquet with one row group per batch, so memory stays flat however large the export
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '5000'))
+# Exports stop this far behind now so documents still being written land in the next window
+EXPORT_SETTLE_SECONDS = int(os.environ.get('EXPORT_SETTLE_SECONDS', '5'))
+EXPORT_DATASETS = {
+    'profiles': ('user_profiles', UserProfile),
+    'plans': ('personalized_plans', PersonalizedPlan),
+}
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+def load_pyarrow():
+    """pyarrow is only needed for Parquet exports, so it is imported on demand"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow; install it or export NDJSON")
+    return pyarrow, pyarrow.parquet
+
+def arrow_schema(model_class) -> tuple:
+    """Arrow schema for a model, plus the fields stored as JSON strings because they are nested"""
+    pa, _ = load_pyarrow()
+    scalar_types = {str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_(),
+                    datetime: pa.timestamp('ms', tz='UTC')}
+    fields = []
+    json_fields = []
+    for name, field in model_class.model_fields.items():
+        annotation = field.annotation
+        if typing.get_origin(annotation) is typing.Union:
+            annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+        arrow_type = scalar_types.get(annotation)
+        if arrow_type is None:
+            arrow_type = pa.string()
+            json_fields.append(name)
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields), json_fields
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+class AnalyticsExport:
+    """One export of a dataset for the (since, until] created_at window"""
+
+    def __init__(self, dataset: str, export_format: str = 'ndjson', since: Optional[datetime] = None,
+                 batch_size: int = EXPORT_BATCH_SIZE):
+        if dataset not in EXPORT_DATASETS:
+            raise KeyError(dataset)
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {export_format}")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if export_format == 'parquet':
+            load_pyarrow()
+        self.dataset = dataset
+        self.format = export_format
+        self.since = since.replace(tzinfo=timezone.utc) if since and since.tzinfo is None else since
+        # The next incremental export starts from here
+        self.until = datetime.now(timezone.utc) - timedelta(seconds=EXPORT_SETTLE_SECONDS)
+        self.batch_size = batch_size
+        self.rows = 0
+
+    @property
+    def media_type(self) -> str:
+        return EXPORT_FORMATS[self.format][0]
+
+    @property
+    def filename(self) -> str:
+        return f"{self.dataset}-{self.until:%Y%m%dT%H%M%SZ}.{EXPORT_FORMATS[self.format][1]}"
+
+    def window(self) -> Dict[str, Any]:
+        dates = {"$lte": self.until}
+        # Rows not yet converted by backfill_dates hold UTC ISO strings, which sort like the dates they encode
+        strings = {"$lte": self.until.astimezone(timezone.utc).isoformat()}
+        if self.since:
+            dates["$gt"] = self.since
+            strings["$gt"] = self.since.astimezone(timezone.utc).isoformat()
+        return {"$or": [{"created_at": dates}, {"created_at": strings}]}
+
+    async def batches(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        collection_name, model_class = EXPORT_DATASETS[self.dataset]
+        cursor = db[collection_name].find(self.window(), projection_for(model_class)) \
+            .sort([("created_at", ASCENDING), ("id", ASCENDING)]).batch_size(self.batch_size)
+        batch = []
+        async for doc in cursor:
+            if isinstance(doc.get('created_at'), str):
+                doc['created_at'] = parse_stored_date(doc['created_at'])
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                self.rows += len(batch)
+                yield batch
+                batch = []
+        if batch:
+            self.rows += len(batch)
+            yield batch
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        if self.format == 'parquet':
+            async for chunk in self._parquet():
+                yield chunk
+            return
+        async for batch in self.batches():
+            yield b"".join(orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE) for doc in batch)
+
+    async def _parquet(self) -> AsyncIterator[bytes]:
+        pa, pq = load_pyarrow()
+        schema, json_fields = arrow_schema(EXPORT_DATASETS[self.dataset][1])
+        sink = ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        async for batch in self.batches():
+            for doc in batch:
+                for name in json_fields:
+                    if doc.get(name) is not None:
+                        doc[name] = orjson.dumps(doc[name]).decode()
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+# Questionnaire Import
+# NDJSON bulk import: lines are validated as they stream in and written in unordered
+# insert_many batches, with the next batch parsed while the previous one is being written
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+IMPORT_MAX_BATCH_SIZE = 10000
+IMPORT_MAX_LINE_BYTES = int(os.environ.get('IMPORT_MAX_LINE_BYTES', str(64 * 1024)))
+IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', '1000'))
+
+def describe_validation_error(error: ValidationError) -> str:
+    return '; '.join(f"{'.'.join(map(str, err['loc'])) or 'line'}: {err['msg']}" for err in error.errors()[:3])
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    """Yield (line_number, raw line) from a byte stream; over-long lines come back as None"""
+    buffer = b""
+    line_number = 0
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if skipping:
+                skipping = False
+                yield line_number, None
+            else:
+                yield line_number, line if len(line) <= IMPORT_MAX_LINE_BYTES else None
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            # Drop the rest of an over-long line instead of holding it in memory
+            skipping = True
+            buffer = b""
+    if skipping:
+        yield line_number + 1, None
+    elif buffer.strip():
+        yield line_number + 1, buffer
+
+class QuestionnaireImport:
+    """Accumulates one import's batches, counts and per-line errors"""
+
+    def __init__(self, batch_size: int = IMPORT_BATCH_SIZE, create_profiles: bool = False):
+        self.batch_size = batch_size
+        self.create_profiles = create_profiles
+        self.report = {'lines': 0, 'inserted': 0, 'profiles_created': 0, 'failed': 0, 'errors': []}
+        self._batch = []
+        self._pending = None
+
+    def error(self, line_number: int, message: str):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < IMPORT_MAX_ERRORS:
+            self.report['errors'].append({'line': line_number, 'error': message})
+
+    async def add(self, line_number: int, line: Optional[bytes]):
+        self.report['lines'] += 1
+        if line is None:
+            self.error(line_number, f"Line longer than {IMPORT_MAX_LINE_BYTES} bytes")
+            return
+        try:
+            answers = QuestionnaireAnswer.model_validate_json(line)
+        except ValidationError as e:
+            self.error(line_number, describe_validation_error(e))
+            return
+        self._batch.append((line_number, answers))
+        if len(self._batch) >= self.batch_size:
+            await self._flush()
+
+    async def _flush(self):
+        # At most one batch is being written while the next one fills up
+        if self._pending is not None:
+            await self._pending
+            self._pending = None
+        if self._batch:
+            self._pending = asyncio.ensure_future(self._write(self._batch))
+            self._batch = []
+
+    async def _write(self, batch: List[tuple]):
+        failed = set()
+        try:
+            result = await db.questionnaire_answers.insert_many([to_mongo(answers) for _, answers in batch], ordered=False)
+            self.report['inserted'] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            self.report['inserted'] += e.details.get('nInserted', 0)
+            for write_error in e.details.get('writeErrors', []):
+                failed.add(write_error['index'])
+                self.error(batch[write_error['index']][0], write_error.get('errmsg', 'Write failed'))
+        
+        if self.create_profiles:
+            profiles = [to_mongo(build_profile(answers)) for index, (_, answers) in enumerate(batch) if index not in failed]
+            if profiles:
+                try:
+                    result = await db.user_profiles.insert_many(profiles, ordered=False)
+                    self.report['profiles_created'] += len(result.inserted_ids)
+                except BulkWriteError as e:
+                    self.report['profiles_created'] += e.details.get('nInserted', 0)
+                    logging.warning(f"{len(e.details.get('writeErrors', []))} imported profiles failed to insert")
+                    rejected = {write_error['index'] for write_error in e.details.get('writeErrors', [])}
+                    profiles = [doc for index, doc in enumerate(profiles) if index not in rejected]
+                await record_profile_rollups(profiles)
+
+    async def finish(self) -> Dict[str, Any]:
+        await self._flush()
+        if self._pending is not None:
+            await self._pending
+            self._pending = None
+        self.report['errors'].sort(key=lambda error: error['line'])
+        return self.report
+
+    def abort(self):
+        if self._pending is not None:
+            self._pending.cancel()
+
+async def import_questionnaires(chunks: AsyncIterator[bytes], batch_size: int = IMPORT_BATCH_SIZE,
+                                create_profiles: bool = False) -> Dict[str, Any]:
+    """Validate and insert NDJSON questionnaire answers, optionally scoring each into a profile"""
+    started = time.perf_counter()
+    job = QuestionnaireImport(batch_size, create_profiles)
+    try:
+        async for line_number, line in iter_ndjson_lines(chunks):
+            if line is not None and not line.strip():
+                continue
+            await job.add(line_number, line)
+        report = await job.finish()
+    except BaseException:
+        job.abort()
+        raise
+    report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+# Plan History
+# Newest first, with id breaking ties between plans created in the same millisecond
+PLAN_HISTORY_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+PLAN_HISTORY_DEFAULT_LIMIT = 20
+PLAN_HISTORY_MAX_LIMIT = 100
+PLAN_SUMMARY_PROJECTION = {"_id": 0, "id": 1, "profile_id": 1, "created_at": 1, "source": 1,
+                           "yearly_goal": 1, "monthly_focus": 1}
+
+def encode_plan_cursor(plan_doc: Dict[str, Any]) -> str:
+    """Opaque keyset cursor for the position just after this plan"""
+    created_at = plan_doc['created_at']
+    # Rows not yet converted by backfill_dates keep their string, which sorts apart from dates
+    if isinstance(created_at, str):
+        raw = f"s|{created_at}|{plan_doc['id']}"
+    else:
+        raw = f"d|{created_at.isoformat()}|{plan_doc['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_plan_cursor(cursor: str) -> tuple:
+    """Inverse of encode_plan_cursor, giving created_at as a datetime or a legacy string; raises ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        kind, created_at, plan_id = raw.split('|', 2)
+        if kind not in ('d', 's'):
+            raise ValueError(f"unknown position kind {kind!r}")
+        # Validates the string form as well, though it is matched as stored
+        parsed = datetime.fromisoformat(created_at)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if kind == 's':
+        return created_at, plan_id
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed, plan_id
+
+def plan_history_filter(profile_id: str, after: Optional[tuple] = None) -> Dict[str, Any]:
+    """Plans for a profile, strictly older than the (created_at, id) position when given"""
+    query = {"profile_id": profile_id}
+    if after:
+        created_at, plan_id = after
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": plan_id}},
+        ]
+        if not isinstance(created_at, str):
+            # Descending order puts every string-dated legacy row after all the dates
+            query["$or"].append({"created_at": {"$type": "string"}})
+    return query
+
+async def find_latest_plan(profile_id: str, projection: Dict[str, int] = PLAN_PROJECTION) -> Optional[Dict[str, Any]]:
+    return await db.personalized_plans.find_one({"profile_id": profile_id}, projection, sort=PLAN_HISTORY_SORT)
+
+async def list_plan_history(profile_id: str, limit: int = PLAN_HISTORY_DEFAULT_LIMIT, cursor: Optional[str] = None,
+                            full: bool = False) -> Dict[str, Any]:
+    """One page of a profile's plans, newest first, and the cursor for the next page"""
+    after = decode_plan_cursor(cursor) if cursor else None
+    projection = PLAN_PROJECTION if full else PLAN_SUMMARY_PROJECTION
+    # One extra row tells us whether another page exists without a count query
+    docs = await db.personalized_plans.find(plan_history_filter(profile_id, after), projection) \
+        .sort(PLAN_HISTORY_SORT).limit(limit + 1).to_list(limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_plan_cursor(docs[-1]) if has_more else None
+    for doc in docs:
+        doc.setdefault('source', 'llm')
+        if isinstance(doc.get('created_at'), str):
+            doc['created_at'] = parse_stored_date(doc['created_at'])
+    return {'plans': docs, 'next_cursor': next_cursor}
+
+# Plan Read Cache
+# GET /plan/{profile_id} is served from pre-serialized bodies keyed by profile. Writers
+# in this process invalidate directly; the TTL bounds staleness from other workers.
+PLAN_READ_CACHE_MAX_ENTRIES = int(os.environ.get('PLAN_READ_CACHE_MAX_ENTRIES', '2048'))
+PLAN_READ_CACHE_TTL_SECONDS = float(os.environ.get('PLAN_READ_CACHE_TTL_SECONDS', '300'))
+# Browsers keep the plan but revalidate each time, which costs a 304 when nothing changed
+PLAN_CACHE_CONTROL = "private, no-cache"
+
+def plan_etag(plan_doc: Dict[str, Any]) -> str:
+    """Strong validator: the plan id changes on regeneration, the revision on in-place edits"""
+    return f'"{plan_doc["id"]}.{plan_doc.get("revision", 1)}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix still matches
+    return any(candidate.strip().removeprefix('W/') == etag for candidate in if_none_match.split(','))
+
+class PlanReadCache:
+    """Read-through LRU of the latest plan per profile, stored as (etag, JSON body)
+
+    Each entry remembers the profile's invalidation stamp in the shared cache when
+    it was filled; a hit whose stamp has since changed was invalidated by another
+    process and is reloaded.
+    """
+
+    def __init__(self, max_entries: int = PLAN_READ_CACHE_MAX_ENTRIES, ttl_seconds: float = PLAN_READ_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Bumped on every invalidation so a read that raced a write does not cache the old plan
+        self._generation = 0
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    async def get(self, profile_id: str) -> Optional[tuple]:
+        entry = self._entries.get(profile_id)
+        if entry is not None:
+            expires_at, etag, body, stamp = entry
+            if expires_at > time.monotonic() and stamp == self._shared_stamp(profile_id):
+                self._entries.move_to_end(profile_id)
+                self.stats['hits'] += 1
+                return etag, body
+            self._forget(profile_id)
+
+        self.stats['misses'] += 1
+        generation = self._generation
+        # Read before the plan so a write landing in between leaves this entry stale, not current
+        stamp = self._shared_stamp(profile_id)
+        plan_doc = await find_latest_plan(profile_id)
+        if not plan_doc:
+            return None
+        plan_doc.setdefault('source', 'llm')
+        etag = plan_etag(plan_doc)
+        body = orjson.dumps(plan_doc)
+        if generation == self._generation:
+            self._remember(profile_id, etag, body, stamp)
+        return etag, body
+
+    def _shared_stamp(self, profile_id: str) -> Optional[str]:
+        shared = shared_cache.get('plan_reads', profile_id)
+        return shared[0] if shared is not None else None
+
+    def _remember(self, profile_id: str, etag: str, body: bytes, stamp: Optional[str]):
+        self._forget(profile_id)
+        self._entries[profile_id] = (time.monotonic() + self.ttl_seconds, etag, body, stamp)
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+
+    def _forget(self, profile_id: str):
+        self._entries.pop(profile_id, None)
+
+    async def invalidate(self, profile_id: str):
+        """Drop the profile's entry here and, through a new shared stamp, in every other process"""
+        self._generation += 1
+        self.stats['invalidations'] += 1
+        self._forget(profile_id)
+        # Entries live at most ttl_seconds, so the stamp need not outlast them
+        await shared_cache.set('plan_reads', profile_id, uuid.uuid4().hex, time.time() + self.ttl_seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds, **self.stats}
+
+plan_reads = PlanReadCache()
+
+metrics.register(CounterView(
+    'lifeplan_plan_read_cache_lookups_total', 'Plan read cache lookups by result',
+    lambda: {('hit',): plan_reads.stats['hits'], ('miss',): plan_reads.stats['misses']}, ('result',)
+))
+
+# Section Regeneration
+# Rewrites one section of a stored plan: the prompt carries the profile, a one-line digest of
+# the other sections and the requested section name only, and the result lands as a $set on
+# that field guarded by the revision it was generated against.
+# Usage of the most recent regenerations kept on the plan
+PLAN_EDIT_USAGE_MAX_ENTRIES = 50
+
+def section_digest(value: Any) -> str:
+    if isinstance(value, dict):
+        return compact_list(list(value))
+    if isinstance(value, list):
+        return compact_list([(item.get('habit') or item.get('name') or '') if isinstance(item, dict) else str(item)
+                             for item in value])
+    return compact_text(value, PLAN_PROMPT_ITEM_MAX_CHARS)
+
+def build_section_edit_prompt(profile: UserProfile, answers: QuestionnaireAnswer, name: str,
+                              plan_data: Dict[str, Any], instructions: Optional[str] = None) -> str:
+    """Prompt for one replacement section, with the rest of the plan reduced to a digest"""
+    outline = '; '.join(f"{other}: {section_digest(plan_data[other])}" for other in PLAN_SECTIONS
+                        if other != name and other != 'justification' and other in plan_data)
+    prompt = build_plan_prompt(profile, answers) + f"\nRest of the plan (keep consistent with it): {outline}"
+    if instructions:
+        prompt += f"\nRequested change: {compact_text(instructions)}"
+    return prompt + f"\n\nReturn only a JSON object with one key: {name}"
+
+async def regenerate_plan_section(plan_id: str, name: str, instructions: Optional[str] = None,
+                                  if_match: Optional[str] = None) -> Dict[str, Any]:
+    """Replace one section of a stored plan with a fresh LLM version; returns the updated plan document"""
+    if name not in PLAN_SECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown plan section")
+    plan_doc = await db.personalized_plans.find_one({"id": plan_id}, PLAN_PROJECTION)
+    if not plan_doc:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    if if_match and not etag_matches(if_match, plan_etag(plan_doc)):
+        raise HTTPException(status_code=412, detail="Plan has changed since it was read")
+    profile, answers = await load_profile_and_answers(plan_doc['profile_id'])
+
+    usage = {}
+    with span("plan.section_llm_call"):
+        response = await llm_pool.complete(build_section_edit_prompt(profile, answers, name, plan_doc, instructions), usage)
+    with span("plan.parse"):
+        value = extract_plan_sections(response).get(name)
+    if value is None:
+        LLM_PARSE_FAILURES.inc()
+        raise HTTPException(status_code=502, detail="The model did not return a valid section")
+
+    revision = plan_doc.get('revision', 1)
+    # Plans stored before revisions were tracked have no field, which counts as revision 1
+    revision_filter = {"$in": [1, None]} if revision == 1 else revision
+    edited_at = datetime.now(timezone.utc)
+    edit_usage = {'section': name, 'edited_at': edited_at, **usage}
+    with span("plan.save"):
+        result = await db.personalized_plans.update_one(
+            {"id": plan_id, "revision": revision_filter},
+            {"$set": {name: value, "edited_at": edited_at}, "$inc": {"revision": 1},
+             "$push": {"edit_token_usage": {"$each": [edit_usage], "$slice": -PLAN_EDIT_USAGE_MAX_ENTRIES}}}
+        )
+    if not result.matched_count:
+        raise HTTPException(status_code=409, detail="Plan was changed while the section was regenerated")
+    await plan_reads.invalidate(plan_doc['profile_id'])
+    # The guard matched the revision we read, so the stored plan is what we read plus this change
+    plan_doc.setdefault('source', 'llm')
+    edits = (plan_doc.get('edit_token_usage') or []) + [edit_usage]
+    return {**plan_doc, name: value, 'revision': revision + 1,
+            'edit_token_usage': edits[-PLAN_EDIT_USAGE_MAX_ENTRIES:]}
+
+# Admission Control
+# Plan generation is admitted through a concurrency limit with a bounded FIFO queue;
+# anything beyond that is shed at once with 503 + Retry-After instead of piling up.
+# The limit backs off multiplicatively while LLM latency is above target and creeps
+# back up while it is healthy. Cheap endpoints never pass through here.
+PLAN_ADMISSION_MAX_CONCURRENCY = int(os.environ.get('PLAN_ADMISSION_MAX_CONCURRENCY', str(LLM_POOL_SIZE * 4)))
+PLAN_ADMISSION_MIN_CONCURRENCY = int(os.environ.get('PLAN_ADMISSION_MIN_CONCURRENCY', '2'))
+PLAN_ADMISSION_QUEUE_SIZE = int(os.environ.get('PLAN_ADMISSION_QUEUE_SIZE', '64'))
+PLAN_ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('PLAN_ADMISSION_QUEUE_TIMEOUT_SECONDS', '15'))
+PLAN_ADMISSION_TARGET_LATENCY_SECONDS = float(os.environ.get('PLAN_ADMISSION_TARGET_LATENCY_SECONDS', '30'))
+PLAN_ADMISSION_BACKOFF_COOLDOWN_SECONDS = 2.0
+# Per-client token bucket; a rate of 0 disables quotas
+PLAN_CLIENT_RATE_PER_MINUTE = float(os.environ.get('PLAN_CLIENT_RATE_PER_MINUTE', '10'))
+PLAN_CLIENT_BURST = int(os.environ.get('PLAN_CLIENT_BURST', '5'))
+PLAN_CLIENT_MAX_TRACKED = 10000
+# Proxies in front of the app that append to X-Forwarded-For; 0 means trust the peer address only
+PLAN_TRUSTED_PROXY_HOPS = int(os.environ.get('PLAN_TRUSTED_PROXY_HOPS', '1'))
+
+def client_identity(request: Request) -> str:
+    """Caller address as recorded by the outermost trusted proxy
+
+    Hops left of those the trusted proxies appended are client-supplied and
+    ignored, so a spoofed X-Forwarded-For cannot dodge the per-client quota.
+    """
+    forwarded = request.headers.get('x-forwarded-for')
+    if forwarded and PLAN_TRUSTED_PROXY_HOPS > 0:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if hops:
+            return hops[max(0, len(hops) - PLAN_TRUSTED_PROXY_HOPS)]
+    return request.client.host if request.client else 'unknown'
+
+class AdmissionSlot:
+    """A held admission slot; releasing it more than once is a no-op"""
+
+    def __init__(self, controller: 'AdmissionController'):
+        self._controller = controller
+        self.held = True
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self._controller.release()
+
+class AdmissionController:
+    """Adaptive concurrency limit with a bounded wait queue and per-client token buckets"""
+
+    def __init__(self, max_concurrency: int = PLAN_ADMISSION_MAX_CONCURRENCY,
+                 min_concurrency: int = PLAN_ADMISSION_MIN_CONCURRENCY, max_queue: int = PLAN_ADMISSION_QUEUE_SIZE,
+                 queue_timeout: float = PLAN_ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                 target_latency: float = PLAN_ADMISSION_TARGET_LATENCY_SECONDS,
+                 latency_source: Callable[[], Optional[float]] = lambda: llm_pool.latency_ewma,
+                 client_rate: float = PLAN_CLIENT_RATE_PER_MINUTE, client_burst: int = PLAN_CLIENT_BURST):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(1, min(min_concurrency, max_concurrency))
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.latency_source = latency_source
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._last_backoff = 0.0
+        self.stats = {'admitted': 0, 'queued': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0,
+                      'rejected_quota': 0}
+
+    def _retry_after(self) -> str:
+        """Seconds until the queue ahead of a new request has likely drained"""
+        latency = self.latency_source() or 1.0
+        waves = (len(self._waiters) + 1) / max(1, int(self.limit))
+        return str(max(1, min(60, math.ceil(waves * latency))))
+
+    def _overloaded(self, counter: str) -> HTTPException:
+        self.stats[counter] += 1
+        return HTTPException(status_code=503, detail="Plan generation is at capacity, please retry shortly",
+                             headers={"Retry-After": self._retry_after()})
+
+    def check_quota(self, client_id: str):
+        """Spend one token from the client's bucket or reject with 429"""
+        if self.client_rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client_id, (float(self.client_burst), now))
+        tokens = min(float(self.client_burst), tokens + (now - updated) * self.client_rate / 60)
+        if tokens < 1:
+            self._buckets[client_id] = (tokens, now)
+            self.stats['rejected_quota'] += 1
+            retry_after = math.ceil((1 - tokens) * 60 / self.client_rate)
+            raise HTTPException(status_code=429, detail="Too many plan requests, please slow down",
+                                headers={"Retry-After": str(retry_after)})
+        self._buckets[client_id] = (tokens - 1, now)
+        while len(self._buckets) > PLAN_CLIENT_MAX_TRACKED:
+            self._buckets.popitem(last=False)
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if needed; raises 503 when the queue is full or the wait times out"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.stats['admitted'] += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._overloaded('rejected_queue_full')
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats['queued'] += 1
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait timed out
+                return
+            raise self._overloaded('rejected_timeout')
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self):
+        self.in_flight -= 1
+        self._adapt()
+        # Hand freed slots straight to the oldest waiters
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                self.stats['admitted'] += 1
+                waiter.set_result(None)
+
+    def _adapt(self):
+        latency = self.latency_source()
+        if latency is None:
+            return
+        if latency > self.target_latency:
+            now = time.monotonic()
+            if now - self._last_backoff >= PLAN_ADMISSION_BACKOFF_COOLDOWN_SECONDS:
+                self.limit = max(float(self.min_concurrency), self.limit * 0.75)
+                self._last_backoff = now
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    async def hold(self) -> AdmissionSlot:
+        """Acquire a slot for a caller that releases it outside a with block"""
+        await self.acquire()
+        return AdmissionSlot(self)
+
+    @asynccontextmanager
+    async def admit(self, client_id: str, hold_slot: bool = True):
+        """Quota check, then hold a slot for the duration of the block unless hold_slot is off"""
+        self.check_quota(client_id)
+        if not hold_slot:
+            yield
+            return
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'limit': round(self.limit, 2), 'max_concurrency': self.max_concurrency, 'in_flight': self.in_flight,
+                'queued_now': len(self._waiters), 'max_queue': self.max_queue,
+                'llm_latency_seconds': self.latency_source(), **self.stats}
+
+plan_admission = AdmissionController()
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """Streaming response that gives back its admission slot however sending ends
+
+    The body generator releases the slot when it finishes, but a response
+    cancelled or failing before the generator first runs never enters it.
+    """
+
+    def __init__(self, content, slot: AdmissionSlot, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()
+
+metrics.register(Gauge('lifeplan_plan_admission_limit', 'Current adaptive plan concurrency limit',
+                       lambda: plan_admission.limit))
+metrics.register(Gauge('lifeplan_plan_admission_in_flight', 'Plan requests holding an admission slot',
+                       lambda: plan_admission.in_flight))
+metrics.register(Gauge('lifeplan_plan_admission_queue_depth', 'Plan requests waiting for a slot',
+                       lambda: len(plan_admission._waiters)))
+metrics.register(CounterView(
+    'lifeplan_plan_admission_rejections_total', 'Plan requests shed by admission control',
+    lambda: {(reason,): plan_admission.stats[f'rejected_{reason}'] for reason in ('queue_full', 'timeout', 'quota')},
+    ('reason',)
+))
+
+# Index Management
+# Every index the hot queries rely on, declared per collection and created idempotently at startup
+INDEX_SPECS = {
+    'questionnaire_answers': [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    'user_profiles': [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("questionnaire_id", ASCENDING)], name="questionnaire_id"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    'personalized_plans': [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Serves both the latest-plan lookup and keyset pagination of plan history
+        IndexModel([("profile_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="profile_id_created_at_id"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+    ],
+    'plan_cache': [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        # Incremental refresh of the plan reuse index
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+    ],
+    'plan_jobs': [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+        IndexModel([("profile_id", ASCENDING), ("status", ASCENDING)], name="profile_id_status"),
+    ],
+    'analytics_rollups': [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+    ],
+    'plan_leases': [
+        IndexModel([("profile_id", ASCENDING)], name="profile_id_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Indexes that a newer spec above has replaced; dropped by ensure_indexes when present
+OBSOLETE_INDEXES = {
+    'personalized_plans': ['profile_id_created_at'],
+}
+
+# (collection, filter, sort) for each query on a request path; explain() must never pick COLLSCAN
+HOT_QUERIES = [
+    ('questionnaire_answers', {"id": "explain-probe"}, None),
+    ('user_profiles', {"id": "explain-probe"}, None),
+    ('personalized_plans', {"id": "explain-probe"}, None),
+    ('personalized_plans', {"profile_id": "explain-probe"}, PLAN_HISTORY_SORT),
+    ('personalized_plans', plan_history_filter("explain-probe", (datetime.now(timezone.utc), "explain-probe")),
+     PLAN_HISTORY_SORT),
+    ('user_profiles', {"created_at": {"$gt": datetime(2000, 1, 1, tzinfo=timezone.utc)}},
+     [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ('personalized_plans', {"created_at": {"$gt": datetime(2000, 1, 1, tzinfo=timezone.utc)}},
+     [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ('plan_cache', {"key": "explain-probe"}, None),
+    ('plan_cache', {"created_at": {"$gt": datetime(2000, 1, 1, tzinfo=timezone.utc)}}, [("created_at", DESCENDING)]),
+    ('plan_jobs', {"id": "explain-probe"}, None),
+    ('plan_jobs', {"status": "queued"}, [("created_at", ASCENDING)]),
+    ('plan_jobs', {"profile_id": "explain-probe", "status": {"$in": ["queued", "running"]}}, None),
+    ('plan_leases', {"profile_id": "explain-probe"}, None),
+    ('analytics_rollups', {"key": {"$in": ["all", "day:2000-01-01"]}}, None),
+]
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """Create all declared indexes; existing identical indexes are left alone"""
+    created = {}
+    for collection_name, indexes in INDEX_SPECS.items():
+        try:
+            created[collection_name] = await db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            # An index with the same name but different options already exists
+            logging.error(f"Could not create indexes on {collection_name}: {e}")
+            created[collection_name] = []
+    for collection_name, names in OBSOLETE_INDEXES.items():
+        existing = await db[collection_name].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection_name].drop_index(name)
+                logging.info(f"Dropped obsolete index {collection_name}.{name}")
+    return created
+
+def plan_stages(plan: Any) -> List[str]:
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+async def verify_query_plans() -> Dict[str, Any]:
+    """Run explain() on every hot query and flag any that fall back to a collection scan"""
+    results = []
+    for collection_name, query, sort in HOT_QUERIES:
+        cursor = db[collection_name].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        stages = plan_stages(explanation.get('queryPlanner', {}).get('winningPlan', {}))
+        results.append({
+            'collection': collection_name,
+            'filter': list(query.keys()),
+            'sort': [field for field, _ in sort] if sort else [],
+            'stages': stages,
+            'collscan': 'COLLSCAN' in stages,
+        })
+    return {'ok': not any(result['collscan'] for result in results), 'queries': results}
+
+# Lifespan
+# Startup warms Mongo, indexes, scoring rules, the LLM client and, with reuse on, the plan
+# reuse index concurrently, each step timed and none of them fatal; /readyz stays 503 until the
+# warm-up that matters has passed.
+STARTUP_STEP_TIMEOUT_SECONDS = float(os.environ.get('STARTUP_STEP_TIMEOUT_SECONDS', '20'))
+# The legacy date backfill scans unindexed fields, so every boot only runs it when asked;
+# otherwise it is the one-off `cli.py backfill-dates`
+STARTUP_DATE_BACKFILL = os.environ.get('STARTUP_DATE_BACKFILL', '').lower() in ('1', 'true', 'yes')
+READINESS_PING_TIMEOUT_SECONDS = float(os.environ.get('READINESS_PING_TIMEOUT_SECONDS', '2'))
+
+async def warm_scoring_rules() -> List[str]:
+    scoring_rules.ensure_loaded()
+    return sorted(scoring_rules.versions)
+
+async def warm_llm_client() -> str:
+    if llm_pool.provider_name == 'emergent':
+        # The SDK import is the slowest part of a cold start; run it off the event loop
+        await asyncio.to_thread(importlib.import_module, 'emergentintegrations.llm.chat')
+    return llm_pool.provider.name
+
+async def warm_plan_index() -> str:
+    await plan_neighbours.refresh(force=True)
+    return f"{len(plan_neighbours)} plans"
+
+class AppLifecycle:
+    """Timed parallel warm-up, readiness state and ordered shutdown of the shared resources"""
+
+    # Steps whose failure keeps the service out of rotation; the rest only degrade it
+    REQUIRED_STEPS = ('mongo', 'scoring_rules')
+
+    def __init__(self, step_timeout: float = STARTUP_STEP_TIMEOUT_SECONDS):
+        self.step_timeout = step_timeout
+        self.started = False
+        self.report: Dict[str, Any] = {'ready': False, 'phases': {}, 'steps': {}}
+
+    async def _step(self, name: str, warm: Callable[[], Awaitable[Any]]):
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(warm(), timeout=self.step_timeout)
+            step = {'ok': True, 'seconds': round(time.perf_counter() - started, 4)}
+            if isinstance(result, (str, list)):
+                step['result'] = result
+        except Exception as e:
+            step = {'ok': False, 'seconds': round(time.perf_counter() - started, 4), 'error': f"{type(e).__name__}: {e}"}
+            logging.error(f"Startup step {name} failed: {e}")
+        self.report['steps'][name] = step
+
+    async def start(self):
+        started = time.perf_counter()
+        phases = self.report['phases']
+        phases['import'] = round(IMPORT_FINISHED_AT - IMPORT_STARTED_AT, 4)
+        steps = [
+            self._step('mongo', lambda: db.command('ping')),
+            self._step('indexes', ensure_indexes),
+            self._step('scoring_rules', warm_scoring_rules),
+            self._step('llm_client', warm_llm_client),
+        ]
+        if plan_reuse_enabled():
+            steps.append(self._step('plan_index', warm_plan_index))
+        if STARTUP_DATE_BACKFILL:
+            steps.append(self._step('date_backfill', backfill_dates))
+        await asyncio.gather(*steps)
+        phases['warmup'] = round(time.perf_counter() - started, 4)
+        await self._step('plan_jobs', plan_jobs.start)
+        phases['total'] = round(time.perf_counter() - IMPORT_STARTED_AT, 4)
+        self.report['ready'] = all(self.report['steps'][name]['ok'] for name in self.REQUIRED_STEPS)
+        self.started = True
+        logging.info(f"Startup finished in {phases['total']}s (import {phases['import']}s, warm-up {phases['warmup']}s); "
+                     + ', '.join(f"{name} {step['seconds']}s{'' if step['ok'] else ' FAILED'}"
+                                 for name, step in self.report['steps'].items()))
+
+    async def stop(self):
+        self.started = False
+        self.report['ready'] = False
+        await plan_jobs.stop()
+        await llm_pool.aclose()
+        mongo.close()
+
+    async def readiness(self) -> Dict[str, Any]:
+        """Live Mongo ping on top of the startup result"""
+        checks = {'startup': self.started and self.report['ready']}
+        try:
+            await asyncio.wait_for(db.command('ping'), timeout=READINESS_PING_TIMEOUT_SECONDS)
+            checks['mongo'] = True
+        except Exception as e:
+            logging.warning(f"Readiness ping failed: {e}")
+            checks['mongo'] = False
+        return {'ready': all(checks.values()), 'checks': checks}
+
+lifecycle = AppLifecycle()
+
+metrics.register(Gauge(
+    'lifeplan_startup_seconds', 'Seconds spent in each startup phase',
+    lambda: {(phase,): seconds for phase, seconds in lifecycle.report['phases'].items()},
+    ('phase',)
+))
+
+# Admin Auth
+# Bulk and maintenance routes need ADMIN_TOKEN as a bearer token. Without one configured
+# they are closed; the same jobs are available through cli.py.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+async def require_admin(authorization: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled; set ADMIN_TOKEN to enable it")
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+# API Routes
+@api_router.get("/")
+async def root():
+    return {"message": "LifePlan AI - Productivity Coaching API"}
+
+@api_router.get("/plan-cache/stats")
+async def get_plan_cache_stats():
+    """Hit/miss counters for the plan generation, plan read and shared on-disk caches"""
+    return {**plan_cache.snapshot(), 'reads': plan_reads.snapshot(), 'shared': shared_cache.snapshot()}
+
+@api_router.get("/admin/startup", dependencies=[Depends(require_admin)])
+async def get_startup_report():
+    """Import and warm-up timings from the last startup"""
+    return lifecycle.report
+
+@api_router.get("/admin/plan-reuse", dependencies=[Depends(require_admin)])
+async def get_plan_reuse_stats():
+    """Nearest-neighbour index size and how often plans were adapted instead of generated"""
+    return plan_neighbours.snapshot()
+
+@api_router.get("/admin/llm", dependencies=[Depends(require_admin)])
+async def get_llm_stats():
+    """LLM provider, pool size and call counters"""
+    return llm_pool.snapshot()
+
+@api_router.get("/admin/admission", dependencies=[Depends(require_admin)])
+async def get_admission_stats():
+    """Plan admission limit, queue depth and shed counts"""
+    return plan_admission.snapshot()
+
+@api_router.get("/admin/plan-flights", dependencies=[Depends(require_admin)])
+async def get_plan_flight_stats():
+    """How many plan requests were coalesced onto another in-flight generation"""
+    return plan_flights.stats
+
+@api_router.get("/admin/indexes/verify", dependencies=[Depends(require_admin)])
+async def verify_indexes():
+    """Explain every hot query; responds 503 if any of them is a collection scan"""
+    try:
+        report = await verify_query_plans()
+    except Exception as e:
+        logging.error(f"Error verifying query plans: {e}")
+        raise HTTPException(status_code=500, detail="Error verifying query plans")
+    return ORJSONResponse(status_code=200 if report['ok'] else 503, content=report)
+
+@api_router.post("/admin/rescore", dependencies=[Depends(require_admin)])
+async def rescore_profiles(batch_size: int = 1000, dry_run: bool = False, verify: bool = False,
+                           version: Optional[str] = None):
+    """Recompute all profile scores with the current scoring rules"""
+    try:
+        return await rescore_all_profiles(batch_size=batch_size, dry_run=dry_run, verify=verify, version=version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown scoring rules version")
+    except Exception as e:
+        logging.error(f"Error rescoring profiles: {e}")
+        raise HTTPException(status_code=500, detail="Error rescoring profiles")
+
+@api_router.get("/admin/scoring-rules", dependencies=[Depends(require_admin)])
+async def get_scoring_rules():
+    """Loaded scoring rule versions, the active one and any running experiment"""
+    return scoring_rules.describe()
+
+@api_router.post("/admin/scoring-rules/reload", dependencies=[Depends(require_admin)])
+async def reload_scoring_rules():
+    """Re-read the scoring rules file now instead of waiting for the next check"""
+    changed = scoring_rules.reload()
+    return {'reloaded': changed, **scoring_rules.describe()}
+
+@api_router.get("/admin/export/{dataset}", dependencies=[Depends(require_admin)])
+async def export_dataset(dataset: str, format: str = 'ndjson', since: Optional[datetime] = None,
+                         batch_size: int = EXPORT_BATCH_SIZE):
+    """Stream profiles or plans created after `since`; X-Export-Watermark is the `since` for the next run"""
+    try:
+        export = AnalyticsExport(dataset, format, since, batch_size)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown dataset")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    return StreamingResponse(
+        export.stream(),
+        media_type=export.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{export.filename}"',
+            "X-Export-Watermark": export.until.isoformat(),
+        }
+    )
+
+@api_router.post("/admin/rollups/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_analytics_rollups():
+    """Recompute the archetype and axis rollups from every profile"""
+    try:
+        return await rebuild_rollups()
+    except Exception as e:
+        logging.error(f"Error rebuilding rollups: {e}")
+        raise HTTPException(status_code=500, detail="Error rebuilding rollups")
+
+@api_router.get("/analytics/rollups")
+async def get_analytics_rollups(days: int = 30):
+    """Archetype distribution and axis score averages and histograms, overall and per day"""
+    if not 1 <= days <= ROLLUP_MAX_DAYS:
+        raise HTTPException(status_code=422, detail=f"days must be between 1 and {ROLLUP_MAX_DAYS}")
+    try:
+        return ORJSONResponse(await read_rollups(days))
+    except Exception as e:
+        logging.error(f"Error reading rollups: {e}")
+        raise HTTPException(status_code=500, detail="Error reading analytics")
+
+@api_router.post("/questionnaire", response_model=QuestionnaireAnswer)
+async def submit_questionnaire(answers: QuestionnaireAnswer):
+    """Submit questionnaire answers"""
+    try:
+        await db.questionnaire_answers.insert_one(to_mongo(answers))
+        return answers
+    except Exception as e:
+        logging.error(f"Error saving questionnaire: {e}")
+        raise HTTPException(status_code=500, detail="Error saving questionnaire")
+
+@api_router.post("/questionnaire/import", dependencies=[Depends(require_admin)])
+async def import_questionnaire_batch(request: Request, batch_size: int = IMPORT_BATCH_SIZE, create_profiles: bool = False):
+    """Bulk import questionnaire answers from an NDJSON body, one QuestionnaireAnswer per line"""
+    if not 1 <= batch_size <= IMPORT_MAX_BATCH_SIZE:
+        raise HTTPException(status_code=422, detail=f"batch_size must be between 1 and {IMPORT_MAX_BATCH_SIZE}")
+    try:
+        return await import_questionnaires(request.stream(), batch_size=batch_size, create_profiles=create_profiles)
+    except Exception as e:
+        logging.error(f"Error importing questionnaires: {e}")
+        raise HTTPException(status_code=500, detail="Error importing questionnaires")
+
+@api_router.post("/profile", response_model=UserProfile) 
+async def create_profile(questionnaire_id: str):
+    """Create user profile from questionnaire answers"""
+    try:
+        # Get questionnaire answers
+        with span("profile.load_answers"):
+            answer_doc = await db.questionnaire_answers.find_one({"id": questionnaire_id}, QUESTIONNAIRE_PROJECTION)
+        if not answer_doc:
+            raise HTTPException(status_code=404, detail="Questionnaire not found")
+        
+        with span("profile.score"):
+            answers = from_mongo(QuestionnaireAnswer, answer_doc)
+            profile = build_profile(answers)
+        
+        # Save to database
+        with span("profile.insert"):
+            profile_doc = to_mongo(profile)
+            await db.user_profiles.insert_one(profile_doc)
+        await record_profile_rollups([profile_doc])
+        return profile
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error creating profile: {e}")
+        raise HTTPException(status_code=500, detail="Error creating profile")
+
+@api_router.post("/onboard", response_model=OnboardingResult)
+async def onboard(answers: QuestionnaireAnswer, request: Request, async_job: bool = False):
+    """Save questionnaire, score it and generate the plan in a single round trip"""
+    try:
+        # Admitted before anything is written, so a shed request leaves no partial onboarding behind
+        async with plan_admission.admit(client_identity(request), hold_slot=not async_job):
+            profile = build_profile(answers)
+            profile_doc = to_mongo(profile)
+            
+            async def persist():
+                # In order, so a questionnaire id that is already taken stops before a profile
+                # pointing at someone else's answers is stored or counted in the rollups
+                await db.questionnaire_answers.insert_one(to_mongo(answers))
+                await db.user_profiles.insert_one(profile_doc)
+                await record_profile_rollups([profile_doc])
+            
+            if async_job:
+                await persist()
+                job = await plan_jobs.enqueue(profile.id)
+                result = OnboardingResult(questionnaire=answers, profile=profile, job=job)
+                return ORJSONResponse(
+                    status_code=202,
+                    content=result.model_dump(),
+                    headers={"Location": f"/api/plan/jobs/{job['id']}"}
+                )
+            
+            # The writes run while the plan is being generated; if they fail, so does the generation
+            generation = asyncio.ensure_future(generate_plan_within_budget(profile, answers, PLAN_LLM_BUDGET_SECONDS))
+            try:
+                await persist()
+            except BaseException:
+                generation.cancel()
+                await asyncio.gather(generation, return_exceptions=True)
+                raise
+            plan_data, pending = await generation
+            plan = await save_plan(profile.id, plan_data)
+            if pending:
+                run_in_background(upgrade_local_plan(plan.id, plan.profile_id, pending))
+            return OnboardingResult(questionnaire=answers, profile=profile, plan=plan)
+        
+    except HTTPException:
+        raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Questionnaire already submitted")
+    except Exception as e:
+        logging.error(f"Error onboarding: {e}")
+        raise HTTPException(status_code=500, detail="Error creating plan")
+
+@api_router.post("/plan", response_model=PersonalizedPlan)
+async def generate_plan(profile_id: str, request: Request, async_job: bool = False):
+    """Generate personalized plan for user profile"""
+    try:
+        if async_job:
+            # Job mode: hand the LLM call to the worker pool and answer right away
+            plan_admission.check_quota(client_identity(request))
+            if not await db.user_profiles.find_one({"id": profile_id}, {"_id": 1}):
+                raise HTTPException(status_code=404, detail="Profile not found")
+            job = await plan_jobs.enqueue(profile_id)
+            return ORJSONResponse(
+                status_code=202,
+                content=job,
+                headers={"Location": f"/api/plan/jobs/{job['id']}"}
+            )
+        
+        async with plan_admission.admit(client_identity(request)):
+            with span("plan.total"):
+                return await plan_flights.run(
+                    profile_id, lambda: build_plan_for_profile(profile_id, budget=PLAN_LLM_BUDGET_SECONDS)
+                )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error generating plan: {e}")
+        raise HTTPException(status_code=500, detail="Error generating plan")
+
+@api_router.patch("/plan/{plan_id}/sections/{name}", response_model=PersonalizedPlan)
+async def patch_plan_section(plan_id: str, name: str, request: Request, edit: Optional[SectionEditRequest] = None,
+                             if_match: Optional[str] = Header(None)):
+    """Regenerate a single plan section in place; send If-Match with the plan's ETag to guard against lost updates"""
+    try:
+        async with plan_admission.admit(client_identity(request)):
+            with span("plan.section_total"):
+                plan_doc = await regenerate_plan_section(plan_id, name, edit.instructions if edit else None, if_match)
+        return ORJSONResponse(plan_doc, headers={"ETag": plan_etag(plan_doc), "Cache-Control": PLAN_CACHE_CONTROL})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error regenerating plan section: {e}")
+        raise HTTPException(status_code=500, detail="Error regenerating plan section")
+
+@api_router.get("/plan/{profile_id}/stream")
+async def stream_plan(profile_id: str, request: Request):
+    """Stream a new plan for a profile as Server-Sent Events, one event per section"""
+    plan_admission.check_quota(client_identity(request))
+    try:
+        profile, answers = await load_profile_and_answers(profile_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error loading profile for plan stream: {e}")
+        raise HTTPException(status_code=500, detail="Error generating plan")
+    
+    # The slot is taken before the response starts so a rejection is still a plain 503
+    slot = await plan_admission.hold()
+    
+    async def events():
+        try:
+            async for event in stream_plan_events(profile, answers):
+                yield event
+        finally:
+            slot.release()
+    
+    return AdmittedStreamingResponse(
+        events(),
+        slot,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/plan/jobs/{job_id}")
+async def get_plan_job(job_id: str):
+    """Get status and progress of a plan generation job"""
+    job = await plan_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.get("/plan/{profile_id}/history")
+async def get_plan_history(profile_id: str, limit: int = PLAN_HISTORY_DEFAULT_LIMIT, cursor: Optional[str] = None,
+                           full: bool = False):
+    """Page through a profile's plans newest first; pass next_cursor back to get the following page"""
+    if not 1 <= limit <= PLAN_HISTORY_MAX_LIMIT:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {PLAN_HISTORY_MAX_LIMIT}")
+    try:
+        return ORJSONResponse(await list_plan_history(profile_id, limit=limit, cursor=cursor, full=full))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except Exception as e:
+        logging.error(f"Error listing plan history: {e}")
+        raise HTTPException(status_code=500, detail="Error retrieving plan history")
+
+@api_router.get("/plan/{profile_id}", response_model=PersonalizedPlan)
+async def get_plan(profile_id: str, if_none_match: Optional[str] = Header(None)):
+    """Get the latest plan for profile; honours If-None-Match with 304"""
+    try:
+        # Stored plans are already valid, so the cache holds the serialized document as-is
+        cached = await plan_reads.get(profile_id)
+        if cached is None:
+            raise HTTPException(status_code=404, detail="Plan not found")
+        
+        etag, body = cached
+        headers = {"ETag": etag, "Cache-Control": PLAN_CACHE_CONTROL}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error retrieving plan: {e}")
+        raise HTTPException(status_code=500, detail="Error retrieving plan")
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness: startup warm-up succeeded and Mongo answers a ping; 503 otherwise"""
+    status = await lifecycle.readiness()
+    return ORJSONResponse(status, status_code=200 if status['ready'] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -470,6 +4060,8 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    # The frontend reads ETag from plan responses to send it back in If-Match
+    expose_headers=["ETag"],
 )
 
 # Configure logging
@@ -479,6 +4071,5 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+# Read by the startup report to split import time from warm-up time
+IMPORT_FINISHED_AT = time.perf_counter()
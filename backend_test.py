@@ -1,6 +1,7 @@
 import requests
 import sys
 import json
+import time
 from datetime import datetime
 
 class LifePlanAPITester:
@@ -11,6 +12,7 @@ class LifePlanAPITester:
         self.tests_passed = 0
         self.questionnaire_id = None
         self.profile_id = None
+        self.plan_id = None
 
     def run_test(self, name, method, endpoint, expected_status, data=None, params=None):
         """Run a single API test"""
@@ -26,6 +28,8 @@ class LifePlanAPITester:
                 response = requests.get(url, headers=headers, params=params)
             elif method == 'POST':
                 response = requests.post(url, json=data, headers=headers, params=params)
+            elif method == 'PATCH':
+                response = requests.patch(url, json=data, headers=headers, params=params)
 
             success = response.status_code == expected_status
             if success:
@@ -54,9 +58,9 @@ class LifePlanAPITester:
         """Test the root API endpoint"""
         return self.run_test("Root API", "GET", "", 200)
 
-    def test_submit_questionnaire(self):
-        """Test questionnaire submission with sample data"""
-        sample_data = {
+    def sample_answers(self):
+        """Sample questionnaire answers"""
+        return {
             "energizing_activities": "coding and designing apps, solving complex problems",
             "passionate_problems": "help students learn better through technology",
             "existing_skills": ["Programming", "Design", "Teaching"],
@@ -72,13 +76,15 @@ class LifePlanAPITester:
             "main_distractions": ["Social media", "Email", "Phone notifications"],
             "commitment_level": 8
         }
-        
+
+    def test_submit_questionnaire(self):
+        """Test questionnaire submission with sample data"""
         success, response = self.run_test(
             "Submit Questionnaire",
             "POST",
             "questionnaire",
             200,
-            data=sample_data
+            data=self.sample_answers()
         )
         
         if success and 'id' in response:
@@ -125,6 +131,7 @@ class LifePlanAPITester:
         )
         
         if success:
+            self.plan_id = response.get('id')
             print(f"   Plan ID: {response.get('id', 'N/A')}")
             print(f"   Yearly Goal: {response.get('yearly_goal', 'N/A')}")
             print(f"   Pillars: {response.get('pillars', 'N/A')}")
@@ -150,6 +157,72 @@ class LifePlanAPITester:
             return True
         return False
 
+    def test_regenerate_section(self):
+        """Test regenerating a single plan section in place"""
+        if not self.plan_id:
+            print("❌ Cannot test section regeneration - no plan ID")
+            return False
+            
+        success, response = self.run_test(
+            "Regenerate Plan Section",
+            "PATCH",
+            f"plan/{self.plan_id}/sections/habit_stack",
+            200,
+            data={"instructions": "Fewer, shorter habits"}
+        )
+        
+        if success:
+            print(f"   Revision: {response.get('revision', 'N/A')}")
+            print(f"   Habits: {len(response.get('habit_stack', []))}")
+            return response.get('id') == self.plan_id
+        return False
+
+    def test_onboard(self):
+        """Test single-request onboarding"""
+        success, response = self.run_test(
+            "Onboard",
+            "POST",
+            "onboard",
+            200,
+            data=self.sample_answers()
+        )
+        
+        if success and response.get('plan'):
+            print(f"   Profile ID: {response['profile']['id']}")
+            print(f"   Plan ID: {response['plan']['id']}")
+            return True
+        return False
+
+    def test_plan_job(self):
+        """Test asynchronous plan generation through the job queue"""
+        if not self.profile_id:
+            print("❌ Cannot test plan job - no profile ID")
+            return False
+            
+        success, response = self.run_test(
+            "Enqueue Plan Job",
+            "POST",
+            "plan",
+            202,
+            params={"profile_id": self.profile_id, "async_job": "true"}
+        )
+        if not success or 'id' not in response:
+            return False
+        
+        job_id = response['id']
+        print(f"   Job ID: {job_id}")
+        for _ in range(30):
+            success, job = self.run_test("Plan Job Status", "GET", f"plan/jobs/{job_id}", 200)
+            if not success:
+                return False
+            if job.get('status') in ('succeeded', 'failed'):
+                print(f"   Job status: {job['status']}, plan: {job.get('plan_id', 'N/A')}")
+                return job['status'] == 'succeeded'
+            time.sleep(2)
+        
+        print("❌ Plan job did not finish in time")
+        return False
+
 def main():
     print("🚀 Starting LifePlan AI Backend API Tests")
     print("=" * 50)
@@ -162,7 +235,10 @@ def main():
         ("Questionnaire Submission", tester.test_submit_questionnaire),
         ("Profile Creation", tester.test_create_profile),
         ("Plan Generation (Claude)", tester.test_generate_plan),
-        ("Plan Retrieval", tester.test_get_plan)
+        ("Plan Retrieval", tester.test_get_plan),
+        ("Plan Section Regeneration", tester.test_regenerate_section),
+        ("Plan Generation Job", tester.test_plan_job),
+        ("Single-Request Onboarding", tester.test_onboard)
     ]
     
     for test_name, test_func in tests:
@@ -184,13 +184,8 @@ const Questionnaire = ({ onComplete }) => {
     }
   };
 
-  const submitQuestionnaire = async () => {
-    try {
-      const response = await axios.post(`${API}/questionnaire`, formData);
-      onComplete(response.data.id);
-    } catch (error) {
-      console.error('Error submitting questionnaire:', error);
-    }
+  const submitQuestionnaire = () => {
+    onComplete(formData);
   };
 
   const renderQuestion = (question) => {
@@ -354,7 +349,7 @@ const Questionnaire = ({ onComplete }) => {
 };
 
 // Results Component
-const Results = ({ questionnaireId }) => {
+const Results = ({ answers }) => {
   const [profile, setProfile] = useState(null);
   const [plan, setPlan] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -362,13 +357,10 @@ const Results = ({ questionnaireId }) => {
   React.useEffect(() => {
     const generateResults = async () => {
       try {
-        // Create profile
-        const profileResponse = await axios.post(`${API}/profile?questionnaire_id=${questionnaireId}`);
-        setProfile(profileResponse.data);
-
-        // Generate plan
-        const planResponse = await axios.post(`${API}/plan?profile_id=${profileResponse.data.id}`);
-        setPlan(planResponse.data);
+        // Save answers, create profile and generate plan in one request
+        const response = await axios.post(`${API}/onboard`, answers);
+        setProfile(response.data.profile);
+        setPlan(response.data.plan);
       } catch (error) {
         console.error('Error generating results:', error);
       } finally {
@@ -377,7 +369,7 @@ const Results = ({ questionnaireId }) => {
     };
 
     generateResults();
-  }, [questionnaireId]);
+  }, [answers]);
 
   if (loading) {
     return (
@@ -623,14 +615,14 @@ const Results = ({ questionnaireId }) => {
 // Main App Component
 function App() {
   const [currentView, setCurrentView] = useState('hero'); // hero, questionnaire, results
-  const [questionnaireId, setQuestionnaireId] = useState(null);
+  const [answers, setAnswers] = useState(null);
 
   const handleStartQuestionnaire = () => {
     setCurrentView('questionnaire');
   };
 
-  const handleQuestionnaireComplete = (id) => {
-    setQuestionnaireId(id);
+  const handleQuestionnaireComplete = (formData) => {
+    setAnswers(formData);
     setCurrentView('results');
   };
 
@@ -644,8 +636,8 @@ function App() {
         <Questionnaire onComplete={handleQuestionnaireComplete} />
       )}
       
-      {currentView === 'results' && questionnaireId && (
-        <Results questionnaireId={questionnaireId} />
+      {currentView === 'results' && answers && (
+        <Results answers={answers} />
       )}
     </div>
   );
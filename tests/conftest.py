@@ -0,0 +1,54 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'lifeplan_test')
+os.environ.setdefault('LLM_PROVIDER', 'stub')
+os.environ.setdefault('LLM_STUB_LATENCY_SECONDS', '0')
+os.environ.setdefault('PLAN_CLIENT_RATE_PER_MINUTE', '0')
+os.environ.setdefault('SHARED_CACHE_PATH', '')
+
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+SAMPLE_ANSWERS = {
+    "energizing_activities": "coding and designing apps, solving complex problems",
+    "passionate_problems": "help students learn better through technology",
+    "existing_skills": ["Programming", "Design", "Teaching"],
+    "weekday_hours": 4,
+    "weekend_hours": 6,
+    "chronotype": "Early morning",
+    "morning_routine": "Coffee, meditation, planning for 30 minutes",
+    "morning_routine_duration": 30,
+    "reliable_habits": "3-4",
+    "setback_reaction": "learn and iterate immediately",
+    "yearly_goals": ["Launch online course", "Build learning app", "Grow audience"],
+    "key_habit_change": "Start deep work sessions every morning",
+    "main_distractions": ["Social media", "Email", "Phone notifications"],
+    "commitment_level": 8,
+}
+
+@pytest.fixture
+def answers():
+    return server.QuestionnaireAnswer(**SAMPLE_ANSWERS)
+
+@pytest.fixture
+def db(monkeypatch):
+    """Fresh in-memory database, with the in-process caches that sit in front of it reset"""
+    database = AsyncMongoMockClient()['lifeplan_test']
+    monkeypatch.setattr(server, 'db', database)
+    monkeypatch.setattr(server, 'plan_cache', server.PlanCache())
+    monkeypatch.setattr(server, 'plan_reads', server.PlanReadCache())
+    monkeypatch.setattr(server, 'plan_neighbours', server.PlanNeighbourIndex())
+    return database
+
+@pytest.fixture
+def client(db):
+    # Not entered as a context manager, so the lifespan warm-up and job workers stay off
+    return TestClient(server.app)
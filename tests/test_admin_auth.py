@@ -0,0 +1,29 @@
+import pytest
+
+import server
+
+# (method, path) of every route that runs bulk writes, full-collection jobs or exposes internals
+ADMIN_ROUTES = [
+    ("GET", "/api/admin/startup"),
+    ("GET", "/api/admin/plan-reuse"),
+    ("GET", "/api/admin/llm"),
+    ("GET", "/api/admin/admission"),
+    ("GET", "/api/admin/plan-flights"),
+    ("GET", "/api/admin/indexes/verify"),
+    ("GET", "/api/admin/scoring-rules"),
+    ("POST", "/api/admin/rescore"),
+    ("POST", "/api/admin/scoring-rules/reload"),
+    ("POST", "/api/questionnaire/import"),
+    ("POST", "/api/admin/rollups/rebuild"),
+]
+
+@pytest.mark.parametrize("method,path", ADMIN_ROUTES)
+def test_admin_routes_require_admin_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(server, 'ADMIN_TOKEN', 'secret')
+    assert client.request(method, path).status_code == 401
+    assert client.request(method, path, headers={"Authorization": "Bearer nope"}).status_code == 401
+
+@pytest.mark.parametrize("method,path", ADMIN_ROUTES)
+def test_admin_routes_closed_without_configured_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(server, 'ADMIN_TOKEN', '')
+    assert client.request(method, path, headers={"Authorization": "Bearer secret"}).status_code == 403
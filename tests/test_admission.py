@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+import server
+
+def make_request(forwarded=None, peer='10.0.0.9'):
+    headers = [(b'x-forwarded-for', forwarded.encode())] if forwarded else []
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers, 'client': (peer, 1234)})
+
+@pytest.mark.parametrize('hops, forwarded, expected', [
+    (1, 'spoofed, 203.0.113.7', '203.0.113.7'),
+    (2, 'spoofed, 203.0.113.7, 10.0.0.2', '203.0.113.7'),
+    (2, '203.0.113.7', '203.0.113.7'),
+    (0, 'spoofed, 203.0.113.7', '10.0.0.9'),
+    (1, None, '10.0.0.9'),
+])
+def test_client_identity_counts_trusted_hops_from_the_right(monkeypatch, hops, forwarded, expected):
+    monkeypatch.setattr(server, 'PLAN_TRUSTED_PROXY_HOPS', hops)
+    assert server.client_identity(make_request(forwarded)) == expected
+
+async def seed_profile(db, answers):
+    profile = server.build_profile(answers)
+    await db.questionnaire_answers.insert_one(server.to_mongo(answers))
+    await db.user_profiles.insert_one(server.to_mongo(profile))
+    return profile.id
+
+async def disconnected():
+    return {'type': 'http.disconnect'}
+
+def test_stream_slot_released_when_send_fails_before_body(db, answers, monkeypatch):
+    monkeypatch.setattr(server, 'plan_admission', server.AdmissionController())
+
+    async def scenario():
+        profile_id = await seed_profile(db, answers)
+        response = await server.stream_plan(profile_id, make_request())
+        assert server.plan_admission.in_flight == 1
+
+        async def send(message):
+            raise OSError('client went away')
+
+        with pytest.raises(Exception):
+            await response({'type': 'http'}, disconnected, send)
+        assert server.plan_admission.in_flight == 0
+
+    asyncio.run(scenario())
+
+def test_stream_slot_released_when_cancelled_before_body(db, answers, monkeypatch):
+    monkeypatch.setattr(server, 'plan_admission', server.AdmissionController())
+
+    async def scenario():
+        profile_id = await seed_profile(db, answers)
+        response = await server.stream_plan(profile_id, make_request())
+
+        async def send(message):
+            await asyncio.Event().wait()
+
+        task = asyncio.create_task(response({'type': 'http'}, disconnected, send))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert server.plan_admission.in_flight == 0
+        # A second release from the body generator must not free a slot twice
+        response.slot.release()
+        assert server.plan_admission.in_flight == 0
+
+    asyncio.run(scenario())
+
+def test_streamed_plan_releases_its_slot(client, db, answers, monkeypatch):
+    monkeypatch.setattr(server, 'plan_admission', server.AdmissionController())
+    profile_id = asyncio.run(seed_profile(db, answers))
+
+    response = client.get(f'/api/plan/{profile_id}/stream')
+
+    assert response.status_code == 200
+    assert 'event: complete' in response.text
+    assert server.plan_admission.in_flight == 0
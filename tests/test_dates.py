@@ -0,0 +1,24 @@
+import asyncio
+from datetime import datetime, timezone
+
+import server
+
+def test_backfill_converts_string_dates(db):
+    async def run():
+        await db.user_profiles.insert_many([
+            {"id": "legacy", "created_at": "2024-03-01T10:00:00+00:00"},
+            {"id": "naive", "created_at": "2024-03-02T10:00:00"},
+            {"id": "native", "created_at": datetime(2024, 3, 3, tzinfo=timezone.utc)},
+            {"id": "broken", "created_at": "yesterday"},
+        ])
+        first = await server.backfill_dates(batch_size=1)
+        second = await server.backfill_dates()
+        docs = {doc['id']: doc['created_at'] async for doc in db.user_profiles.find({}, {"_id": 0})}
+        return first, second, docs
+
+    first, second, docs = asyncio.run(run())
+    assert first['user_profiles'] == 2
+    assert second['user_profiles'] == 0
+    assert docs['legacy'].replace(tzinfo=timezone.utc) == datetime(2024, 3, 1, 10, tzinfo=timezone.utc)
+    assert docs['naive'].replace(tzinfo=timezone.utc) == datetime(2024, 3, 2, 10, tzinfo=timezone.utc)
+    assert docs['broken'] == "yesterday"
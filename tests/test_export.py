@@ -0,0 +1,43 @@
+import asyncio
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+
+import server
+
+ADMIN = {"Authorization": "Bearer secret"}
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(server, 'ADMIN_TOKEN', 'secret')
+
+def profile_doc(profile_id, created_at):
+    return {"id": profile_id, "questionnaire_id": f"q-{profile_id}", "purpose_clarity": 50, "energy_chronotype": 50,
+            "focus_capacity": 50, "habit_foundation": 50, "mindset_resilience": 50, "skill_trajectory": 50,
+            "archetype": "Strategic Explorer", "scoring_version": "v1", "created_at": created_at}
+
+def test_export_includes_string_dated_rows(client, db, admin):
+    docs = [
+        profile_doc("legacy-1", "2024-01-01T09:00:00+00:00"),
+        profile_doc("legacy-2", "2024-02-01T09:00:00.123456+00:00"),
+        profile_doc("native", datetime(2024, 3, 1, 9, tzinfo=timezone.utc)),
+    ]
+    asyncio.run(db.user_profiles.insert_many(docs))
+
+    response = client.get("/api/admin/export/profiles", headers=ADMIN)
+    assert response.status_code == 200
+    rows = [orjson.loads(line) for line in response.content.splitlines()]
+    assert [row['id'] for row in rows] == ["legacy-1", "legacy-2", "native"]
+    assert all(row['created_at'].startswith('2024-') for row in rows)
+
+    response = client.get("/api/admin/export/profiles", headers=ADMIN, params={"since": "2024-01-15T00:00:00Z"})
+    assert [orjson.loads(line)['id'] for line in response.content.splitlines()] == ["legacy-2", "native"]
+
+def test_admin_routes_require_token(client, admin):
+    assert client.get("/api/admin/export/profiles").status_code == 401
+    assert client.get("/api/admin/export/profiles", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+def test_admin_routes_closed_without_token(client, monkeypatch):
+    monkeypatch.setattr(server, 'ADMIN_TOKEN', '')
+    assert client.get("/api/admin/export/profiles", headers=ADMIN).status_code == 403
@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+from pymongo import ASCENDING
+
+import server
+from tests.conftest import SAMPLE_ANSWERS
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def read_lines(data: bytes, size: int):
+    async def collect():
+        return [item async for item in server.iter_ndjson_lines(chunked(data, size))]
+    return asyncio.run(collect())
+
+def ndjson(*rows) -> bytes:
+    return b"".join(json.dumps(row).encode() + b"\n" for row in rows)
+
+@pytest.mark.parametrize('size', [1, 3, 7, 1024])
+def test_lines_split_across_chunks(size):
+    assert read_lines(b'{"a": 1}\n{"b": 2}\n{"c": 3}', size) == [(1, b'{"a": 1}'), (2, b'{"b": 2}'), (3, b'{"c": 3}')]
+
+@pytest.mark.parametrize('size', [1, 4, 1024])
+def test_over_long_line_is_reported_and_skipped(monkeypatch, size):
+    monkeypatch.setattr(server, 'IMPORT_MAX_LINE_BYTES', 8)
+    assert read_lines(b'short\n' + b'x' * 30 + b'\nnext\n', size) == [(1, b'short'), (2, None), (3, b'next')]
+
+def test_over_long_final_line_without_newline(monkeypatch):
+    monkeypatch.setattr(server, 'IMPORT_MAX_LINE_BYTES', 8)
+    assert read_lines(b'short\n' + b'x' * 30, 4) == [(1, b'short'), (2, None)]
+
+def test_blank_final_line_is_not_a_record():
+    assert read_lines(b'{"a": 1}\n', 4) == [(1, b'{"a": 1}')]
+    assert read_lines(b'{"a": 1}\n  \n', 4) == [(1, b'{"a": 1}'), (2, b'  ')]
+
+def test_import_reports_source_lines(db):
+    async def scenario():
+        await db.questionnaire_answers.create_index([("id", ASCENDING)], unique=True)
+        await db.questionnaire_answers.insert_one({**SAMPLE_ANSWERS, 'id': 'taken'})
+        body = ndjson(
+            {**SAMPLE_ANSWERS, 'id': 'q1'},
+            {**SAMPLE_ANSWERS, 'id': 'taken'},
+            {**SAMPLE_ANSWERS, 'commitment_level': 'high'},
+            {**SAMPLE_ANSWERS, 'id': 'q2'},
+            {**SAMPLE_ANSWERS, 'id': 'q1'},
+        ) + b"\n"
+        report = await server.import_questionnaires(chunked(body, 64), batch_size=2, create_profiles=True)
+        return report, await db.user_profiles.count_documents({})
+
+    report, profiles = asyncio.run(scenario())
+
+    assert report['lines'] == 5
+    assert report['inserted'] == report['profiles_created'] == profiles == 2
+    assert report['failed'] == 3
+    assert [error['line'] for error in report['errors']] == [2, 3, 5]
+    assert 'commitment_level' in report['errors'][1]['error']
+
+def test_import_route_requires_admin_and_imports(client, db, monkeypatch):
+    monkeypatch.setattr(server, 'ADMIN_TOKEN', 'secret')
+    body = ndjson({**SAMPLE_ANSWERS, 'id': 'q1'}, {**SAMPLE_ANSWERS, 'id': 'q2'})
+
+    assert client.post('/api/questionnaire/import', content=body).status_code == 401
+    response = client.post('/api/questionnaire/import', content=body, headers={'Authorization': 'Bearer secret'})
+
+    assert response.status_code == 200
+    assert response.json()['inserted'] == 2
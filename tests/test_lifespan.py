@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+
+def test_app_starts_and_reports_unready_without_mongo(monkeypatch):
+    unreachable = AsyncIOMotorClient('mongodb://127.0.0.1:1', serverSelectionTimeoutMS=200)
+    monkeypatch.setattr(server, 'db', unreachable['lifeplan_test'])
+    monkeypatch.setattr(server, 'READINESS_PING_TIMEOUT_SECONDS', 0.5)
+    monkeypatch.setattr(server, 'lifecycle', server.AppLifecycle(step_timeout=2))
+    monkeypatch.setattr(server, 'plan_jobs', server.PlanJobQueue(poll_seconds=0.1))
+
+    with TestClient(server.app) as client:
+        assert client.get('/healthz').status_code == 200
+        readiness = client.get('/readyz')
+        assert readiness.status_code == 503
+        assert readiness.json()['checks'] == {'startup': False, 'mongo': False}
+        steps = server.lifecycle.report['steps']
+        assert not steps['mongo']['ok']
+        assert not steps['plan_jobs']['ok']
+        # The legacy date backfill is opt-in, and the reuse index is only loaded with reuse on
+        assert 'date_backfill' not in steps and 'plan_index' not in steps
+        # Workers are up anyway and keep retrying their claims
+        assert len(server.plan_jobs._tasks) == server.plan_jobs.concurrency
+    unreachable.close()
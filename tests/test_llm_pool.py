@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import httpx
+
+import server
+from tests.conftest import SAMPLE_ANSWERS
+
+def slow_pool(size, timeout, latency):
+    pool = server.LLMClientPool('stub', size=size, timeout=timeout)
+    pool._provider = server.StubLLMProvider(latency=latency, jitter=0)
+    return pool
+
+def test_timeout_covers_waiting_for_a_slot():
+    pool = slow_pool(size=1, timeout=0.2, latency=5)
+
+    async def scenario():
+        started = time.perf_counter()
+        results = await asyncio.gather(pool.complete('a'), pool.complete('b'), return_exceptions=True)
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(scenario())
+
+    assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+    assert elapsed < 0.4
+    assert pool.stats['timeouts'] == 1 and pool.stats['queue_timeouts'] == 1
+    assert pool.stats['calls'] == 1 and pool.stats['waiting'] == 0
+
+def test_onboarding_burst_keeps_late_llm_work_bounded(db, monkeypatch):
+    monkeypatch.setattr(server, 'llm_pool', slow_pool(size=2, timeout=30, latency=5))
+    monkeypatch.setattr(server, 'plan_admission', server.AdmissionController(max_concurrency=4, min_concurrency=4))
+    monkeypatch.setattr(server, 'PLAN_LLM_BUDGET_SECONDS', 0.05)
+    monkeypatch.setattr(server, 'PLAN_UPGRADE_MAX_PENDING', 2)
+    monkeypatch.setattr(server, 'pending_upgrades', set())
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            responses = await asyncio.gather(*[client.post('/api/onboard', json=SAMPLE_ANSWERS) for _ in range(60)])
+        # Let the cancelled late calls unwind
+        await asyncio.sleep(0.05)
+        outcome = ([response.status_code for response in responses], len(server.pending_upgrades),
+                   server.llm_pool.stats['in_flight'] + server.llm_pool.stats['waiting'])
+        for task in list(server.pending_upgrades):
+            task.cancel()
+        await asyncio.gather(*server.background_tasks, return_exceptions=True)
+        return outcome
+
+    statuses, pending, llm_calls = asyncio.run(scenario())
+
+    assert set(statuses) <= {200, 503}
+    assert statuses.count(200) > 0
+    assert pending <= 2
+    assert llm_calls <= 2
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import server
+
+def test_restart_requeues_only_jobs_of_exited_processes(db):
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    host = socket.gethostname()
+    owners = {
+        'exited': f"{host}:{exited.pid}:aaaaaaaa",
+        'previous': f"{host}:{os.getpid()}:bbbbbbbb",
+        'sibling': f"{host}:{os.getppid()}:cccccccc",
+        'other_host': "elsewhere:1:dddddddd",
+    }
+    now = datetime.now(timezone.utc)
+    queue = server.PlanJobQueue(concurrency=0)
+
+    async def scenario():
+        await db.plan_jobs.insert_many([
+            {"id": name, "status": "running", "stage": "generating", "worker_id": worker_id, "lease_expires_at": now}
+            for name, worker_id in owners.items()
+        ])
+        await queue.start()
+        return {job['id']: job['status'] async for job in db.plan_jobs.find({})}
+
+    statuses = asyncio.run(scenario())
+
+    assert statuses == {'exited': 'queued', 'previous': 'queued', 'sibling': 'running', 'other_host': 'running'}
+
+def test_plan_write_invalidates_reads_cached_by_other_processes(db, answers, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'shared_cache', server.SharedCache(str(tmp_path / 'shared.sqlite3')))
+    # Stands in for the read cache of another worker; server.plan_reads is this one's
+    other_worker = server.PlanReadCache()
+    profile = server.build_profile(answers)
+
+    async def scenario():
+        await server.save_plan(profile.id, server.build_local_plan(profile, answers))
+        first_etag, _ = await other_worker.get(profile.id)
+        assert (await other_worker.get(profile.id))[0] == first_etag
+        hits = other_worker.stats['hits']
+
+        await server.save_plan(profile.id, {**server.build_local_plan(profile, answers), 'yearly_goal': 'Rewritten'})
+        etag, body = await other_worker.get(profile.id)
+        return first_etag, etag, body, hits
+
+    first_etag, etag, body, hits = asyncio.run(scenario())
+
+    assert hits == 1
+    assert etag != first_etag
+    assert b'Rewritten' in body
+
+def test_default_shared_cache_path_is_per_database(tmp_path):
+    backend = Path(server.__file__).parent
+    env = {key: value for key, value in os.environ.items() if key != 'SHARED_CACHE_PATH'}
+
+    def default_path(db_name):
+        result = subprocess.run([sys.executable, '-c', 'import server; print(server.SHARED_CACHE_PATH)'], cwd=backend,
+                                env={**env, 'DB_NAME': db_name, 'TMPDIR': str(tmp_path)},
+                                capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+
+    assert default_path('staging') == str(tmp_path / 'lifeplan-shared-cache-staging.sqlite3')
+    assert default_path('prod/eu') == str(tmp_path / 'lifeplan-shared-cache-prod_eu.sqlite3')
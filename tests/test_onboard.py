@@ -0,0 +1,35 @@
+import asyncio
+
+from pymongo import ASCENDING
+
+import server
+from tests.conftest import SAMPLE_ANSWERS
+
+def counts(db):
+    async def count():
+        return {name: await db[name].count_documents({})
+                for name in ('questionnaire_answers', 'user_profiles', 'analytics_rollups', 'personalized_plans')}
+    return asyncio.run(count())
+
+def test_onboard_stores_questionnaire_profile_and_plan(client, db):
+    response = client.post('/api/onboard', json=SAMPLE_ANSWERS)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body['profile']['questionnaire_id'] == body['questionnaire']['id']
+    assert body['plan']['profile_id'] == body['profile']['id']
+    stored = counts(db)
+    assert stored['questionnaire_answers'] == stored['user_profiles'] == stored['personalized_plans'] == 1
+    assert stored['analytics_rollups'] > 0
+
+def test_duplicate_questionnaire_leaves_nothing_behind(client, db):
+    async def seed():
+        await db.questionnaire_answers.create_index([("id", ASCENDING)], unique=True)
+        await db.questionnaire_answers.insert_one({**SAMPLE_ANSWERS, 'id': 'taken'})
+    asyncio.run(seed())
+
+    response = client.post('/api/onboard', json={**SAMPLE_ANSWERS, 'id': 'taken'})
+
+    assert response.status_code == 409
+    assert counts(db) == {'questionnaire_answers': 1, 'user_profiles': 0, 'analytics_rollups': 0,
+                          'personalized_plans': 0}
@@ -0,0 +1,42 @@
+import asyncio
+
+import server
+
+def test_late_llm_calls_past_the_upgrade_cap_are_cancelled(answers, monkeypatch):
+    started = []
+
+    async def slow_plan(profile, answers):
+        started.append(asyncio.current_task())
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(server, 'generate_personalized_plan', slow_plan)
+    monkeypatch.setattr(server, 'pending_upgrades', set())
+    monkeypatch.setattr(server, 'PLAN_UPGRADE_MAX_PENDING', 2)
+    profile = server.build_profile(answers)
+
+    async def scenario():
+        results = await asyncio.gather(*[server.generate_plan_within_budget(profile, answers, 0.01) for _ in range(5)])
+        await asyncio.sleep(0)
+        pending = [task for _, task in results if task is not None]
+        outcome = (all(plan['source'] == 'local' for plan, _ in results), len(pending),
+                   len(server.pending_upgrades), sum(task.cancelled() for task in started))
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return outcome + (len(server.pending_upgrades),)
+
+    all_local, kept, tracked, cancelled, tracked_after = asyncio.run(scenario())
+
+    assert all_local
+    assert kept == tracked == 2
+    assert cancelled == 3
+    assert tracked_after == 0
+
+def test_fast_llm_plan_is_returned_without_upgrade(answers, monkeypatch):
+    async def fast_plan(profile, answers):
+        return {'source': 'llm'}
+
+    monkeypatch.setattr(server, 'generate_personalized_plan', fast_plan)
+    profile = server.build_profile(answers)
+
+    assert asyncio.run(server.generate_plan_within_budget(profile, answers, 5)) == ({'source': 'llm'}, None)
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+import server
+
+@pytest.fixture
+def plan(db, answers):
+    profile = server.build_profile(answers)
+
+    async def seed():
+        await db.questionnaire_answers.insert_one(server.to_mongo(answers))
+        await db.user_profiles.insert_one(server.to_mongo(profile))
+        return await server.save_plan(profile.id, server.build_local_plan(profile, answers))
+
+    return asyncio.run(seed())
+
+def test_get_plan_sends_etag(client, plan):
+    response = client.get(f'/api/plan/{plan.profile_id}')
+    assert response.status_code == 200
+    assert response.headers['etag'] == f'"{plan.id}.1"'
+    assert response.headers['cache-control'] == server.PLAN_CACHE_CONTROL
+    assert response.json()['id'] == plan.id
+
+@pytest.mark.parametrize('if_none_match', ['{etag}', 'W/{etag}', '"other", {etag}', '*'])
+def test_matching_if_none_match_is_304(client, plan, if_none_match):
+    etag = client.get(f'/api/plan/{plan.profile_id}').headers['etag']
+    response = client.get(f'/api/plan/{plan.profile_id}', headers={'If-None-Match': if_none_match.format(etag=etag)})
+    assert response.status_code == 304
+    assert response.headers['etag'] == etag
+    assert response.content == b''
+
+def test_new_plan_changes_etag(client, plan, answers):
+    etag = client.get(f'/api/plan/{plan.profile_id}').headers['etag']
+    profile = server.build_profile(answers)
+    newer = asyncio.run(server.save_plan(plan.profile_id, server.build_local_plan(profile, answers)))
+
+    response = client.get(f'/api/plan/{plan.profile_id}', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['etag'] == f'"{newer.id}.1"'
+
+def test_section_edit_changes_etag(client, plan):
+    etag = client.get(f'/api/plan/{plan.profile_id}').headers['etag']
+
+    edited = client.patch(f'/api/plan/{plan.id}/sections/yearly_goal', headers={'If-Match': etag})
+    assert edited.status_code == 200
+    assert edited.headers['etag'] == f'"{plan.id}.2"'
+
+    response = client.get(f'/api/plan/{plan.profile_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['etag'] == edited.headers['etag']
+
+    stale = client.patch(f'/api/plan/{plan.id}/sections/yearly_goal', headers={'If-Match': etag})
+    assert stale.status_code == 412
+
+def test_missing_plan_is_404(client):
+    assert client.get('/api/plan/nobody').status_code == 404
+
+def test_section_edit_records_token_usage(client, db, plan):
+    edited = client.patch(f'/api/plan/{plan.id}/sections/monthly_focus').json()
+
+    assert [entry['section'] for entry in edited['edit_token_usage']] == ['monthly_focus']
+    assert edited['edit_token_usage'][0]['output_tokens'] > 0
+    stored = asyncio.run(db.personalized_plans.find_one({'id': plan.id}))
+    assert stored['edit_token_usage'][0]['output_tokens'] == edited['edit_token_usage'][0]['output_tokens']
+
+def test_etag_is_exposed_to_browsers(client, plan):
+    response = client.get(f'/api/plan/{plan.profile_id}', headers={'Origin': 'https://app.example'})
+    assert 'etag' in response.headers['access-control-expose-headers'].lower()
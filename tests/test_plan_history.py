@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+def plan_doc(plan_id, created_at, profile_id="p1"):
+    return {"id": plan_id, "profile_id": profile_id, "created_at": created_at, "yearly_goal": plan_id,
+            "monthly_focus": "focus", "source": "llm"}
+
+def walk(client, profile_id="p1", limit=2):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/api/plan/{profile_id}/history", params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        ids += [plan['id'] for plan in page['plans']]
+        cursor = page['next_cursor']
+        if not cursor:
+            return ids
+
+def test_history_pages_in_order_without_gaps(client, db):
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    # Two plans share a timestamp so the id tie-break is exercised across a page boundary
+    docs = [plan_doc(f"plan-{i}", base + timedelta(minutes=i // 2 * 2)) for i in range(7)]
+    asyncio.run(db.personalized_plans.insert_many(docs))
+    assert walk(client) == [f"plan-{i}" for i in reversed(range(7))]
+
+def test_history_pages_through_legacy_string_dates(client, db):
+    asyncio.run(db.personalized_plans.insert_many([
+        plan_doc("legacy-a", "2024-01-01T09:00:00+00:00"),
+        plan_doc("legacy-b", "2024-01-02T09:00:00+00:00"),
+        plan_doc("legacy-c", "2024-01-03T09:00:00+00:00"),
+        plan_doc("native-a", datetime(2025, 1, 1, tzinfo=timezone.utc)),
+        plan_doc("native-b", datetime(2025, 1, 2, tzinfo=timezone.utc)),
+    ]))
+    assert walk(client, limit=1) == ["native-b", "native-a", "legacy-c", "legacy-b", "legacy-a"]
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 5, 1, 12, 30, tzinfo=timezone.utc)
+    assert server.decode_plan_cursor(server.encode_plan_cursor({"id": "x|y", "created_at": created_at})) == (created_at, "x|y")
+    legacy = "2024-01-01T09:00:00+00:00"
+    assert server.decode_plan_cursor(server.encode_plan_cursor({"id": "z", "created_at": legacy})) == (legacy, "z")
+
+@pytest.mark.parametrize("cursor", ["garbage", "eHx5", "cXwyMDI0fHg"])
+def test_malformed_cursor_is_400(client, cursor):
+    assert client.get("/api/plan/p1/history", params={"cursor": cursor}).status_code == 400
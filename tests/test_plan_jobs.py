@@ -0,0 +1,40 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+
+def test_late_heartbeat_does_not_reopen_finished_job(db):
+    queue = server.PlanJobQueue(concurrency=0)
+
+    async def scenario():
+        await db.plan_jobs.insert_one({"id": "job", "status": "running", "worker_id": queue.worker_id, "attempts": 1})
+        await queue._update("job", {"status": "succeeded", "stage": "succeeded", "lease_expires_at": None})
+        await queue._update("job", {"status": "running"})
+        return await db.plan_jobs.find_one({"id": "job"})
+
+    job = asyncio.run(scenario())
+
+    assert job["status"] == "succeeded"
+    assert job["lease_expires_at"] is None
+
+def test_abandoned_job_fails_once_attempts_run_out(db):
+    queue = server.PlanJobQueue(concurrency=0, max_attempts=3)
+    expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+    async def scenario():
+        await db.plan_jobs.insert_many([
+            {"id": "exhausted", "status": "running", "worker_id": "gone:1:a", "attempts": 3,
+             "lease_expires_at": expired, "created_at": expired},
+            {"id": "retryable", "status": "running", "worker_id": "gone:1:a", "attempts": 1,
+             "lease_expires_at": expired, "created_at": expired},
+        ])
+        await queue._claim()
+        return {job["id"]: job async for job in db.plan_jobs.find({})}
+
+    jobs = asyncio.run(scenario())
+
+    assert jobs["exhausted"]["status"] == "failed"
+    assert jobs["exhausted"]["attempts"] == 3
+    assert jobs["retryable"]["status"] == "running"
+    assert jobs["retryable"]["worker_id"] == queue.worker_id
+    assert jobs["retryable"]["attempts"] == 2
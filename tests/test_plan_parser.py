@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import server
+from tests.conftest import SAMPLE_ANSWERS
+
+@pytest.fixture
+def plan():
+    answers = server.QuestionnaireAnswer(**SAMPLE_ANSWERS)
+    local = server.build_local_plan(server.build_profile(answers), answers)
+    return {name: local[name] for name in server.PLAN_SECTIONS}
+
+@pytest.fixture
+def body(plan):
+    return json.dumps(plan, indent=2)
+
+@pytest.mark.parametrize('wrap', [
+    lambda body: body,
+    lambda body: f"```json\n{body}\n```",
+    lambda body: f"Here is your plan:\n{body}\nGood luck!",
+    lambda body: f"Sure {{as requested}}:\n```json\n{body}\n```",
+    lambda body: f"Sure [1] {{as requested}} and {{\"note\": 1}}:\n{body}",
+], ids=['plain', 'fenced', 'prose', 'prose_braces', 'prose_objects'])
+def test_extracts_every_section(plan, body, wrap):
+    assert server.extract_plan_sections(wrap(body)) == plan
+
+def test_repairs_trailing_commas_and_smart_quotes(plan, body):
+    broken = body.replace('"yearly_goal"', '“yearly_goal”')
+    broken = broken[:broken.rindex('}')] + ',\n}'
+    assert server.extract_plan_sections(broken) == plan
+
+def test_truncated_response_keeps_completed_sections(plan, body):
+    cut = body.index('"justification"')
+    sections = server.extract_plan_sections(body[:cut + 20])
+    assert 'justification' not in sections
+    complete = [name for name in plan if body.index(f'"{name}"') < cut]
+    assert complete and sections == {name: plan[name] for name in complete}
+
+def test_drops_sections_failing_the_schema(plan, body):
+    sections = server.extract_plan_sections(body.replace('"pillars": [', '"pillars": 7, "ignored": [', 1))
+    assert 'pillars' not in sections
+    assert sections['yearly_goal'] == plan['yearly_goal']
+
+def test_stream_parser_emits_sections_across_chunks(plan, body):
+    text = f"Sure {{as requested}}:\n```json\n{body}\n```"
+    parser = server.PlanSectionParser()
+    emitted = []
+    for start in range(0, len(text), 7):
+        emitted.extend(parser.feed(text[start:start + 7]))
+    assert parser.done
+    assert {name: value for name, value in emitted if name in plan} == plan
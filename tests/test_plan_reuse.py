@@ -0,0 +1,59 @@
+import asyncio
+
+import server
+from tests.conftest import SAMPLE_ANSWERS
+
+def make_answers(**changes):
+    return server.QuestionnaireAnswer(**{**SAMPLE_ANSWERS, **changes})
+
+def donor_plan(answers):
+    profile = server.build_profile(answers)
+    plan = server.build_local_plan(profile, answers)
+    plan['yearly_goal'] = f"{answers.yearly_goals[0]} and {answers.yearly_goals[1].lower()}"
+    plan['pillars'] = answers.yearly_goals[:2] + ['Deep Focus']
+    plan['weekly_template']['Tuesday'] = f"Work on {answers.yearly_goals[1]}"
+    return profile, plan
+
+def test_reuse_is_off_by_default():
+    assert server.PLAN_REUSE_MAX_DISTANCE == 0
+    assert server.PLAN_REUSE_CONTEXT_DISTANCE == 0
+
+def test_adaptation_refuses_unmatched_donor_goals():
+    donor_answers = make_answers(yearly_goals=['Write a novel', 'Run a marathon', 'Learn piano'])
+    profile, plan = donor_plan(donor_answers)
+    donor = server.reuse_donor(profile, donor_answers)
+    assert server.adapt_neighbour_plan(plan, donor, profile, make_answers(yearly_goals=['Get promoted'])) is None
+
+def test_adaptation_rebuilds_personal_sections():
+    donor_answers = make_answers(yearly_goals=['Write a novel', 'Run a marathon', 'Learn piano'])
+    profile, plan = donor_plan(donor_answers)
+    donor = server.reuse_donor(profile, donor_answers)
+    recipient = make_answers(yearly_goals=['Get promoted', 'Ship my app', 'Read more books'], chronotype='Evening')
+
+    adapted = server.adapt_neighbour_plan(plan, donor, profile, recipient)
+
+    local = server.build_local_plan(profile, recipient)
+    for name in server.PLAN_REUSE_PERSONAL_SECTIONS:
+        assert adapted[name] == local[name]
+    assert adapted['weekly_template']['Tuesday'] == "Work on Ship my app"
+    assert adapted['time_blocks'][0]['time'].startswith('18:00')
+    assert 'novel' not in str(adapted).lower() and 'marathon' not in str(adapted).lower()
+    assert adapted['source'] == 'adapted'
+
+def test_adaptation_refuses_leftover_donor_skills():
+    donor_answers = make_answers()
+    profile, plan = donor_plan(donor_answers)
+    plan['habit_stack'].append({"habit": "Practice Programming", "cue": "After lunch", "time": "20 minutes"})
+    donor = server.reuse_donor(profile, donor_answers)
+    recipient = make_answers(existing_skills=['Cooking'])
+    assert server.adapt_neighbour_plan(plan, donor, profile, recipient) is None
+
+def test_generated_plans_join_the_index_only_with_reuse_on(db, monkeypatch):
+    async def generate(answers):
+        await server.generate_personalized_plan(server.build_profile(answers), answers)
+        return len(server.plan_neighbours)
+
+    assert asyncio.run(generate(make_answers())) == 0
+    monkeypatch.setattr(server, 'PLAN_REUSE_MAX_DISTANCE', 6.0)
+    # The first plan comes in from plan_cache on refresh, the new one is added directly
+    assert asyncio.run(generate(make_answers(yearly_goals=['Get promoted']))) == 2
@@ -0,0 +1,60 @@
+import asyncio
+import copy
+import json
+
+import pytest
+
+import server
+from tests.conftest import SAMPLE_ANSWERS
+
+@pytest.fixture
+def experiment(tmp_path, monkeypatch):
+    """Rules file with v1 active and half of all questionnaires on v2, which scores goals higher"""
+    v2 = copy.deepcopy(server.DEFAULT_SCORING_RULES)
+    v2['version'] = 'v2'
+    v2['purpose']['per_goal'] = 30
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'active': 'v1', 'rulesets': [server.DEFAULT_SCORING_RULES, v2],
+                                'experiment': {'version': 'v2', 'percent': 50}}))
+    registry = server.ScoringRuleRegistry(str(path))
+    monkeypatch.setattr(server, 'scoring_rules', registry)
+    return registry
+
+@pytest.fixture
+def profiles(db, experiment):
+    answers = [server.QuestionnaireAnswer(**{**SAMPLE_ANSWERS, 'yearly_goals': ['Ship it']}) for _ in range(20)]
+
+    async def seed():
+        await db.questionnaire_answers.insert_many([server.to_mongo(a) for a in answers])
+        # Stored with stale scores so every rescore has something to change
+        await db.user_profiles.insert_many([
+            {**server.to_mongo(server.build_profile(a)), 'purpose_clarity': 0, 'scoring_version': 'v0'} for a in answers
+        ])
+
+    asyncio.run(seed())
+    return answers
+
+def stored_profiles(db):
+    async def load():
+        return {doc['questionnaire_id']: doc async for doc in db.user_profiles.find({})}
+    return asyncio.run(load())
+
+def test_rescore_keeps_each_questionnaire_in_its_arm(db, experiment, profiles):
+    arms = {a.id: experiment.for_questionnaire(a.id).version for a in profiles}
+    assert set(arms.values()) == {'v1', 'v2'}
+
+    report = asyncio.run(server.rescore_all_profiles(verify=True))
+
+    assert report['mismatches'] == 0
+    assert report['scoring_versions'] == {v: list(arms.values()).count(v) for v in ('v1', 'v2')}
+    stored = stored_profiles(db)
+    for answers in profiles:
+        rules = experiment.get(arms[answers.id])
+        assert stored[answers.id]['scoring_version'] == rules.version
+        assert stored[answers.id]['purpose_clarity'] == server.calculate_scores(answers, rules)['purpose_clarity']
+
+def test_rescore_with_version_pins_every_profile(db, experiment, profiles):
+    report = asyncio.run(server.rescore_all_profiles(version='v2'))
+
+    assert report['scoring_versions'] == {'v2': len(profiles)}
+    assert {doc['scoring_version'] for doc in stored_profiles(db).values()} == {'v2'}
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+import server
+
+WORDS = ['help', 'helpful', 'solve', 'create', 'creates', 'build', 'rebuilding', 'teach', 'teacher', 'code',
+         'coding', 'codes', 'write', 'writing', 'design', 'redesign', 'research', 'analyze', 'manage', 'impact',
+         'mentor', 'study', 'garden', 'travel', 'family', 'music']
+
+def random_answers(rng):
+    def phrase(low, high):
+        return ' '.join(rng.choice(WORDS).title() if rng.random() < 0.2 else rng.choice(WORDS)
+                        for _ in range(rng.randint(low, high)))
+    return server.QuestionnaireAnswer(
+        energizing_activities=phrase(0, 8),
+        passionate_problems=phrase(0, 8),
+        existing_skills=[phrase(1, 2) for _ in range(rng.randint(0, 5))],
+        weekday_hours=rng.randint(0, 12),
+        weekend_hours=rng.randint(0, 16),
+        chronotype=rng.choice(['Early morning', 'Late morning', 'Afternoon', 'Evening', 'Night', 'Varies']),
+        morning_routine=rng.choice(['', '  ', 'no', 'No', 'Coffee and a walk']),
+        morning_routine_duration=rng.randint(0, 90),
+        reliable_habits=rng.choice(['0', '1-2', '3-4', '5+', 'many']),
+        setback_reaction=rng.choice(['give up', 'try again same way', 'adjust approach and try again',
+                                     'learn and iterate immediately', 'it depends']),
+        yearly_goals=[phrase(1, 4) for _ in range(rng.randint(1, 4))],
+        key_habit_change=rng.choice(['', 'Sleep', 'Start deep work sessions every morning']),
+        main_distractions=rng.sample(['Social media', 'Email', 'Phone', 'TV', 'News'], rng.randint(0, 5)),
+        commitment_level=rng.randint(1, 10),
+    )
+
+@pytest.fixture(scope='module')
+def sample():
+    rng = random.Random(20241017)
+    return [random_answers(rng) for _ in range(300)]
+
+@pytest.fixture(scope='module')
+def rules():
+    return server.CompiledScoringRules(server.DEFAULT_SCORING_RULES)
+
+def test_batch_scores_match_scalar(sample, rules):
+    scores = server.calculate_scores_batch([answers.model_dump() for answers in sample], rules)
+    archetypes = server.determine_archetype_batch(scores, rules)
+    for row, answers in enumerate(sample):
+        expected = server.calculate_scores(answers, rules)
+        assert {axis: int(values[row]) for axis, values in scores.items()} == expected
+        assert archetypes[row] == server.determine_archetype(expected, rules)
+
+def test_regex_matcher_matches_substring_checks(sample, rules, monkeypatch):
+    monkeypatch.setattr(server, 'REGEX_MATCHER_MIN_KEYWORDS', 0)
+    regex_rules = server.CompiledScoringRules(server.DEFAULT_SCORING_RULES)
+    assert rules.matcher is None and regex_rules.matcher is not None
+    for answers in sample:
+        text = f"{answers.energizing_activities} {answers.passionate_problems} {' '.join(answers.yearly_goals)}".lower()
+        for name in rules.keywords:
+            assert regex_rules.match(text, name) == rules.match(text, name)
+        assert regex_rules.score(answers) == rules.score(answers)
+
+def test_batch_scoring_handles_no_documents(rules):
+    scores = server.calculate_scores_batch([], rules)
+    assert all(len(values) == 0 for values in scores.values())
+    assert len(server.determine_archetype_batch(scores, rules)) == 0
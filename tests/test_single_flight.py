@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+from tests.conftest import SAMPLE_ANSWERS
+
+def make_plan(profile_id):
+    plan = server.build_local_plan(server.build_profile(server.QuestionnaireAnswer(**SAMPLE_ANSWERS)),
+                                   server.QuestionnaireAnswer(**SAMPLE_ANSWERS))
+    return server.PersonalizedPlan(profile_id=profile_id, **{name: plan[name] for name in server.PLAN_SECTIONS})
+
+def test_expired_finished_lease_is_taken_over(db):
+    flights = server.PlanSingleFlight(result_seconds=1, poll_seconds=0.01)
+
+    async def run():
+        await db.plan_leases.create_index("profile_id", unique=True)
+        old = make_plan("p1")
+        await db.personalized_plans.insert_one(server.to_mongo(old))
+        # A finished lease whose result window has passed but which the TTL monitor has not reaped
+        await db.plan_leases.insert_one({"profile_id": "p1", "owner": "gone", "plan_id": old.id,
+                                         "expires_at": datetime.now(timezone.utc) - timedelta(seconds=2)})
+        fresh = make_plan("p1")
+
+        async def generate():
+            await db.personalized_plans.insert_one(server.to_mongo(fresh))
+            return fresh
+
+        return old, fresh, await flights.run("p1", generate)
+
+    old, fresh, plan = asyncio.run(run())
+    assert plan.id == fresh.id != old.id
+    assert flights.stats == {'generated': 1, 'coalesced_local': 0, 'coalesced_remote': 0}
+
+def test_live_finished_lease_is_shared(db):
+    flights = server.PlanSingleFlight(poll_seconds=0.01)
+
+    async def run():
+        await db.plan_leases.create_index("profile_id", unique=True)
+        recent = make_plan("p1")
+        await db.personalized_plans.insert_one(server.to_mongo(recent))
+        await db.plan_leases.insert_one({"profile_id": "p1", "owner": "other", "plan_id": recent.id,
+                                         "expires_at": datetime.now(timezone.utc) + timedelta(seconds=5)})
+
+        async def generate():
+            raise AssertionError("should have joined the recorded plan")
+
+        return recent, await flights.run("p1", generate)
+
+    recent, plan = asyncio.run(run())
+    assert plan.id == recent.id
+    assert flights.stats['coalesced_remote'] == 1